@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.database_routing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,9 +52,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.async_urlconf_middleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
+# ASGI 请求使用的 URL 配置（异步视图）
+ASYNC_ROOT_URLCONF = 'config.urls_async'
 
 TEMPLATES = [
     {
@@ -77,13 +81,46 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite 生产配置（见 core/db/backends/sqlite3/base.py）：WAL、busy_timeout 等 PRAGMA，
+# atomic() 使用 BEGIN IMMEDIATE；default 保持长连接，readonly 为 GET 请求使用的只读连接池
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'readonly': {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'READ_ONLY': True,
+        'POOL_SIZE': 16,
+        # 请求结束时关闭连接，即放回连接池
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# 只读副本：浏览页面（@replica_reads）从副本读取。本地测试时运行
+# python manage.py sync_replica --interval 2 用 SQLite 备份 API 维护一份副本，副本文件存在时自动启用
+REPLICA_DB_PATH = BASE_DIR / 'db.replica.sqlite3'
+DATABASE_REPLICAS = []
+if REPLICA_DB_PATH.exists():
+    DATABASES['replica'] = {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': REPLICA_DB_PATH,
+        'READ_ONLY': True,
+        'POOL_SIZE': 16,
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# 用户写入后这段时间（秒）内读主库，覆盖副本的同步延迟
+REPLICA_PIN_SECONDS = 10
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -138,6 +175,47 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 缓存：设置环境变量 REDIS_URL 时所有进程共用 Redis，失效操作对所有进程立即生效；
+# 否则为进程内缓存，失效只对当前进程生效，首页、分面等缓存的有效期缩短为 LOCAL_CACHE_TIMEOUT 秒
+# （见 core/caching.py），其他进程最多显示这么久的旧数据
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+CACHE_SHARED = bool(REDIS_URL)
+LOCAL_CACHE_TIMEOUT = 30
+
+# generate_thumbnails 生成缩略图的进程数量（Web 进程只登记，不生成）
+THUMBNAIL_WORKERS = 2
+
+# 物品浏览计数在内存中累加，每隔这么多秒批量写入数据库（0 表示只在进程退出时写入）
+VIEW_COUNT_FLUSH_INTERVAL = 5
+
+# 热门物品的热度半衰期（小时）
+TRENDING_HALF_LIFE_HOURS = 24
+# 搜索框输入提示的内存索引每隔这么多秒补齐其他进程中的修改（0 表示不补齐）
+SUGGEST_REFRESH_INTERVAL = 30
+
+# 图片上传视图用 core.uploads.image_uploads 按块写入临时文件，写入时检查格式和大小
+IMAGE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+IMAGE_UPLOAD_MAX_SIDE = 10000
+
+# 媒体文件由前端服务器发送：None、'x-accel-redirect'（nginx）或 'x-sendfile'（Apache/lighttpd）
+# nginx 需配置 internal 的 location，将 MEDIA_ACCEL_REDIRECT_PREFIX 映射到 MEDIA_ROOT
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
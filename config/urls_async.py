@@ -0,0 +1,14 @@
+"""
+ASGI 部署使用的 URL 配置
+
+与 config/urls.py 相同，但物品浏览和用户主页使用异步视图，避免每个请求经过线程适配。
+由 core.middleware.async_urlconf_middleware 为 ASGI 请求选用。
+"""
+from django.urls import path, include
+
+from . import urls
+
+urlpatterns = [
+    path('', include('items.urls_async')),
+    path('users/', include('users.urls_async')),
+] + urls.urlpatterns
@@ -0,0 +1,208 @@
+"""
+视图延迟基准
+
+在当前进程内用测试客户端请求各页面，统计 p50/p99 延迟、每次请求的查询次数
+（所有数据库别名合计）和峰值内存（tracemalloc，单次请求中 Python 分配的峰值）。
+结果以 JSON 保存，可与基线比较：延迟超过容差或查询次数增加视为退化。
+"""
+
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urlencode
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from . import synthetic
+from items import trending
+from users.ratings import rebuild_summaries
+
+# 延迟比基线慢多少（比例）视为退化
+DEFAULT_TOLERANCE = 0.2
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+@contextmanager
+def use_database(path):
+    """把所有数据库别名临时指向 path（不能在测试用的内存数据库上使用）"""
+    saved = {}
+    for alias in connections:
+        connections[alias].close()
+        saved[alias] = connections[alias].settings_dict['NAME']
+        connections[alias].settings_dict['NAME'] = str(path)
+    cache.clear()
+    try:
+        yield
+    finally:
+        for alias, name in saved.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+        cache.clear()
+
+
+def prepare_dataset(path, items, seed=42, progress=None):
+    """在 path 上建表并生成 items 个物品的数据集，文件已存在时直接复用"""
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    building = f'{path}.building'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(building + suffix):
+            os.remove(building + suffix)
+    with use_database(building):
+        call_command('migrate', verbosity=0)
+        synthetic.generate(
+            users=max(10, items // 10), items=items, reviews=items // 3, seed=seed,
+            batch_size=20000, progress=progress,
+        )
+        rebuild_summaries(batch_size=20000)
+        trending.rebuild_all(batch_size=20000)
+    os.replace(building, path)
+    return True
+
+
+def scenarios(user, item, category):
+    """[(名称, URL, 是否需要登录), ...]，user 为有在售物品的卖家"""
+    item_list = reverse('item_list')
+    return [
+        ('home', reverse('home'), False),
+        ('item_list', item_list, False),
+        ('item_list_q', f'{item_list}?{urlencode({"q": item.title[-4:]})}', False),
+        ('item_list_category', f'{item_list}?{urlencode({"category": category.pk})}', False),
+        ('item_list_q_category', f'{item_list}?{urlencode({"q": item.title[-4:], "category": category.pk})}', False),
+        ('item_detail', reverse('item_detail', args=[item.pk]), False),
+        ('my_items', reverse('my_items'), True),
+        ('dashboard', reverse('users:dashboard'), True),
+        ('user_profile', reverse('users:user_profile', args=[user.username]), False),
+    ]
+
+
+@contextmanager
+def count_queries():
+    """统计所有数据库别名上执行的查询次数，结果在 yield 的列表中"""
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield counter
+
+
+def measure(client, url, repeat=30, warmup=3):
+    """请求 url 若干次，返回延迟（毫秒）、查询次数和峰值内存（KB）"""
+    for _ in range(warmup):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} 返回 {response.status_code}')
+
+    latencies = []
+    queries = []
+    for _ in range(repeat):
+        with count_queries() as counter:
+            start = time.perf_counter()
+            client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(counter[0])
+
+    # tracemalloc 会明显拖慢请求，单独测量一次
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def benchmark_views(repeat=30, warmup=3, progress=None):
+    """对当前数据库运行全部场景，返回 {名称: 测量结果}"""
+    from items.models import Item
+
+    item = (
+        Item.objects.filter(status='active').select_related('seller', 'category')
+        .order_by('-created_at').first()
+    )
+    if item is None:
+        raise RuntimeError('没有在售物品')
+    client = Client()
+    client.force_login(item.seller)
+
+    results = {}
+    for name, url, login in scenarios(item.seller, item, item.category):
+        anonymous = Client()
+        results[name] = measure(client if login else anonymous, url, repeat=repeat, warmup=warmup)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def metadata():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save(path, results):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': metadata(), 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    与基线比较，返回 [(规模, 视图, 指标, 基线值, 当前值, 是否退化), ...]
+
+    results 和 baseline 的结构均为 {规模: {视图: 测量结果}}，只比较两者都有的项。
+    """
+    rows = []
+    for scale, views in results.items():
+        for view, current in views.items():
+            previous = baseline.get(scale, {}).get(view)
+            if previous is None:
+                continue
+            for metric in ('p50_ms', 'p99_ms'):
+                regressed = current[metric] > previous[metric] * (1 + tolerance)
+                rows.append((scale, view, metric, previous[metric], current[metric], regressed))
+            rows.append((scale, view, 'queries', previous['queries'], current['queries'],
+                         current['queries'] > previous['queries']))
+    return rows
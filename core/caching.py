@@ -0,0 +1,23 @@
+"""
+缓存有效期
+
+默认缓存是每个进程各自的 LocMemCache：递增版本号、删除键等失效操作只对执行它的进程生效，
+其他进程只能等缓存过期。settings.CACHE_SHARED 为 False 时，依赖失效的缓存有效期
+不超过 settings.LOCAL_CACHE_TIMEOUT；配置了共享缓存（REDIS_URL）时使用各自的有效期。
+"""
+
+from django.conf import settings
+
+DEFAULT_LOCAL_TIMEOUT = 30
+
+
+def is_shared():
+    """缓存是否由所有进程共用"""
+    return getattr(settings, 'CACHE_SHARED', False)
+
+
+def timeout(seconds):
+    """依赖失效的缓存的有效期"""
+    if is_shared():
+        return seconds
+    return min(seconds, getattr(settings, 'LOCAL_CACHE_TIMEOUT', DEFAULT_LOCAL_TIMEOUT))
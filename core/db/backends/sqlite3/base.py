@@ -0,0 +1,105 @@
+"""
+生产环境使用的 SQLite 后端
+
+在 Django 自带后端的基础上：
+- 每个新连接设置 PRAGMA：WAL 日志（读写互不阻塞）、synchronous=NORMAL、
+  mmap_size、cache_size 和 busy_timeout（遇到锁时等待而不是立即报错）
+- atomic() 使用 BEGIN IMMEDIATE 开启事务，事务一开始就取得写锁。
+  默认的 BEGIN（DEFERRED）在事务中先读后写时需要把读锁升级为写锁，
+  与其他写事务冲突时 SQLite 会立即返回 "database is locked"，busy_timeout 对此无效
+- 数据库配置中 READ_ONLY 为 True 时以只读方式打开（mode=ro + query_only），
+  POOL_SIZE 大于 0 时连接在关闭后放回进程内的连接池，供后续请求（包括其他线程）复用；
+  仍在事务中或执行出错过的连接不放回
+
+DATABASES 中可用的额外配置：PRAGMAS、READ_ONLY、POOL_SIZE。
+"""
+
+import os
+import queue
+import threading
+from urllib.request import pathname2url
+
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # 负数表示 KiB
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# 只读连接不能修改日志模式
+READ_ONLY_SKIPPED_PRAGMAS = ('journal_mode',)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(key, size):
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = queue.LifoQueue(maxsize=size)
+        return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def read_only(self):
+        return bool(self.settings_dict.get('READ_ONLY'))
+
+    @property
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+
+    def _pool(self):
+        size = self.settings_dict.get('POOL_SIZE') or 0
+        if size <= 0 or self.is_in_memory_db():
+            return None
+        return _get_pool((self.alias, str(self.settings_dict['NAME'])), size)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        if self.read_only and not self.is_in_memory_db():
+            path = os.path.abspath(str(self.settings_dict['NAME']))
+            params['database'] = f'file:{pathname2url(path)}?mode=ro'
+        # Python sqlite3 的 timeout 即 busy handler 的等待时间
+        params.setdefault('timeout', self.pragmas['busy_timeout'] / 1000)
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self._pool()
+        if pool is not None:
+            try:
+                return pool.get_nowait()
+            except queue.Empty:
+                pass
+
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if self.read_only and name in READ_ONLY_SKIPPED_PRAGMAS:
+                continue
+            conn.execute(f'PRAGMA {name} = {value}')
+        if self.read_only:
+            conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # 只读连接无法取得写锁
+        self.cursor().execute('BEGIN' if self.read_only else 'BEGIN IMMEDIATE')
+
+    def _close(self):
+        pool = self._pool()
+        # 出过错的连接可能处于异常状态，直接关闭而不是放回连接池
+        if (pool is not None and self.connection is not None
+                and not self.connection.in_transaction and not self.errors_occurred):
+            try:
+                pool.put_nowait(self.connection)
+                return
+            except queue.Full:
+                pass
+        super()._close()
@@ -0,0 +1,26 @@
+"""
+本地 SQLite 副本
+
+用 SQLite 在线备份 API 把主库复制到副本文件。备份在目标库上以事务方式写入，
+副本上已打开的只读连接始终看到完整的某一版数据。用于在单机上测试读写分离。
+"""
+
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+# 每一步复制的页数，步骤之间释放主库的读锁，减少对写入的影响
+PAGES_PER_STEP = 1024
+
+
+def sync(source, target, pages=PAGES_PER_STEP):
+    """把 source 数据库复制到 target，返回复制的页数"""
+    source_uri = f'file:{pathname2url(os.path.abspath(source))}?mode=ro'
+    src = sqlite3.connect(source_uri, uri=True)
+    dst = sqlite3.connect(str(target))
+    try:
+        src.backup(dst, pages=pages)
+        return dst.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
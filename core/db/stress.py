@@ -0,0 +1,130 @@
+"""
+SQLite 并发压力测试
+
+在临时数据库文件上用多个线程模拟发布物品、切换物品状态（事务中先读后写）和浏览（只读），
+统计 "database is locked" 错误。用于比较 Django 自带后端与 core.db.backends.sqlite3。
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+STOCK_ENGINE = 'django.db.backends.sqlite3'
+TUNED_ENGINE = 'core.db.backends.sqlite3'
+
+SCHEMA = '''
+CREATE TABLE stress_item (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+'''
+
+
+class StressResult:
+
+    def __init__(self, engine, operations, errors, elapsed):
+        self.engine = engine
+        self.operations = operations
+        self.errors = errors
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return (
+            f'{self.engine}: {self.operations} 次操作，{self.errors} 次 database is locked，'
+            f'耗时 {self.elapsed:.2f}s'
+        )
+
+
+def _create_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.executemany(
+        'INSERT INTO stress_item (title, status, created_at) VALUES (?, ?, ?)',
+        [(f'物品{i}', 'active', time.time()) for i in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _toggle_status(alias, item_id):
+    """与 item_toggle_status 相同的模式：事务中先读取状态再更新"""
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT status FROM stress_item WHERE id = %s', [item_id])
+            row = cursor.fetchone()
+            status = 'inactive' if row and row[0] == 'active' else 'active'
+            cursor.execute('UPDATE stress_item SET status = %s WHERE id = %s', [status, item_id])
+
+
+def _create_item(alias, n):
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM stress_item WHERE status = %s', ['active'])
+            cursor.fetchone()
+            cursor.execute(
+                'INSERT INTO stress_item (title, status, created_at) VALUES (%s, %s, %s)',
+                [f'新物品{n}', 'active', time.time()],
+            )
+
+
+def _browse(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            'SELECT id, title FROM stress_item WHERE status = %s ORDER BY created_at DESC LIMIT 24', ['active']
+        )
+        cursor.fetchall()
+
+
+def run(engine, path, threads=16, operations=100, rows=1000, busy_timeout=None):
+    """
+    在 path 上创建测试表并运行并发负载，返回 StressResult
+
+    每个线程按 浏览/浏览/切换状态/发布 的比例循环执行 operations 次。
+    busy_timeout 为 Django 自带后端的 timeout（秒），默认 5 秒。
+    """
+    _create_database(path, rows)
+    alias = f'stress_{uuid.uuid4().hex[:8]}'
+    config = {'ENGINE': engine, 'NAME': path}
+    if busy_timeout is not None:
+        config['OPTIONS'] = {'timeout': busy_timeout}
+    configured = connections.configure_settings({DEFAULT_DB_ALIAS: {}, alias: config})
+    connections.settings[alias] = configured[alias]
+
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index):
+        nonlocal errors
+        try:
+            for n in range(operations):
+                try:
+                    step = n % 4
+                    if step < 2:
+                        _browse(alias)
+                    elif step == 2:
+                        _toggle_status(alias, (index * operations + n) % rows + 1)
+                    else:
+                        _create_item(alias, index * operations + n)
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    with lock:
+                        errors += 1
+        finally:
+            connections[alias].close()
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    del connections.settings[alias]
+    return StressResult(engine, threads * operations, errors, elapsed)
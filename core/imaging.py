@@ -0,0 +1,67 @@
+"""
+图片处理（只依赖 Pillow，可在独立的工作进程中运行）
+"""
+
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+# 各格式的保存参数
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def _prepare(image):
+    """按 EXIF 方向旋转，并把透明背景填充为白色"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def _save_atomic(image, path, options):
+    """先写临时文件再改名，读取方不会看到写了一半的缩略图"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def generate_thumbnails(source_path, outputs):
+    """
+    生成缩略图
+
+    outputs 为 [(目标路径, 宽, 高, 是否裁剪, 格式), ...]，同一尺寸的多种格式只缩放一次。
+    返回生成的路径列表。
+    """
+    generated = []
+    with Image.open(source_path) as original:
+        original.draft('RGB', max((w, h) for _, w, h, _, _ in outputs))
+        image = _prepare(original)
+        resized = {}
+        for path, width, height, crop, fmt in outputs:
+            key = (width, height, crop)
+            if key not in resized:
+                resized[key] = _resize(image, width, height, crop)
+            _save_atomic(resized[key], path, SAVE_OPTIONS[fmt])
+            generated.append(path)
+    return generated
@@ -0,0 +1,157 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from items.models import Item
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        '在当前进程内分别通过 WSGI 和 ASGI 处理器并发请求浏览页面，比较吞吐量和延迟。'
+        'WSGI 使用线程池模拟多线程工作进程，ASGI 使用单个事件循环（异步视图）。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64, help='并发请求数量')
+        parser.add_argument('--requests', type=int, default=1000, help='每种处理器的请求总数')
+        parser.add_argument('--path', action='append', dest='paths', help='要请求的路径，可重复；默认为首页、列表、详情和用户主页')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+
+    def _default_paths(self):
+        paths = ['/', '/list/', '/list/?' + urlencode({'q': '二手'})]
+        item = Item.objects.filter(status='active').select_related('seller').order_by('-created_at').first()
+        if item is None:
+            self.stdout.write(self.style.WARNING('没有在售物品，详情页和用户主页不参与测试'))
+        else:
+            paths += [f'/{item.pk}/', f'/users/profile/{item.seller.username}/']
+        return paths
+
+    # WSGI -----------------------------------------------------------------
+
+    def _wsgi_request(self, handler, url):
+        parts = urlsplit(url)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': parts.path,
+            'QUERY_STRING': parts.query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+        }
+        status = []
+        start = time.perf_counter()
+        response = handler(environ, lambda s, headers: status.append(s))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return time.perf_counter() - start, status[0].startswith('200')
+
+    def _run_wsgi(self, urls, concurrency):
+        handler = WSGIHandler()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(lambda url: self._wsgi_request(handler, url), urls))
+            return time.perf_counter() - start, results
+
+    # ASGI -----------------------------------------------------------------
+
+    async def _asgi_request(self, handler, url, semaphore):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': parts.path,
+            'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 80),
+        }
+        received = False
+        disconnect = asyncio.Event()
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(scope, receive, send)
+            elapsed = time.perf_counter() - start
+        disconnect.set()
+        return elapsed, status[0] == 200
+
+    def _run_asgi(self, urls, concurrency):
+        handler = ASGIHandler()
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self._asgi_request(handler, url, semaphore) for url in urls))
+            return time.perf_counter() - start, results
+
+        return asyncio.run(run())
+
+    # ---------------------------------------------------------------------
+
+    def _report(self, name, total, results):
+        latencies = [elapsed * 1000 for elapsed, _ in results]
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f'{name}: {len(results) / total:8.1f} req/s  '
+            f'p50 {_percentile(latencies, 50):7.1f} ms  '
+            f'p99 {_percentile(latencies, 99):7.1f} ms  '
+            f'mean {statistics.mean(latencies):7.1f} ms  '
+            f'错误 {errors}'
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self._default_paths()
+        urls = [paths[i % len(paths)] for i in range(options['requests'])]
+        concurrency = options['concurrency']
+        self.stdout.write(f'{len(urls)} 个请求，并发 {concurrency}，路径：{", ".join(paths)}')
+
+        runners = {'wsgi': self._run_wsgi, 'asgi': self._run_asgi}
+        modes = ['wsgi', 'asgi'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            # 预热：填充缓存、建立连接
+            runners[mode](paths, min(concurrency, len(paths)))
+            total, results = runners[mode](urls, concurrency)
+            self._report(mode.upper(), total, results)
@@ -0,0 +1,95 @@
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core import benchmark
+
+DEFAULT_DIR = os.path.join(settings.BASE_DIR, 'benchmarks')
+
+
+class Command(BaseCommand):
+    help = (
+        '在不同数据规模下基准测试各页面（首页、列表、详情、我的物品、个人中心、用户主页），'
+        '报告 p50/p99 延迟、查询次数和峰值内存，保存为 JSON 并与基线比较。'
+        '数据集用 generate_dataset 的生成器建立在单独的 SQLite 文件中，首次运行后复用。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,100000,1000000', help='物品数量，逗号分隔')
+        parser.add_argument('--seed', type=int, default=42, help='生成数据集的随机种子')
+        parser.add_argument('--repeat', type=int, default=50, help='每个页面计时的请求次数')
+        parser.add_argument('--warmup', type=int, default=3, help='每个页面计时前的预热请求次数')
+        parser.add_argument('--data-dir', default=os.path.join(DEFAULT_DIR, 'data'), help='数据集文件目录')
+        parser.add_argument('--output', default=os.path.join(DEFAULT_DIR, 'latest.json'), help='结果文件')
+        parser.add_argument('--baseline', default=os.path.join(DEFAULT_DIR, 'baseline.json'),
+                            help='基线文件；不存在时跳过比较，指定 --fail-on-regression 时报错退出')
+        parser.add_argument('--save-baseline', action='store_true', help='把本次结果同时保存为基线')
+        parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE,
+                            help='延迟超过基线的比例上限，默认 0.2 即 20%%')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='出现退化或没有基线时以非零状态退出')
+
+    def handle(self, *args, **options):
+        has_baseline = os.path.exists(options['baseline'])
+        # 基线与机器相关，不随代码提交；没有基线时比较不出退化，检查应当失败而不是悄悄通过
+        if options['fail_on_regression'] and not has_baseline and not options['save_baseline']:
+            raise CommandError(
+                f'基线文件 {options["baseline"]} 不存在，先在同一台机器上用 --save-baseline 运行一次生成基线'
+            )
+        scales = [int(value) for value in options['scales'].split(',') if value.strip()]
+        results = {}
+        for scale in scales:
+            path = os.path.join(options['data_dir'], f'bench-{scale}-{options["seed"]}.sqlite3')
+
+            def progress(name, done, total):
+                self.stdout.write(f'  生成数据 {name}：{done}/{total}')
+
+            if benchmark.prepare_dataset(path, scale, seed=options['seed'], progress=progress):
+                self.stdout.write(f'已生成数据集 {path}')
+
+            self.stdout.write(f'{scale} 个物品：')
+
+            def report(name, result):
+                self.stdout.write(
+                    f'  {name:22} p50 {result["p50_ms"]:8.2f} ms  p99 {result["p99_ms"]:8.2f} ms  '
+                    f'查询 {result["queries"]:3}  峰值内存 {result["peak_kb"]:9.1f} KB'
+                )
+
+            # 关闭 DEBUG，避免记录 SQL 影响计时
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']), benchmark.use_database(path):
+                results[str(scale)] = benchmark.benchmark_views(
+                    repeat=options['repeat'], warmup=options['warmup'], progress=report,
+                )
+
+        benchmark.save(options['output'], results)
+        self.stdout.write(f'结果已保存到 {options["output"]}')
+
+        regressions = 0
+        if not has_baseline:
+            self.stdout.write(self.style.WARNING(f'基线文件 {options["baseline"]} 不存在，跳过比较'))
+        else:
+            self.stdout.write(f'与基线 {options["baseline"]} 比较：')
+            for scale, view, metric, previous, current, regressed in benchmark.compare(
+                results, benchmark.load(options['baseline']), options['tolerance']
+            ):
+                change = (current - previous) / previous * 100 if previous else 0.0
+                line = f'  {scale:>8} {view:22} {metric:8} {previous:10.2f} -> {current:10.2f} ({change:+.1f}%)'
+                if regressed:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line + '  退化'))
+                else:
+                    self.stdout.write(line)
+
+        if options['save_baseline']:
+            benchmark.save(options['baseline'], results)
+            self.stdout.write(f'已保存为基线 {options["baseline"]}')
+
+        if regressions:
+            self.stdout.write(self.style.WARNING(f'{regressions} 项指标退化'))
+            if options['fail_on_regression']:
+                sys.exit(1)
+        else:
+            self.stdout.write(self.style.SUCCESS('完成！'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core import media_gc
+
+
+class Command(BaseCommand):
+    help = (
+        '删除媒体目录中不再被任何文件字段引用的原图和缩略图。'
+        '遍历和比较都是流式的，内存占用与文件数量无关。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除文件')
+        parser.add_argument('--grace', type=int, default=media_gc.DEFAULT_GRACE_SECONDS,
+                            help='修改时间在这么多秒以内的文件不删除，默认 3600')
+        parser.add_argument('--chunk-size', type=int, default=500, help='每次到数据库查询是否被引用的文件名数量')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'扫描目录：{", ".join(media_gc.upload_dirs())}、{media_gc.THUMBS_DIR}')
+        result = media_gc.collect(
+            dry_run=options['dry_run'],
+            grace=options['grace'],
+            chunk_size=options['chunk_size'],
+            progress=lambda result: self.stdout.write(f'已扫描 {result.scanned} 个文件'),
+        )
+        self.stdout.write(str(result))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('试运行，未删除任何文件'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'完成！删除 {result.orphans} 个孤立文件'))
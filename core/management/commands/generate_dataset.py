@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import synthetic
+from items import facets, feed, trending
+from users.ratings import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        '生成用于压力测试和性能基准的合成数据（用户、资料、分类、物品、评价）。'
+        'scale=1 时约 1,000 个用户、10,000 个物品；scale=100 时约 100 万个物品。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='数据量缩放因子')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子，相同种子生成相同数据')
+        parser.add_argument('--users', type=int, help='用户数量，覆盖 --scale')
+        parser.add_argument('--items', type=int, help='物品数量，覆盖 --scale')
+        parser.add_argument('--reviews', type=int, help='评价数量，覆盖 --scale')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每个事务写入的行数')
+        parser.add_argument('--password', default=synthetic.DEFAULT_PASSWORD, help='所有生成用户的密码')
+        parser.add_argument('--prefix', default='user', help='生成用户的用户名前缀')
+
+    def handle(self, *args, **options):
+        counts = synthetic.counts(
+            options['scale'], users=options['users'], items=options['items'], reviews=options['reviews'],
+        )
+        self.stdout.write(
+            f'生成 {counts["users"]} 个用户、{counts["items"]} 个物品、{counts["reviews"]} 条评价，'
+            f'随机种子 {options["seed"]}'
+        )
+        labels = {'users': '用户', 'items': '物品', 'reviews': '评价'}
+        started = time.perf_counter()
+
+        def progress(name, done, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{labels[name]}：{done}/{total}（已用 {elapsed:.1f}s）')
+
+        written = synthetic.generate(
+            counts['users'], counts['items'], counts['reviews'],
+            seed=options['seed'], password=options['password'], prefix=options['prefix'],
+            batch_size=options['batch_size'], progress=progress,
+        )
+
+        summaries = rebuild_summaries(batch_size=options['batch_size'])
+        self.stdout.write(f'重建 {summaries} 个用户的评分汇总')
+        trending.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write('重建物品热度和热门榜')
+        feed.invalidate()
+        facets.invalidate()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'完成！写入 {written["users"]} 个用户、{written["items"]} 个物品、'
+            f'{written["reviews"]} 条评价，耗时 {elapsed:.1f}s'
+        ))
+        self.stdout.write('相关物品推荐未生成，需要时运行 rebuild_related_items')
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import thumbnails
+from items.models import Item
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        '为已有的物品图片、头像和背景图片生成缩略图；'
+        '指定 --pending 时只生成请求中登记的缩略图，配合 --interval 作为常驻的生成进程'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='工作进程数量')
+        parser.add_argument('--force', action='store_true', help='重新生成已存在的缩略图')
+        parser.add_argument('--pending', action='store_true', help='只生成请求中登记的缩略图')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='与 --pending 一起使用：每隔这么多秒检查一次新的登记，0 表示处理完即退出')
+
+    def _jobs(self):
+        for item in Item.objects.exclude(image='').exclude(image=None).only('id', 'image').iterator():
+            yield item.image, ['card', 'detail']
+        profiles = Profile.objects.only('id', 'avatar', 'header_bg_image').iterator()
+        for profile in profiles:
+            yield profile.avatar, ['avatar']
+            yield profile.header_bg_image, ['header']
+
+    def handle(self, *args, **options):
+        def progress(finished, total):
+            if finished % 100 == 0 or finished == total:
+                self.stdout.write(f'已处理 {finished}/{total} 张图片')
+
+        if options['pending']:
+            while True:
+                done, failed = thumbnails.generate_pending(workers=options['workers'], progress=progress)
+                if done or failed or not options['interval']:
+                    self.stdout.write(self.style.SUCCESS(f'完成！生成 {done} 张图片的缩略图，失败 {failed} 张'))
+                if not options['interval']:
+                    return
+                time.sleep(options['interval'])
+
+        done, failed = thumbnails.generate_all(
+            self._jobs(), workers=options['workers'], force=options['force'], progress=progress
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'完成！生成 {done} 张图片的缩略图，失败 {failed} 张'))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from core.models import Category, Item
+from items.models import Category, Item
 from django.utils.text import slugify
 import uuid
 
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.purge import Purger
+from items import facets, feed
+from items.models import Item
+from users.models import Item as LegacyItem, Review
+from users.ratings import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        '清理所有物品、评价和非管理员用户（含资料及关联数据），并删除不再被引用的媒体文件。'
+        '按主键分批删除，不把数据载入内存；分类和管理员账户保留。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批删除的行数')
+        parser.add_argument('--keep', action='append', default=[], metavar='USERNAME',
+                            help='额外保留的用户名，可重复')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='不询问确认')
+
+    def handle(self, *args, **options):
+        keep = Q(is_superuser=True) | Q(is_staff=True) | Q(username='admin') | Q(username__in=options['keep'])
+        kept = list(User.objects.filter(keep).values_list('username', flat=True))
+
+        if options['interactive']:
+            self.stdout.write(self.style.WARNING('警告：此操作将删除所有物品、评价和非管理员用户！'))
+            self.stdout.write(f'保留的账户：{", ".join(kept) or "无"}')
+            if input("确认执行数据清理操作？(输入 'YES' 确认): ") != 'YES':
+                raise CommandError('操作已取消')
+
+        purger = Purger(batch_size=options['batch_size'])
+        steps = [
+            ('评价', Review.objects.all()),
+            ('物品', Item.objects.all()),
+            ('旧版物品', LegacyItem.objects.all()),
+            ('用户', User.objects.exclude(keep)),
+        ]
+        for label, queryset in steps:
+            total = purger.purge(queryset, progress=lambda done, label=label: self.stdout.write(
+                f'{label}：已删除 {done} 行'
+            ))
+            self.stdout.write(f'✓ {label}：共删除 {total} 行')
+
+        # 评价已清空，保留账户的评分汇总随之重建；首页和分面缓存失效
+        rebuild_summaries()
+        feed.invalidate()
+        facets.invalidate()
+
+        for label, count in sorted(purger.deleted.items()):
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(f'删除媒体文件 {purger.files_deleted} 个')
+        self.stdout.write(self.style.SUCCESS(f'完成！保留账户：{", ".join(kept) or "无"}'))
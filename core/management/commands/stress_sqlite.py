@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+from core.db import stress
+
+
+class Command(BaseCommand):
+    help = '在临时数据库上并发读写，比较 Django 自带 SQLite 后端与调优后端的锁错误数量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='并发线程数')
+        parser.add_argument('--operations', type=int, default=100, help='每个线程的操作次数')
+        parser.add_argument('--rows', type=int, default=1000, help='初始数据行数')
+
+    def handle(self, *args, **options):
+        for engine in (stress.STOCK_ENGINE, stress.TUNED_ENGINE):
+            with tempfile.TemporaryDirectory() as directory:
+                result = stress.run(
+                    engine, os.path.join(directory, 'stress.sqlite3'),
+                    threads=options['threads'], operations=options['operations'], rows=options['rows'],
+                )
+            style = self.style.SUCCESS if result.errors == 0 else self.style.WARNING
+            self.stdout.write(style(str(result)))
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db import replica
+
+
+class Command(BaseCommand):
+    help = '用 SQLite 备份 API 把主库复制到本地副本（settings.REPLICA_DB_PATH），可按间隔持续同步'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default=None, help='副本文件路径，默认为 REPLICA_DB_PATH')
+        parser.add_argument('--interval', type=float, default=None, help='持续同步的间隔秒数；不指定时只同步一次')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        target = options['target'] or settings.REPLICA_DB_PATH
+
+        while True:
+            start = time.perf_counter()
+            pages = replica.sync(source, target)
+            self.stdout.write(f'已同步 {pages} 页到 {target}，耗时 {time.perf_counter() - start:.2f}s')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,169 @@
+"""
+媒体文件服务
+
+替代 django.conf.urls.static.static()，用于生产环境：
+- 强 ETag：内容寻址的文件直接使用文件名中的哈希，其他文件使用 (大小, 修改时间)
+- 内容寻址的文件及其缩略图永不变化，返回 immutable 缓存头
+- 支持 If-None-Match（304）和单个字节范围的 Range 请求（206 / 416）
+- 配置 MEDIA_SENDFILE 后只返回响应头，由 nginx（X-Accel-Redirect）或
+  Apache/lighttpd（X-Sendfile）发送文件内容，Python 进程不再复制文件数据
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+# 内容寻址存储的文件名（见 core.storage），缩略图路径中同样包含
+CONTENT_HASH_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/([0-9a-f]{64})\.\w+')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _etag(path, stat):
+    match = CONTENT_HASH_RE.search(path)
+    if match:
+        if path.startswith('thumbs/'):
+            # 缩略图的 ETag 需与原图及其他尺寸区分
+            size, fmt = path.split('/')[1], path.rsplit('.', 1)[-1]
+            return f'"{match.group(1)[:32]}-{size}-{fmt}"'
+        return f'"{match.group(1)[:32]}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _cache_control(path):
+    if CONTENT_HASH_RE.search(path):
+        return IMMUTABLE_CACHE_CONTROL
+    return getattr(settings, 'MEDIA_CACHE_CONTROL', DEFAULT_CACHE_CONTROL)
+
+
+def parse_range(header, size):
+    """
+    解析 Range 请求头，返回 (start, end)（包含 end），不满足时返回 False
+
+    无法解析或包含多个范围时返回 None，按完整文件响应。
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        return False
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offload(path, full_path):
+    """
+    交给前端服务器发送文件，返回响应；未配置时返回 None
+
+    路径按 URL 编码：旧的上传文件可能是中文文件名，非 ASCII 的响应头会被 Django 编码为 RFC 2047 格式，
+    nginx 和 Apache 无法识别；两者都会先解码 URL 编码再查找文件。
+    """
+    mode = getattr(settings, 'MEDIA_SENDFILE', None)
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = quote(prefix + path)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = quote(full_path)
+        return response
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    """提供 MEDIA_ROOT 下的文件"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('文件不存在')
+    if not os.path.isfile(full_path):
+        raise Http404('文件不存在')
+
+    etag = _etag(path, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': _cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if '*' in etags or etag.removeprefix('W/') in (e.removeprefix('W/') for e in etags):
+            response = HttpResponseNotModified()
+            for name, value in headers.items():
+                response[name] = value
+            return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = _offload(path, full_path)
+    if response is not None:
+        # 前端服务器自行处理 Range，这里只提供响应头
+        response['Content-Type'] = content_type
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(full_path, start, end), status=206,
+                                         content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
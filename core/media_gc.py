@@ -0,0 +1,152 @@
+"""
+孤立媒体文件回收
+
+遍历 MEDIA_ROOT 下各文件字段的上传目录和缩略图目录，删除不再被任何文件字段引用的文件。
+
+内存占用与文件总数和单个目录的大小都无关：os.scandir 边读目录边产生文件，
+每攒够一块（chunk_size 个）文件名就用 IN 查询一次哪些仍被引用，
+任何时候只保存一块文件名和它的查询结果。
+
+修改时间在宽限期内的文件不删除（上传后数据库事务可能尚未提交），
+删除前再逐个确认一次没有被引用，避免与并发的上传竞争。
+"""
+
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+
+from .thumbnails import THUMBS_DIR, delete_thumbnails
+
+DEFAULT_GRACE_SECONDS = 3600
+
+
+def file_fields():
+    """项目中所有模型的文件字段：[(模型, 字段名), ...]"""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def upload_dirs():
+    """各文件字段的上传目录（upload_to 为字符串时），如 ['avatars', 'header_bg', 'items']"""
+    dirs = set()
+    for model, name in file_fields():
+        upload_to = model._meta.get_field(name).upload_to
+        if isinstance(upload_to, str) and upload_to.strip('/'):
+            dirs.add(upload_to.strip('/').split('/')[0])
+    return sorted(dirs)
+
+
+def referenced_among(names):
+    """names 中被任一文件字段引用的文件名集合"""
+    referenced = set()
+    for model, field in file_fields():
+        referenced.update(
+            model._base_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True)
+        )
+    return referenced
+
+
+def is_referenced(name):
+    return any(model._base_manager.filter(**{field: name}).exists() for model, field in file_fields())
+
+
+def walk(root, relative=''):
+    """按目录读取顺序逐个产生 (相对路径, DirEntry)，只包括普通文件；不会一次读入整个目录"""
+    path = os.path.join(root, relative) if relative else root
+    try:
+        it = os.scandir(path)
+    except FileNotFoundError:
+        return
+    with it:
+        for entry in it:
+            name = f'{relative}/{entry.name}' if relative else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry
+
+
+def chunked(iterable, size):
+    """把 iterable 分成不超过 size 个元素的列表"""
+    chunk = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CollectResult:
+
+    def __init__(self):
+        self.scanned = 0
+        self.orphans = 0
+        self.bytes = 0
+        self.skipped_fresh = 0
+
+    def __str__(self):
+        return (
+            f'扫描 {self.scanned} 个文件，孤立文件 {self.orphans} 个（{self.bytes / 1024 / 1024:.1f} MB），'
+            f'宽限期内跳过 {self.skipped_fresh} 个'
+        )
+
+
+def _original_name(thumb_name):
+    """thumbs/<尺寸>/<原图路径>.<格式> 对应的原图路径"""
+    return thumb_name.split('/', 2)[2].rsplit('.', 1)[0]
+
+
+def collect(dry_run=False, grace=DEFAULT_GRACE_SECONDS, chunk_size=500, progress=None, root=None):
+    """
+    查找并删除孤立的媒体文件，返回 CollectResult
+
+    progress(CollectResult) 每扫描 10,000 个文件调用一次。
+    """
+    from .models import StoredFile
+
+    root = root or settings.MEDIA_ROOT
+    cutoff = time.time() - grace
+    result = CollectResult()
+
+    def check(name, entry, original):
+        result.scanned += 1
+        if progress and result.scanned % 10000 == 0:
+            progress(result)
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime > cutoff:
+            result.skipped_fresh += 1
+            return
+        if is_referenced(original):
+            return
+        result.orphans += 1
+        result.bytes += stat.st_size
+        if dry_run:
+            return
+        os.remove(entry.path)
+        if name == original:
+            StoredFile.objects.filter(name=name).delete()
+            delete_thumbnails(name)
+
+    def files():
+        """(文件名, DirEntry, 对应的原图路径)；缩略图比较的是对应的原图路径"""
+        for directory in upload_dirs():
+            for name, entry in walk(root, directory):
+                yield name, entry, name
+        for name, entry in walk(root, THUMBS_DIR):
+            yield name, entry, _original_name(name)
+
+    for chunk in chunked(files(), chunk_size):
+        referenced = referenced_among([original for _, _, original in chunk])
+        for name, entry, original in chunk:
+            if original not in referenced:
+                check(name, entry, original)
+    return result
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.decorators import sync_and_async_middleware
+from asgiref.sync import iscoroutinefunction
+
+from .routers import PIN_COOKIE, RequestDatabaseState, request_database, safe_read_alias
+
+
+@sync_and_async_middleware
+def async_urlconf_middleware(get_response):
+    """ASGI 请求使用 ASYNC_ROOT_URLCONF，浏览类页面由异步视图处理"""
+    urlconf = getattr(settings, 'ASYNC_ROOT_URLCONF', None)
+
+    def select_urlconf(request):
+        if urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = urlconf
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            select_urlconf(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            select_urlconf(request)
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def database_routing_middleware(get_response):
+    """
+    为每个请求选择读库（见 core.routers）
+
+    GET/HEAD 请求读只读连接池；请求中发生写入时设置 Cookie，之后一段时间内该用户读主库。
+    """
+
+    def start(request):
+        read_alias = safe_read_alias() if request.method in ('GET', 'HEAD') else None
+        state = RequestDatabaseState(read_alias)
+        return state, request_database.set(state)
+
+    def finish(state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = start(request)
+            try:
+                return finish(state, await get_response(request))
+            finally:
+                request_database.reset(token)
+    else:
+        def middleware(request):
+            state, token = start(request)
+            try:
+                return finish(state, get_response(request))
+            finally:
+                request_database.reset(token)
+    return middleware
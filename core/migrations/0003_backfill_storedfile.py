@@ -0,0 +1,44 @@
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+# 当时使用内容寻址存储的文件字段（items/models.py、users/models.py 中的 track_stored_files）
+TRACKED_FIELDS = [
+    ('items', 'Item', 'image'),
+    ('users', 'Profile', 'avatar'),
+    ('users', 'Profile', 'header_bg_image'),
+]
+
+
+def backfill_refcounts(apps, schema_editor):
+    """为已有的图片建立引用计数，否则删除物品或清理数据时不会删除这些文件"""
+    StoredFile = apps.get_model('core', 'StoredFile')
+    counts = Counter()
+    for app_label, model_name, field in TRACKED_FIELDS:
+        model = apps.get_model(app_label, model_name)
+        rows = (
+            model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .values_list(field).annotate(total=Count('pk')).order_by()
+        )
+        counts.update(dict(rows))
+    StoredFile.objects.all().delete()
+    StoredFile.objects.bulk_create(
+        [StoredFile(name=name, refcount=total) for name, total in counts.items()],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_storedfile'),
+        ('items', '0009_alter_item_image'),
+        ('users', '0006_alter_profile_avatar_alter_profile_header_bg_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_refcounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_backfill_storedfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingThumbnail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='原图路径')),
+                ('size', models.CharField(max_length=20, verbose_name='尺寸')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登记时间')),
+            ],
+            options={
+                'verbose_name': '待生成缩略图',
+                'verbose_name_plural': '待生成缩略图',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pendingthumbnail',
+            constraint=models.UniqueConstraint(fields=('name', 'size'), name='core_pendingthumbnail_name_size'),
+        ),
+    ]
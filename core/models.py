@@ -27,4 +27,33 @@ class Category(models.Model):
         return self.name
 
 # Item模型已迁移到items应用中
-# 请使用items应用中的Item模型
\ No newline at end of file
+# 请使用items应用中的Item模型
+
+class StoredFile(models.Model):
+    """内容寻址存储中的文件及其引用计数"""
+    name = models.CharField(max_length=255, primary_key=True, verbose_name='文件路径')
+    refcount = models.IntegerField(default=0, verbose_name='引用次数')
+
+    class Meta:
+        verbose_name = '媒体文件'
+        verbose_name_plural = '媒体文件'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
+
+
+class PendingThumbnail(models.Model):
+    """等待生成的缩略图，由请求登记，generate_thumbnails --pending 在独立进程中生成"""
+    name = models.CharField(max_length=255, verbose_name='原图路径')
+    size = models.CharField(max_length=20, verbose_name='尺寸')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='登记时间')
+
+    class Meta:
+        verbose_name = '待生成缩略图'
+        verbose_name_plural = '待生成缩略图'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'size'], name='core_pendingthumbnail_name_size'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.size})'
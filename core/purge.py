@@ -0,0 +1,125 @@
+"""
+分批清理数据
+
+Django 的 QuerySet.delete() 会先把所有待删除的行和级联关联的对象载入内存，
+数据量大时无法完成。这里按主键分批，根据模型元数据找出引用关系，
+先删除依赖的行再删除本身，全部使用不加载对象的 DELETE 语句，每批一个事务。
+被删除的行引用的媒体文件在每批提交后按引用计数删除。
+"""
+
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+
+from . import storage
+
+
+def _dependents(model):
+    """指向 model 的外键：[(关联模型, 外键字段), ...]，包括多对多的中间表"""
+    return [
+        (relation.related_model, relation.field)
+        for relation in model._meta.get_fields(include_hidden=True)
+        if relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)
+    ]
+
+
+def _tracked_fields(model):
+    return [field for tracked, field in storage.TRACKED_FIELDS if tracked is model]
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class Purger:
+    """
+    删除指定的行及依赖它们的所有行
+
+    deleted 按模型统计删除的行数，files_deleted 为删除的媒体文件数。
+    """
+
+    def __init__(self, batch_size=500, using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.using = using
+        self.deleted = Counter()
+        self.files_deleted = 0
+        self._files = Counter()
+
+    def _raw_delete(self, model, column, values):
+        connection = connections[self.using]
+        table, column = connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(column)
+        with connection.cursor() as cursor:
+            for chunk in _chunks(values, self.batch_size):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', chunk)
+                self.deleted[model._meta.label] += cursor.rowcount
+
+    def _delete_related(self, model, field, values):
+        """处理引用 values 的 model 行"""
+        on_delete = field.remote_field.on_delete
+        manager = model._base_manager.using(self.using)
+        lookup = {f'{field.attname}__in': None}
+        if on_delete is models.SET_NULL:
+            for chunk in _chunks(values, self.batch_size):
+                lookup[f'{field.attname}__in'] = chunk
+                manager.filter(**lookup).update(**{field.attname: None})
+        elif on_delete in (models.CASCADE, models.DO_NOTHING):
+            # DO_NOTHING 的引用（如全文索引）同样删除，避免留下悬空的行
+            if _dependents(model) or _tracked_fields(model):
+                for chunk in _chunks(values, self.batch_size):
+                    lookup[f'{field.attname}__in'] = chunk
+                    self.delete(model, list(manager.filter(**lookup).values_list('pk', flat=True)))
+            else:
+                self._raw_delete(model, field.column, values)
+        else:
+            raise ValueError(f'{model._meta.label}.{field.name} 的删除方式不支持批量清理')
+
+    def delete(self, model, pks):
+        """删除 model 中主键为 pks 的行，先删除依赖它们的行"""
+        if not pks:
+            return
+        for related_model, field in _dependents(model):
+            target = field.target_field
+            if target.primary_key:
+                values = pks
+            else:
+                values = list(
+                    model._base_manager.using(self.using).filter(pk__in=pks)
+                    .values_list(target.attname, flat=True)
+                )
+            self._delete_related(related_model, field, values)
+
+        for name in _tracked_fields(model):
+            for chunk in _chunks(pks, self.batch_size):
+                self._files.update(
+                    model._base_manager.using(self.using).filter(pk__in=chunk)
+                    .exclude(**{name: ''}).exclude(**{f'{name}__isnull': True})
+                    .values_list(name, flat=True)
+                )
+        self._raw_delete(model, model._meta.pk.column, pks)
+
+    def purge(self, queryset, progress=None):
+        """
+        按主键分批删除 queryset 中的行，返回删除的行数
+
+        progress(已删除行数) 在每批提交后调用。
+        """
+        model = queryset.model
+        queryset = queryset.using(self.using).order_by('pk')
+        total = 0
+        last = None
+        while True:
+            page = queryset if last is None else queryset.filter(pk__gt=last)
+            pks = list(page.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return total
+            self._files.clear()
+            with transaction.atomic(using=self.using):
+                self.delete(model, pks)
+                storage.release_many(self._files)
+            self.files_deleted += storage.delete_unreferenced(list(self._files))
+            total += len(pks)
+            last = pks[-1]
+            if progress:
+                progress(total)
@@ -0,0 +1,103 @@
+"""
+数据库路由
+
+- 写入始终使用 default（主库）
+- GET/HEAD 请求的读查询使用只读连接池（DATABASES['readonly']，与主库是同一个文件）
+- 标记了 @replica_reads 的浏览页面从只读副本（settings.DATABASE_REPLICAS）中随机选一个读取
+- 用户写入后的 REPLICA_PIN_SECONDS 秒内，其请求全部读主库，保证能看到自己刚发布的内容
+  （副本同步有延迟）。写入由 db_for_write 记录，中间件据此设置 Cookie
+- 当前线程在 default 上处于事务中时仍从 default 读取，保证能读到本事务的写入
+"""
+
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ONLY_ALIAS = 'readonly'
+PIN_COOKIE = 'db_primary'
+
+
+class RequestDatabaseState:
+    """一个请求的读库选择和是否发生过写入"""
+
+    def __init__(self, read_alias=None):
+        self.read_alias = read_alias
+        self.wrote = False
+
+
+# 由 core.middleware.database_routing_middleware 为每个请求设置
+request_database = ContextVar('request_database', default=None)
+
+
+def _configured(alias):
+    return alias in connections.settings
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if _configured(alias)]
+
+
+def safe_read_alias():
+    """GET/HEAD 请求默认使用的读库"""
+    return READ_ONLY_ALIAS if _configured(READ_ONLY_ALIAS) else None
+
+
+def is_pinned(request):
+    """用户最近写入过，读主库"""
+    return bool(request.COOKIES.get(PIN_COOKIE))
+
+
+def replica_reads(view):
+    """浏览类视图使用：读查询发往只读副本"""
+    def choose(request):
+        state = request_database.get()
+        if state is None or state.wrote or is_pinned(request):
+            return
+        replicas = replica_aliases()
+        if replicas:
+            state.read_alias = random.choice(replicas)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            choose(request)
+            return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            choose(request)
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = request_database.get()
+        if state is None or state.read_alias is None:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = request_database.get()
+        if state is not None:
+            state.wrote = True
+            # 本请求之后的读取也回到主库
+            state.read_alias = None
+        # 从只读连接读取的对象保存时也写入 default
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 所有别名的数据相同
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == READ_ONLY_ALIAS or db in getattr(settings, 'DATABASE_REPLICAS', []):
+            return False
+        return None
@@ -0,0 +1,28 @@
+"""
+异步视图使用的辅助函数
+"""
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
+async def aget_user(request):
+    """
+    在线程中加载 request.user
+
+    request.user 是惰性对象，首次访问会查询 session 和用户表；Django 4.2 还没有 request.auser()。
+    """
+    def load():
+        request.user.is_authenticated
+        return request.user
+    return await sync_to_async(load)()
+
+
+async def arender(request, template_name, context=None):
+    """在线程中渲染模板：模板会访问 user、messages 等可能查询数据库的惰性对象"""
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def alist(queryset):
+    """用异步 ORM 取出查询集的全部结果"""
+    return [obj async for obj in queryset]
@@ -0,0 +1,233 @@
+"""
+内容寻址的媒体存储
+
+文件按内容的 SHA-256 命名（<上传目录>/<哈希前两位>/<哈希>.<扩展名>），
+相同内容只保存一份。StoredFile 记录每个文件被模型字段引用的次数，
+引用全部解除后在事务提交时删除文件及其缩略图。
+"""
+
+import hashlib
+import os
+import threading
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_file(file):
+    """分块计算文件内容的 SHA-256，file 为 django.core.files.File"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(directory, digest, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, digest[:2], digest + ext).replace(os.sep, '/')
+
+
+def _in_transaction():
+    return transaction.get_connection().in_atomic_block
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    按内容哈希命名的文件系统存储
+
+    上传处理器在接收时已计算哈希（content_hash），这里不必再读一遍文件。
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = getattr(content, 'content_hash', None) or hash_file(content)
+        name = content_name(os.path.dirname(name), digest, name)
+        from .models import StoredFile
+        # delete_unreferenced 在写锁内删除计数归零的记录和文件，这里的检查同样在写锁内进行
+        if _in_transaction():
+            # 外层事务已持有写锁直到模型保存完成，删除计数已归零的记录，
+            # 之后提交的删除回调不会再删除这个文件，引用计数由保存模型时的 acquire 重新建立
+            with transaction.atomic():
+                StoredFile.objects.filter(name=name, refcount__lte=0).delete()
+                if self.exists(name):
+                    return name
+                return super().save(name, content, max_length=max_length)
+        # 自动提交模式下写锁在返回后即释放：先占一个临时引用，
+        # 此后其他引用解除也不会删掉这个文件，保存模型时由 update_refcounts 认领；
+        # 模型保存失败时临时引用不会释放，文件只是多保留，rebuild_refcounts 可修正计数
+        with transaction.atomic():
+            acquire(name)
+            _provisional.names[name] += 1
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
+
+
+media_storage = ContentAddressedStorage()
+
+
+class _Provisional(threading.local):
+    """当前线程中 save 已占用、尚未由模型保存认领的引用"""
+
+    def __init__(self):
+        self.names = Counter()
+
+
+_provisional = _Provisional()
+
+
+def _claim_provisional(name):
+    """认领 save 为 name 占用的临时引用，没有时返回 False"""
+    if _provisional.names[name] <= 0:
+        return False
+    _provisional.names[name] -= 1
+    if not _provisional.names[name]:
+        del _provisional.names[name]
+    return True
+
+
+def acquire(name):
+    """增加文件的引用计数"""
+    if not name:
+        return
+    from .models import StoredFile
+    if not StoredFile.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        StoredFile.objects.create(name=name, refcount=1)
+
+
+def release(name):
+    """减少文件的引用计数，计数归零时在事务提交后删除文件"""
+    if not name:
+        return
+    from .models import StoredFile
+    if StoredFile.objects.filter(name=name).update(refcount=F('refcount') - 1):
+        transaction.on_commit(lambda: _delete_if_unreferenced(name))
+
+
+def _delete_if_unreferenced(name):
+    delete_unreferenced([name])
+
+
+def release_many(names, batch_size=500):
+    """
+    批量减少引用计数，names 为 {文件名: 减少的次数}
+
+    与删除数据在同一事务中调用；事务提交后用 delete_unreferenced 删除计数归零的文件。
+    """
+    from .models import StoredFile
+    by_count = {}
+    for name, count in names.items():
+        if name:
+            by_count.setdefault(count, []).append(name)
+    for count, group in by_count.items():
+        for start in range(0, len(group), batch_size):
+            StoredFile.objects.filter(name__in=group[start:start + batch_size]).update(
+                refcount=F('refcount') - count
+            )
+
+
+def delete_unreferenced(names, batch_size=500):
+    """删除 names 中引用计数已归零的文件及其缩略图，返回删除的文件数"""
+    from .models import StoredFile
+    from .thumbnails import delete_thumbnails
+    names = [name for name in names if name]
+    deleted = 0
+    for start in range(0, len(names), batch_size):
+        unreferenced = list(
+            StoredFile.objects.filter(name__in=names[start:start + batch_size], refcount__lte=0)
+            .values_list('name', flat=True)
+        )
+        for name in unreferenced:
+            # 逐个删除并重新检查计数，期间被重新引用的文件保留；
+            # 记录和文件在同一个写锁内删除，与 ContentAddressedStorage.save 的复用检查互斥
+            with transaction.atomic():
+                removed, _ = StoredFile.objects.filter(name=name, refcount__lte=0).delete()
+                if removed:
+                    media_storage.delete(name)
+            if removed:
+                delete_thumbnails(name)
+                deleted += 1
+    return deleted
+
+
+# 已登记的 (模型, 字段名)
+TRACKED_FIELDS = []
+
+
+def track(model, *fields):
+    """登记使用内容寻址存储的文件字段，模型保存和删除时维护引用计数"""
+    TRACKED_FIELDS.extend((model, field) for field in fields)
+    attnames = {field: model._meta.get_field(field).attname for field in fields}
+
+    def remember(sender, instance, **kwargs):
+        # 被 only()/defer() 排除的字段不记录，保存时不调整其计数
+        instance._stored_files = {
+            field: getattr(instance.__dict__[attname], 'name', instance.__dict__[attname]) or ''
+            for field, attname in attnames.items()
+            if attname in instance.__dict__
+        }
+
+    def update_refcounts(sender, instance, created, update_fields=None, **kwargs):
+        previous = getattr(instance, '_stored_files', {})
+        current = {}
+        for field in fields:
+            if update_fields is not None and field not in update_fields:
+                continue
+            new = getattr(instance, field).name or ''
+            old = '' if created else previous.get(field)
+            if old is None:
+                # 加载时未读取该字段，无法得知旧值
+                old = new
+            # 新上传的文件在 save 时已占用了引用，这里认领而不再重复计数
+            claimed = _claim_provisional(new) if new else False
+            if new != old:
+                if not claimed:
+                    acquire(new)
+                release(old)
+            elif claimed:
+                release(new)
+            current[field] = new
+        instance._stored_files = {**previous, **current}
+
+    def release_files(sender, instance, **kwargs):
+        for field in fields:
+            release(getattr(instance, field).name)
+
+    post_init.connect(remember, sender=model, weak=False)
+    post_save.connect(update_refcounts, sender=model, weak=False)
+    post_delete.connect(release_files, sender=model, weak=False)
+
+
+def referenced_names():
+    """统计所有登记字段引用的文件，返回 {文件名: 引用次数}"""
+    counts = Counter()
+    for model, field in TRACKED_FIELDS:
+        rows = (
+            model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .values_list(field).annotate(total=Count('pk')).order_by()
+        )
+        counts.update(dict(rows))
+    return counts
+
+
+def rebuild_refcounts(batch_size=1000):
+    """根据当前引用重建 StoredFile 表"""
+    from .models import StoredFile
+    with transaction.atomic():
+        StoredFile.objects.all().delete()
+        StoredFile.objects.bulk_create(
+            [StoredFile(name=name, refcount=total) for name, total in referenced_names().items()],
+            batch_size=batch_size,
+        )
@@ -0,0 +1,319 @@
+"""
+合成测试数据
+
+按固定随机种子生成用户、资料、分类、物品和评价，用于压力测试和性能基准。
+所有数据分块 bulk_create 写入，不触发逐行信号；密码哈希只计算一次，所有用户共用。
+全文索引和评分汇总在写入后批量维护，首页和分面缓存在结束时统一失效。
+"""
+
+import itertools
+import random
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from items import search
+from items.models import Category, Item
+from items.pricing import price_bounds
+from users.models import Profile, Review
+
+DEFAULT_PASSWORD = 'password123'
+
+# scale=1 时各类数据的数量
+BASE_COUNTS = {'users': 1000, 'items': 10000, 'reviews': 3000}
+
+# 数据的时间跨度（天）
+SPAN_DAYS = 365
+
+# 分类：(品牌/修饰, 物品名称)
+CATEGORIES = {
+    '电子产品': (
+        ['小米', '华为', '苹果', '联想', '索尼', '罗技', '戴尔', 'OPPO', 'vivo', '漫步者'],
+        ['手机', '平板电脑', '笔记本电脑', '蓝牙耳机', '机械键盘', '无线鼠标', '充电宝', '显示器', '移动硬盘', '智能手环'],
+    ),
+    '书籍教材': (
+        ['高等数学', '线性代数', '大学英语', '概率论', '数据结构', '微观经济学', '有机化学', '大学物理', 'C语言', '考研政治'],
+        ['教材', '习题册', '辅导书', '真题集', '笔记', '课本', '参考书'],
+    ),
+    '生活用品': (
+        ['宜家', '无印良品', '美的', '小熊', '飞利浦', '九阳'],
+        ['台灯', '电风扇', '收纳箱', '保温杯', '电热水壶', '床上桌', '晾衣架', '插线板', '吹风机', '加湿器'],
+    ),
+    '衣物鞋帽': (
+        ['优衣库', '耐克', '阿迪达斯', '李宁', '安踏', '波司登', '森马'],
+        ['羽绒服', '运动鞋', '卫衣', '牛仔裤', '外套', '帆布鞋', '毛衣', '棒球帽'],
+    ),
+    '运动户外': (
+        ['迪卡侬', '李宁', '尤尼克斯', '斯伯丁', '威尔胜'],
+        ['羽毛球拍', '篮球', '瑜伽垫', '哑铃', '跳绳', '乒乓球拍', '帐篷', '登山包'],
+    ),
+    '乐器': (
+        ['雅马哈', '卡西欧', '珠江', '敦煌'],
+        ['民谣吉他', '电子琴', '尤克里里', '口琴', '古筝', '竹笛'],
+    ),
+    '交通工具': (
+        ['捷安特', '美利达', '永久', '凤凰', '小牛', '雅迪'],
+        ['自行车', '山地车', '电动车', '滑板车', '头盔', '车锁'],
+    ),
+    '其他物品': (
+        ['全新', '闲置', '毕业季'],
+        ['绿植', '台历', '桌游', '拼图', '手账本', '相机三脚架'],
+    ),
+}
+
+QUALIFIERS = ['', '', '九成新', '八成新', '全新未拆', '自用', '毕业清仓', '低价转让', '急出', '几乎全新']
+DESCRIPTION_PHRASES = [
+    '毕业了带不走，低价转让。',
+    '买来没用几次，功能完好。',
+    '外观有轻微使用痕迹，不影响使用。',
+    '配件齐全，包装盒还在。',
+    '可以校内面交，也可以邮寄。',
+    '价格可小刀，诚心要的私聊。',
+    '宿舍楼下自提，晚上八点以后都在。',
+    '保修期内，有购买凭证。',
+    '一直放在柜子里，保存得很好。',
+    '非诚勿扰，不议价。',
+    '有意者请留言或者加微信。',
+    '换了新的所以出掉旧的。',
+]
+REVIEW_PHRASES = [
+    '交易很顺利，卖家很靠谱！',
+    '物品和描述一致，推荐。',
+    '卖家很耐心，回复很及时。',
+    '性价比很高，下次还来。',
+    '面交很准时，东西不错。',
+    '有点小瑕疵，但可以接受。',
+    '包装很用心，物流也快。',
+    '和描述有些出入，沟通后解决了。',
+]
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍鹏宇浩然子轩欣怡思雨晨阳博文雅琪'
+BIOS = [
+    '热爱学习，喜欢分享。',
+    '即将毕业，有很多闲置物品。',
+    '喜欢运动和摄影。',
+    '诚信交易，欢迎咨询。',
+    '',
+]
+
+# 评分分布偏向好评
+RATING_WEIGHTS = [1, 2, 5, 20, 72]
+STATUS_WEIGHTS = {'active': 80, 'sold': 15, 'inactive': 5}
+
+
+def counts(scale=1.0, **overrides):
+    """按缩放因子计算各类数据的数量，overrides 中非 None 的值优先"""
+    result = {name: max(1, int(base * scale)) for name, base in BASE_COUNTS.items()}
+    result.update({name: value for name, value in overrides.items() if value is not None})
+    return result
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """临时关闭 auto_now / auto_now_add，使 bulk_create 保留生成的时间"""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objects, batch_size=5000, after_batch=None, progress=None):
+    """
+    分块写入 objects（可以是生成器），每块一个事务，返回写入的行数
+
+    after_batch(batch) 在同一事务中调用，此时 batch 中的对象已有主键。
+    """
+    total = 0
+    objects = iter(objects)
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            return total
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            if after_batch:
+                after_batch(batch)
+        total += len(batch)
+        if progress:
+            progress(total)
+
+
+class Generator:
+    """按随机种子生成模型实例，相同的种子和参数得到相同的数据"""
+
+    def __init__(self, seed=42, password=DEFAULT_PASSWORD, now=None):
+        self.random = random.Random(seed)
+        # PBKDF2 很慢，只计算一次
+        self.password = make_password(password)
+        self.now = now or timezone.now()
+
+    def _timestamp(self, after=None):
+        """过去 SPAN_DAYS 天内的时间，越近越密集；after 给出时不早于 after"""
+        start = after or self.now - timedelta(days=SPAN_DAYS)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=span * (1 - self.random.random() ** 2))
+
+    def name(self):
+        return self.random.choice(SURNAMES) + ''.join(
+            self.random.choice(GIVEN_NAMES) for _ in range(self.random.randint(1, 2))
+        )
+
+    def title(self, category):
+        brands, nouns = CATEGORIES.get(category, CATEGORIES['其他物品'])
+        return ''.join(part for part in (
+            self.random.choice(QUALIFIERS), self.random.choice(brands), self.random.choice(nouns),
+        ) if part)
+
+    def description(self, title):
+        phrases = self.random.sample(DESCRIPTION_PHRASES, self.random.randint(2, 4))
+        return f'出{title}，' + ''.join(phrases)
+
+    def price(self):
+        roll = self.random.random()
+        if roll < 0.1:
+            return '面议'
+        low = self.random.choice([5, 10, 15, 20, 30, 50, 80, 100, 150, 200, 300, 500, 800, 1200, 2000])
+        if roll < 0.25:
+            return f'{low}-{low + self.random.choice([10, 20, 50, 100])}'
+        return str(low)
+
+    def users(self, start, count, prefix='user'):
+        for n in range(start, start + count):
+            yield User(
+                username=f'{prefix}{n:07d}',
+                email=f'{prefix}{n:07d}@example.com',
+                password=self.password,
+                date_joined=self._timestamp(),
+            )
+
+    def profiles(self, users):
+        for user in users:
+            yield Profile(
+                user_id=user.pk,
+                nickname=self.name(),
+                qq=str(self.random.randint(10_000_000, 9_999_999_999)),
+                wechat=f'wx{self.random.randint(100_000, 999_999)}',
+                bio=self.random.choice(BIOS),
+                created_at=user.date_joined,
+            )
+
+    def items(self, count, seller_ids, categories):
+        """categories 为 [(pk, 名称), ...]"""
+        statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+        conditions = [value for value, _ in Item.CONDITION_CHOICES]
+        trade_methods = [value for value, _ in Item.TRADE_METHOD_CHOICES]
+        for _ in range(count):
+            category_id, category = self.random.choice(categories)
+            title = self.title(category)
+            price = self.price()
+            price_min, price_max = price_bounds(price)
+            created_at = self._timestamp()
+            yield Item(
+                title=title,
+                description=self.description(title),
+                category_id=category_id,
+                price=price,
+                price_min=price_min,
+                price_max=price_max,
+                trade_method=self.random.choice(trade_methods),
+                contact=f'wx{self.random.randint(100_000, 999_999)}',
+                condition=self.random.choice(conditions),
+                seller_id=self.random.choice(seller_ids),
+                status=self.random.choices(statuses, weights)[0],
+                # 浏览次数为长尾分布
+                view_count=int(self.random.paretovariate(1.2) * 5) - 5,
+                created_at=created_at,
+                updated_at=created_at,
+            )
+
+    def reviews(self, count, user_ids):
+        for _ in range(count):
+            reviewer, reviewed = self.random.sample(user_ids, 2)
+            yield Review(
+                content=self.random.choice(REVIEW_PHRASES),
+                rating=self.random.choices(range(1, 6), RATING_WEIGHTS)[0],
+                reviewer_id=reviewer,
+                reviewed_user_id=reviewed,
+                created_at=self._timestamp(),
+            )
+
+
+def ensure_categories():
+    """创建缺少的分类，返回 [(pk, 名称), ...]"""
+    for name in CATEGORIES:
+        if not Category.objects.filter(name=name).exists():
+            Category.objects.create(name=name)
+    return list(Category.objects.filter(name__in=CATEGORIES).values_list('pk', 'name'))
+
+
+def next_user_number(prefix):
+    """
+    已有的 <prefix><编号> 用户中最大编号加一
+
+    不能用同前缀的用户数：编号可能不连续（用户被删除），也可能有不带编号的同前缀用户（如 user_admin）。
+    编号位数相同时按字符串比较即按数值比较，先按长度排序。
+    """
+    last = (
+        User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]+$')
+        .annotate(length=Length('username')).order_by('-length', '-username')
+        .values_list('username', flat=True).first()
+    )
+    return int(last[len(prefix):]) + 1 if last else 0
+
+
+def generate(users, items, reviews, seed=42, password=DEFAULT_PASSWORD, prefix='user',
+             batch_size=5000, progress=None):
+    """
+    生成数据，返回各类数据写入的行数
+
+    progress(名称, 已完成, 总数) 在每块写入后调用。
+    已有同前缀的用户时从其后继续编号，可以多次运行逐步扩充数据集。
+    """
+    generator = Generator(seed=seed, password=password)
+
+    def report(name, total):
+        return (lambda done: progress(name, done, total)) if progress else None
+
+    categories = ensure_categories()
+    start = next_user_number(prefix)
+    user_ids = []
+
+    def add_profiles(batch):
+        # 用户的 post_save 信号不会触发，资料在同一事务中补上
+        user_ids.extend(user.pk for user in batch)
+        Profile.objects.bulk_create(generator.profiles(batch), batch_size=batch_size)
+
+    written = {}
+    written['users'] = bulk_insert(
+        User, generator.users(start, users, prefix), batch_size,
+        after_batch=add_profiles, progress=report('users', users),
+    )
+
+    def add_to_index(batch):
+        search.index_rows(((item.pk, item.title, item.description) for item in batch), batch_size)
+
+    with explicit_timestamps(Item, 'created_at', 'updated_at'):
+        written['items'] = bulk_insert(
+            Item, generator.items(items, user_ids, categories), batch_size,
+            after_batch=add_to_index, progress=report('items', items),
+        )
+
+    if len(user_ids) > 1:
+        with explicit_timestamps(Review, 'created_at'):
+            written['reviews'] = bulk_insert(
+                Review, generator.reviews(reviews, user_ids), batch_size, progress=report('reviews', reviews),
+            )
+    else:
+        written['reviews'] = 0
+    return written
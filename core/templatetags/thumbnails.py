@@ -0,0 +1,14 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(obj, size):
+    """
+    物品或用户资料的缩略图地址
+
+    用法：{{ item|thumbnail:"card" }}、{{ item|thumbnail:"card.jpeg" }}、{{ profile|thumbnail:"header" }}
+    """
+    size, _, fmt = size.partition('.')
+    return obj.get_image_url(size, fmt or 'webp')
@@ -1,3 +1,688 @@
-from django.test import TestCase
+import hashlib
+import importlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import unquote
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models.fields.files import FieldFile
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import benchmark, imaging, media_gc, storage, synthetic, thumbnails, uploads
+from .db import replica, stress as db_stress
+from .models import PendingThumbnail, StoredFile
+from .routers import PIN_COOKIE, ReplicaRouter, RequestDatabaseState, replica_reads, request_database
+from items import search
+from items.models import Category, Item
+from users.models import RatingSummary, Review
+
+
+def image_bytes(size=(1000, 600), mode='RGB', fmt='PNG'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 30, 30)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        os.makedirs(os.path.join(self.media_root, 'items'))
+        with open(os.path.join(self.media_root, 'items', 'photo.png'), 'wb') as f:
+            f.write(image_bytes(mode='RGBA'))
+        self.file = FieldFile(None, Item._meta.get_field('image'), 'items/photo.png')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_generate_sizes_and_formats(self):
+        outputs = thumbnails._outputs(self.file.name, ['card', 'detail'])
+        imaging.generate_thumbnails(thumbnails._path(self.file.name), outputs)
+
+        for size, fmt, expected in [
+            ('card', 'webp', (400, 300)),
+            ('card', 'jpeg', (400, 300)),
+            ('detail', 'webp', (800, 480)),
+        ]:
+            self.assertTrue(thumbnails.is_ready(self.file, size, fmt))
+            with Image.open(thumbnails._path(thumbnails.thumbnail_name(self.file.name, size, fmt))) as image:
+                self.assertEqual(image.size, expected)
+                self.assertEqual(image.format, fmt.upper())
+
+    def test_fallback_to_original_while_pending(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.assertEqual(thumbnails.thumbnail_url(self.file, 'card'), self.file.url)
+        schedule.assert_called_once_with(self.file, ['card'])
+        self.assertIsNone(thumbnails.thumbnail_url(FieldFile(None, self.file.field, None), 'card'))
+
+    def test_thumbnail_url_when_ready(self):
+        imaging.generate_thumbnails(
+            thumbnails._path(self.file.name), thumbnails._outputs(self.file.name, ['card'])
+        )
+        self.assertEqual(thumbnails.thumbnail_url(self.file, 'card'), '/media/thumbs/card/items/photo.png.webp')
+        self.assertEqual(
+            thumbnails.thumbnail_url(self.file, 'card', 'jpeg'), '/media/thumbs/card/items/photo.png.jpeg'
+        )
+
+    def test_schedule_queues_without_process_pool(self):
+        thumbnails._queued.clear()
+        with mock.patch.object(thumbnails, 'ProcessPoolExecutor') as pool:
+            thumbnails.schedule(self.file, ['card', 'detail'])
+            thumbnails.schedule(self.file, ['card'])
+        pool.assert_not_called()
+        self.assertEqual(
+            sorted(PendingThumbnail.objects.values_list('name', 'size')),
+            [('items/photo.png', 'card'), ('items/photo.png', 'detail')],
+        )
+
+        out = StringIO()
+        call_command('generate_thumbnails', pending=True, workers=1, stdout=out)
+        self.assertIn('生成 1 张图片的缩略图', out.getvalue())
+        self.assertTrue(thumbnails.is_ready(self.file, 'card'))
+        self.assertTrue(thumbnails.is_ready(self.file, 'detail'))
+        self.assertFalse(PendingThumbnail.objects.exists())
+
+    def test_generate_all(self):
+        done, failed = thumbnails.generate_all([(self.file, ['avatar']), (self.file, ['avatar'])], workers=1)
+        self.assertEqual((done, failed), (2, 0))
+        self.assertTrue(thumbnails.is_ready(self.file, 'avatar', 'jpeg'))
+        # 已生成的不再重复生成
+        self.assertEqual(thumbnails.generate_all([(self.file, ['avatar'])], workers=1), (0, 0))
+
+
+class ImageUploadTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.user = User.objects.create_user(username='seller', password='pass12345678')
+        self.category = Category.objects.create(name='书籍')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def post_item(self, content, name='photo.png'):
+        return self.client.post(reverse('item_create'), {
+            'title': '二手教材',
+            'category': self.category.pk,
+            'description': '九成新教材，无笔记无划线',
+            'price': '20',
+            'trade_method': Item.TRADE_METHOD_CHOICES[0][0],
+            'contact': 'wx123',
+            'condition': Item.CONDITION_CHOICES[0][0],
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def test_valid_image(self):
+        response = self.post_item(image_bytes(fmt='JPEG'), name='photo.jpg')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Item.objects.get().image)
+
+    def test_renamed_file_rejected(self):
+        response = self.post_item(b'<?php echo "not an image"; ?>' * 10)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(uploads.FORMAT_ERROR, response.context['form'].errors['image'])
+        self.assertFalse(Item.objects.exists())
+
+    def test_streaming_handler_installed_by_view(self):
+        new_file = uploads.StreamingImageUploadHandler.new_file
+        with mock.patch.object(uploads.StreamingImageUploadHandler, 'new_file',
+                               autospec=True, side_effect=new_file) as spy:
+            self.post_item(image_bytes())
+        spy.assert_called_once()
+        # 其他视图仍使用默认的上传处理器
+        self.assertNotIn('core.uploads.StreamingImageUploadHandler', settings.FILE_UPLOAD_HANDLERS)
+
+    def test_csrf_checked_after_handlers_replaced(self):
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+        response = self.post_item(image_bytes())
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Item.objects.exists())
+
+    def test_size_limit_enforced_while_streaming(self):
+        handler = uploads.StreamingImageUploadHandler()
+        handler.new_file('image', 'photo.png', 'image/png', None)
+        content = image_bytes()
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=len(content) // 2):
+            for start in range(0, len(content), 1024):
+                handler.receive_data_chunk(content[start:start + 1024], start)
+            file = handler.file_complete(len(content))
+        self.assertIsNotNone(file.upload_error)
+        # 超限后不再写入，临时文件已清空
+        self.assertEqual(len(file.read()), 0)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_pixel_dimensions_rejected(self):
+        response = self.post_item(image_bytes(size=(200, 200)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('图片尺寸过大（200×200），请上传较小的图片', response.context['form'].errors['image'])
+
+    def test_format_mismatch_rejected(self):
+        # PNG 文件头后接 JPEG 数据
+        content = b'\x89PNG\r\n\x1a\n' + image_bytes(fmt='JPEG')
+        response = self.post_item(content)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Item.objects.exists())
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.user = User.objects.create_user(username='seller', password='pass12345678')
+        self.category = Category.objects.create(name='书籍')
+        self.content = image_bytes()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def create_item(self, name='photo.png'):
+        return Item.objects.create(
+            title='二手教材', category=self.category, description='九成新', price='20',
+            contact='wx123', seller=self.user, image=SimpleUploadedFile(name, self.content),
+        )
+
+    def test_identical_uploads_stored_once(self):
+        first = self.create_item('a.PNG')
+        second = self.create_item('b.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^items/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(StoredFile.objects.get(name=first.image.name).refcount, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create_item()
+        second = self.create_item()
+        path = first.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_replacing_image_releases_old_file(self):
+        item = self.create_item()
+        old = item.image.name
+        item.image = SimpleUploadedFile('new.jpg', image_bytes(fmt='JPEG'))
+        with mock.patch('items.models.schedule_thumbnails'), self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertFalse(storage.media_storage.exists(old))
+        self.assertEqual(StoredFile.objects.get().name, item.image.name)
+
+    def test_dedupe_existing_files(self):
+        os.makedirs(os.path.join(self.media_root, 'items'))
+        for name in ('items/photo.png', 'items/photo_3NX6BiO.png'):
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(self.content)
+        Item.objects.bulk_create([
+            Item(title='二手教材', category=self.category, description='九成新', price='20',
+                 contact='wx123', seller=self.user, image=name)
+            for name in ('items/photo.png', 'items/photo_3NX6BiO.png', 'items/photo.png')
+        ])
+
+        call_command('dedupe_media', stdout=StringIO())
+
+        names = set(Item.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(storage.media_storage.exists(name))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'items')), [name.split('/')[1]])
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 3)
+
+
+    def test_reupload_during_pending_delete(self):
+        # 最后一个引用已删除、删除回调尚未执行时上传了相同内容
+        first = self.create_item()
+        path = first.image.path
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        # 新上传复用了文件，删除回调在保存模型（acquire）之前执行
+        name = storage.media_storage.save('items/photo.png', SimpleUploadedFile('photo.png', self.content))
+        self.assertEqual(name, first.image.name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        second = self.create_item()
+        self.assertEqual(StoredFile.objects.get(name=second.image.name).refcount, 1)
+
+    def test_reference_dropped_between_save_and_acquire(self):
+        # 自动提交模式下 save 复用了仍被引用的文件，保存模型之前最后一个引用被删除
+        first = self.create_item()
+        path = first.image.path
+        with mock.patch.object(storage, '_in_transaction', return_value=False):
+            name = storage.media_storage.save('items/photo.png', SimpleUploadedFile('photo.png', self.content))
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        second = Item.objects.create(
+            title='二手教材', category=self.category, description='九成新', price='20',
+            contact='wx123', seller=self.user, image=name,
+        )
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_backfill_migration(self):
+        legacy = self.create_item()
+        StoredFile.objects.all().delete()
+        migration = importlib.import_module('core.migrations.0003_backfill_storedfile')
+        migration.backfill_refcounts(apps, None)
+        self.assertEqual(StoredFile.objects.get(name=legacy.image.name).refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            legacy.delete()
+        self.assertFalse(storage.media_storage.exists(legacy.image.name))
+
+
+class MediaServingTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.content = image_bytes()
+        self.digest = hashlib.sha256(self.content).hexdigest()
+        self.name = f'items/{self.digest[:2]}/{self.digest}.png'
+        os.makedirs(os.path.dirname(os.path.join(self.media_root, self.name)))
+        with open(os.path.join(self.media_root, self.name), 'wb') as f:
+            f.write(self.content)
+        self.url = '/media/' + self.name
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_full_response(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], f'"{self.digest[:32]}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range 不匹配时返回完整文件
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_legacy_file_revalidates(self):
+        with open(os.path.join(self.media_root, 'items', 'photo.png'), 'wb') as f:
+            f.write(self.content)
+        response = self.client.get('/media/items/photo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+
+    def test_path_traversal(self):
+        self.assertEqual(self.client.get('/media/items/../../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/items/missing.png').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], f'"{self.digest[:32]}"')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, self.name))
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_offload_non_ascii_name(self):
+        name = 'items/旧照片 1.png'
+        with open(os.path.join(self.media_root, name), 'wb') as f:
+            f.write(self.content)
+        response = self.client.get('/media/' + name)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/items/%E6%97%A7%E7%85%A7%E7%89%87%201.png'
+        )
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get('/media/' + name)
+        self.assertTrue(response['X-Sendfile'].isascii())
+        self.assertEqual(unquote(response['X-Sendfile']), os.path.join(self.media_root, name))
+
+
+class SQLiteProfileTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'stress.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_no_lock_errors_under_concurrency(self):
+        result = db_stress.run(db_stress.TUNED_ENGINE, self.path, threads=12, operations=60)
+        self.assertEqual(result.errors, 0)
+
+    def test_pragmas_and_read_only_pool(self):
+        sqlite3.connect(self.path).close()
+        handler = ConnectionHandler({
+            'default': {'ENGINE': db_stress.TUNED_ENGINE, 'NAME': self.path},
+            'readonly': {'ENGINE': db_stress.TUNED_ENGINE, 'NAME': self.path, 'READ_ONLY': True, 'POOL_SIZE': 2},
+        })
+        with handler['default'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+
+        readonly = handler['readonly']
+        with readonly.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM t')
+            with self.assertRaises(OperationalError):
+                cursor.execute('INSERT INTO t (id) VALUES (1)')
+        raw = readonly.connection
+        readonly.close()
+        # 出错过的连接不放回连接池
+        readonly.connect()
+        self.assertIsNot(readonly.connection, raw)
+        with readonly.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM t')
+        raw = readonly.connection
+        readonly.close()
+        # 关闭后放回连接池，下次连接复用同一个 sqlite3 连接
+        readonly.connect()
+        self.assertIs(readonly.connection, raw)
+        readonly.close()
+        handler['default'].close()
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Item))
+        state = RequestDatabaseState('readonly')
+        token = request_database.set(state)
+        try:
+            self.assertEqual(router.db_for_read(Item), 'readonly')
+            self.assertEqual(router.db_for_write(Item), 'default')
+            # 写入之后本请求的读取回到主库
+            self.assertTrue(state.wrote)
+            self.assertIsNone(router.db_for_read(Item))
+        finally:
+            request_database.reset(token)
+        self.assertFalse(router.allow_migrate('readonly', 'items'))
+
+    @override_settings(DATABASE_REPLICAS=['readonly'])
+    def test_replica_reads(self):
+        view = replica_reads(lambda request: request_database.get().read_alias)
+        request = RequestFactory().get('/')
+        token = request_database.set(RequestDatabaseState())
+        try:
+            self.assertEqual(view(request), 'readonly')
+        finally:
+            request_database.reset(token)
+
+        # 最近写入过的用户读主库
+        request.COOKIES[PIN_COOKIE] = '1'
+        token = request_database.set(RequestDatabaseState())
+        try:
+            self.assertIsNone(view(request))
+        finally:
+            request_database.reset(token)
+
+    def test_sync_replica(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+        conn.executemany('INSERT INTO t (id) VALUES (?)', [(i,) for i in range(1, 101)])
+        conn.commit()
+        target = os.path.join(self.directory, 'replica.sqlite3')
+        replica.sync(self.path, target, pages=1)
+        conn.execute('INSERT INTO t (id) VALUES (101)')
+        conn.commit()
+        replica_conn = sqlite3.connect(target)
+        self.assertEqual(replica_conn.execute('SELECT COUNT(*) FROM t').fetchone()[0], 100)
+        replica.sync(self.path, target)
+        self.assertEqual(replica_conn.execute('SELECT COUNT(*) FROM t').fetchone()[0], 101)
+        replica_conn.close()
+        conn.close()
+
+
+class ReplicaPinTests(TestCase):
+
+    def test_write_pins_reads_to_primary(self):
+        user = User.objects.create_user(username='seller', password='pass12345678')
+        category = Category.objects.create(name='书籍')
+        self.client.force_login(user)
+        response = self.client.get(reverse('item_list'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.post(reverse('item_create'), {
+            'title': '二手教材', 'category': category.pk, 'description': '九成新教材，无笔记无划线',
+            'price': '20', 'trade_method': Item.TRADE_METHOD_CHOICES[0][0], 'contact': 'wx123',
+            'condition': Item.CONDITION_CHOICES[0][0],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_dataset(self):
+        out = StringIO()
+        call_command('generate_dataset', users=20, items=120, reviews=40, batch_size=50, stdout=out)
+        self.assertIn('完成！', out.getvalue())
+
+        users = User.objects.filter(username__startswith='user')
+        self.assertEqual(users.count(), 20)
+        # 每个用户都有资料，共用同一个预先计算的密码哈希
+        self.assertEqual(users.filter(profile__isnull=False).count(), 20)
+        self.assertEqual(users.values('password').distinct().count(), 1)
+        self.assertTrue(users.first().check_password(synthetic.DEFAULT_PASSWORD))
+
+        self.assertEqual(Item.objects.count(), 120)
+        self.assertEqual(Review.objects.count(), 40)
+        self.assertEqual(sum(RatingSummary.objects.values_list('count', flat=True)), 40)
+        item = Item.objects.exclude(price='面议').first()
+        self.assertIsNotNone(item.price_min)
+        self.assertTrue(search.search_items(Item.objects.all(), item.title).filter(pk=item.pk).exists())
+
+        # 再次运行时从已有用户之后继续编号
+        call_command('generate_dataset', users=5, items=0, reviews=0, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='user').count(), 25)
+
+    def test_numbering_skips_existing_users(self):
+        User.objects.create_user(username='user_admin')
+        for n in (0, 3, 12):
+            User.objects.create_user(username=f'user{n:07d}')
+        self.assertEqual(synthetic.next_user_number('user'), 13)
+        call_command('generate_dataset', users=3, items=0, reviews=0, stdout=StringIO())
+        self.assertTrue(User.objects.filter(username='user0000015').exists())
+        self.assertEqual(synthetic.next_user_number('other'), 0)
+
+    def test_seed_is_deterministic(self):
+        categories = [(1, '书籍教材'), (2, '电子产品')]
+        first = [item.title for item in synthetic.Generator(seed=7).items(20, [1, 2], categories)]
+        second = [item.title for item in synthetic.Generator(seed=7).items(20, [1, 2], categories)]
+        other = [item.title for item in synthetic.Generator(seed=8).items(20, [1, 2], categories)]
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+
+class ViewBenchmarkTests(TestCase):
+
+    def test_benchmark_views(self):
+        seller = User.objects.create_user(username='seller', password='pass12345678')
+        category = Category.objects.create(name='书籍')
+        Item.objects.create(title='二手高等数学教材', description='九成新', category=category,
+                            price='20', contact='wx123', seller=seller)
+        results = benchmark.benchmark_views(repeat=3, warmup=1)
+        self.assertEqual(
+            set(results),
+            {name for name, _, _ in benchmark.scenarios(seller, Item.objects.get(), category)},
+        )
+        for result in results.values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreaterEqual(result['peak_kb'], 0)
+        self.assertGreater(results['dashboard']['queries'], 0)
+
+    def test_missing_baseline_fails_before_running(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        missing = os.path.join(directory, 'baseline.json')
+        with mock.patch.object(benchmark, 'prepare_dataset') as prepare:
+            with self.assertRaisesMessage(CommandError, '不存在'):
+                call_command('benchmark_views', baseline=missing, fail_on_regression=True, stdout=StringIO())
+        prepare.assert_not_called()
+
+    def test_compare(self):
+        baseline = {'1000': {'home': {'p50_ms': 10.0, 'p99_ms': 20.0, 'queries': 2}}}
+        results = {
+            '1000': {'home': {'p50_ms': 11.0, 'p99_ms': 30.0, 'queries': 3}},
+            '100000': {'home': {'p50_ms': 50.0, 'p99_ms': 60.0, 'queries': 2}},
+        }
+        rows = benchmark.compare(results, baseline, tolerance=0.2)
+        self.assertEqual(
+            [(metric, regressed) for _, _, metric, _, _, regressed in rows],
+            [('p50_ms', False), ('p99_ms', True), ('queries', True)],
+        )
+
+
+class PurgeDataTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.category = Category.objects.create(name='书籍')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_purge_keeps_admins_and_removes_files(self):
+        admin = User.objects.create_superuser(username='root', password='pass12345678')
+        shared, own = image_bytes(), image_bytes(size=(300, 200))
+        with mock.patch('users.models.schedule_thumbnails'), mock.patch('items.models.schedule_thumbnails'):
+            admin.profile.avatar = SimpleUploadedFile('a.png', shared)
+            admin.profile.save()
+            sellers = [User.objects.create_user(username=f'seller{i}', password='pass12345678') for i in range(3)]
+            for i, seller in enumerate(sellers):
+                seller.profile.avatar = SimpleUploadedFile('b.png', shared)
+                seller.profile.save()
+                for _ in range(2):
+                    Item.objects.create(
+                        title=f'二手教材{i}', category=self.category, description='九成新', price='20',
+                        contact='wx123', seller=seller, image=SimpleUploadedFile('c.png', own),
+                    )
+            Item.objects.create(title='管理员的物品', category=self.category, description='九成新',
+                                price='20', contact='wx123', seller=admin)
+        Review.objects.create(content='很好', rating=5, reviewer=sellers[0], reviewed_user=admin)
+        item_file = Item.objects.exclude(image='').first().image.path
+        avatar_file = admin.profile.avatar.path
+
+        out = StringIO()
+        call_command('purge_data', interactive=False, batch_size=2, stdout=out)
+
+        self.assertIn('完成！', out.getvalue())
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['root'])
+        self.assertFalse(Item.objects.exists())
+        self.assertFalse(Review.objects.exists())
+        self.assertFalse(search.search_items(Item.objects.all(), '二手教材').exists())
+        # 只被删除数据引用的文件被删除，管理员仍在使用的文件保留
+        self.assertFalse(os.path.exists(item_file))
+        self.assertTrue(os.path.exists(avatar_file))
+        self.assertEqual(StoredFile.objects.get().refcount, 1)
+        self.assertEqual(RatingSummary.objects.filter(user=admin).count(), 0)
+
+
+class MediaGarbageCollectorTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        seller = User.objects.create_user(username='seller', password='pass12345678')
+        with mock.patch('items.models.schedule_thumbnails'):
+            self.item = Item.objects.create(
+                title='二手教材', category=Category.objects.create(name='书籍'), description='九成新',
+                price='20', contact='wx123', seller=seller, image=SimpleUploadedFile('a.png', image_bytes()),
+            )
+        # 旧版文件名：目录 items/ab 与文件 items/ab.png 同名
+        Item.objects.filter(pk=self.item.pk).update(image='items/ab.png')
+        self.referenced = ['items/ab.png', f'{thumbnails.THUMBS_DIR}/card/items/ab.png.webp']
+        self.orphans = ['items/ab/old.png', 'avatars/old.png', f'{thumbnails.THUMBS_DIR}/card/items/gone.png.webp']
+        self.fresh = 'items/new.png'
+        old = time.time() - 2 * media_gc.DEFAULT_GRACE_SECONDS
+        # 原先上传的内容寻址文件已不被引用
+        self.stored = self.item.image.name
+        os.utime(os.path.join(self.media_root, self.stored), (old, old))
+        for name in self.referenced + self.orphans + [self.fresh]:
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x')
+            if name != self.fresh:
+                os.utime(path, (old, old))
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_dry_run(self):
+        result = media_gc.collect(dry_run=True)
+        self.assertEqual(result.orphans, len(self.orphans) + 1)
+        self.assertEqual(result.skipped_fresh, 1)
+        self.assertTrue(all(self.exists(name) for name in self.orphans + [self.stored]))
+
+    def test_chunks_smaller_than_directory(self):
+        result = media_gc.collect(dry_run=True, chunk_size=1)
+        self.assertEqual(result.orphans, len(self.orphans) + 1)
+        self.assertEqual(result.skipped_fresh, 1)
+
+    def test_collect(self):
+        out = StringIO()
+        call_command('gc_media', stdout=out)
+        self.assertIn('完成！', out.getvalue())
+        self.assertFalse(any(self.exists(name) for name in self.orphans + [self.stored]))
+        self.assertTrue(all(self.exists(name) for name in self.referenced + [self.fresh]))
+        self.assertFalse(StoredFile.objects.filter(name=self.stored).exists())
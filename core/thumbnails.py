@@ -0,0 +1,176 @@
+"""
+缩略图
+
+列表、首页和头像不再直接使用原图，而是使用固定尺寸的 WebP / JPEG 缩略图。
+缩略图保存在 MEDIA_ROOT/thumbs/<尺寸>/<原图路径>.<格式>。请求中只在 PendingThumbnail 表登记，
+由 generate_thumbnails --pending 在独立的进程池中生成，Web 进程不创建子进程；
+缩略图尚未生成时返回原图地址。
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .imaging import generate_thumbnails
+
+logger = logging.getLogger(__name__)
+
+# 尺寸名: (宽, 高, 是否裁剪)
+SIZES = {
+    'card': (400, 300, True),
+    'detail': (800, 800, False),
+    'avatar': (256, 256, True),
+    'header': (1200, 400, True),
+}
+FORMATS = ('webp', 'jpeg')
+THUMBS_DIR = 'thumbs'
+
+# 本进程已登记过的 (原图, 尺寸)，避免每次渲染都写数据库；超过上限时清空
+_queued = set()
+QUEUED_MEMORY = 10000
+_lock = threading.Lock()
+
+
+def thumbnail_name(name, size, fmt='webp'):
+    """缩略图在存储中的相对路径"""
+    return f'{THUMBS_DIR}/{size}/{name}.{fmt}'
+
+
+def _path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def is_ready(file, size, fmt='webp'):
+    return bool(file) and os.path.exists(_path(thumbnail_name(file.name, size, fmt)))
+
+
+def _outputs(name, sizes):
+    return [
+        (_path(thumbnail_name(name, size, fmt)), *SIZES[size], fmt)
+        for size in sizes
+        for fmt in FORMATS
+    ]
+
+
+def schedule(file, sizes):
+    """登记待生成的缩略图，同一图片的同一尺寸只登记一次"""
+    from .models import PendingThumbnail
+    if not file:
+        return
+    name = file.name
+    # 上传的文件名不会重复，已生成的缩略图无需再生成；原图不存在时无从生成
+    sizes = [size for size in sizes if not is_ready(file, size)]
+    if not sizes or not os.path.exists(_path(name)):
+        return
+    with _lock:
+        sizes = [size for size in sizes if (name, size) not in _queued]
+        if len(_queued) + len(sizes) > QUEUED_MEMORY:
+            _queued.clear()
+        _queued.update((name, size) for size in sizes)
+    if sizes:
+        PendingThumbnail.objects.bulk_create(
+            [PendingThumbnail(name=name, size=size) for size in sizes], ignore_conflicts=True
+        )
+
+
+def _process_pool(workers=None):
+    workers = workers or getattr(settings, 'THUMBNAIL_WORKERS', 2)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _generate(executor, tasks, progress=None):
+    """在进程池中生成 tasks（[(原图名称, 尺寸列表), ...]），返回 (成功数量, 失败数量)"""
+    done = failed = 0
+    futures = {
+        executor.submit(generate_thumbnails, _path(name), _outputs(name, sizes)): name
+        for name, sizes in tasks
+    }
+    for future in futures:
+        try:
+            future.result()
+            done += 1
+        except Exception as e:
+            failed += 1
+            logger.warning('生成缩略图失败 %s: %s', futures[future], e)
+        if progress:
+            progress(done + failed, len(tasks))
+    return done, failed
+
+
+def generate_all(jobs, workers=None, force=False, progress=None):
+    """
+    批量生成缩略图（用于管理命令）
+
+    jobs 为 [(图片文件, 尺寸列表), ...]，在独立的进程池中并行生成。
+    返回 (成功数量, 失败数量)。
+    """
+    tasks = []
+    for file, sizes in jobs:
+        if not file or not os.path.exists(_path(file.name)):
+            continue
+        if not force:
+            sizes = [size for size in sizes if not is_ready(file, size)]
+        if sizes:
+            tasks.append((file.name, sizes))
+    with _process_pool(workers) as executor:
+        return _generate(executor, tasks, progress)
+
+
+def generate_pending(workers=None, batch_size=200, progress=None):
+    """
+    生成请求中登记的缩略图，处理过的登记随即删除；失败的只记录日志，
+    可用不带 --pending 的 generate_thumbnails 补齐。
+
+    按登记顺序分批处理，返回 (成功数量, 失败数量)。
+    """
+    from .models import PendingThumbnail
+    done = failed = 0
+    last_pk = 0
+    # 进程池在第一次提交任务时才启动子进程，没有登记时不产生开销
+    with _process_pool(workers) as executor:
+        while True:
+            rows = list(PendingThumbnail.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            by_name = {}
+            for row in rows:
+                if row.size in SIZES and not os.path.exists(_path(thumbnail_name(row.name, row.size))):
+                    by_name.setdefault(row.name, []).append(row.size)
+            tasks = [(name, sizes) for name, sizes in by_name.items() if os.path.exists(_path(name))]
+            batch_done, batch_failed = _generate(executor, tasks, progress)
+            done += batch_done
+            failed += batch_failed
+            PendingThumbnail.objects.filter(pk__in=[row.pk for row in rows]).delete()
+    return done, failed
+
+
+def delete_thumbnails(name):
+    """删除某张原图的全部缩略图"""
+    for size in SIZES:
+        for fmt in FORMATS:
+            path = thumbnail_name(name, size, fmt)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+
+
+def thumbnail_url(file, size, fmt='webp'):
+    """
+    缩略图地址
+
+    缩略图已生成时返回缩略图地址；否则登记生成任务并返回原图地址。
+    没有图片时返回 None。
+    """
+    if not file:
+        return None
+    if size is None:
+        return file.url
+    if is_ready(file, size, fmt):
+        return default_storage.url(thumbnail_name(file.name, size, fmt))
+    schedule(file, [size])
+    return file.url
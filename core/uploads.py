@@ -0,0 +1,160 @@
+"""
+图片上传
+
+上传文件按块写入临时文件，内存占用与文件大小无关；写入过程中即检查大小上限，
+超限后丢弃后续数据。表单校验时先根据文件头识别真实格式，再只解析图片头部读取像素尺寸，
+尺寸超限的图片（如解压炸弹）在完整解码之前就被拒绝。
+"""
+
+import hashlib
+from functools import wraps
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+# 文件头特征，用于识别真实格式
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+SNIFF_BYTES = 16
+
+FORMAT_ERROR = '不支持的文件格式，请上传图片文件（JPG、PNG、GIF、WebP）'
+
+
+def max_upload_size():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_SIZE', 5 * 1024 * 1024)
+
+
+def max_pixels():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 40_000_000)
+
+
+def max_side():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_SIDE', 10000)
+
+
+def size_error():
+    return f'图片文件太大，请上传小于{max_upload_size() // (1024 * 1024)}MB的图片'
+
+
+def sniff_format(header):
+    """根据文件头返回图片格式（JPEG / PNG / GIF / WEBP），无法识别时返回 None"""
+    for signature, fmt in SIGNATURES:
+        if header.startswith(signature):
+            return fmt
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+class StreamingImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    按块写入临时文件，并在写入时识别格式、检查大小
+
+    不合格的文件不再写入后续数据，错误信息记录在 upload_error 上，由表单字段报告。
+    写入的同时计算内容的 SHA-256，供内容寻址存储使用。
+    """
+    chunk_size = 64 * 1024
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.received = 0
+        self.header = b''
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if len(self.header) < SNIFF_BYTES:
+            self.header += raw_data[:SNIFF_BYTES - len(self.header)]
+            if len(self.header) == SNIFF_BYTES and sniff_format(self.header) is None:
+                self._reject(FORMAT_ERROR)
+                return None
+        if self.received > max_upload_size():
+            self._reject(size_error())
+            return None
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def _reject(self, error):
+        self.error = error
+        self.file.seek(0)
+        self.file.truncate()
+
+    def file_complete(self, file_size):
+        if self.error is None and sniff_format(self.header) is None:
+            self._reject(FORMAT_ERROR)
+        file = super().file_complete(file_size)
+        file.upload_error = self.error
+        # 内容寻址存储直接使用这里算好的哈希
+        file.content_hash = None if self.error else self.digest.hexdigest()
+        return file
+
+
+def image_uploads(view):
+    """
+    视图装饰器：该视图的上传文件由 StreamingImageUploadHandler 接收
+
+    只用于表单中的文件字段都是图片的视图，其他视图（如 admin）仍使用默认的上传处理器。
+    CSRF 中间件会在视图之前读取 request.POST，因此先豁免，替换处理器之后再做 CSRF 检查。
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        request.upload_handlers = [StreamingImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapped
+
+
+class SafeImageField(forms.ImageField):
+    """
+    校验上传图片的表单字段
+
+    在 Django 完整读取图片之前检查大小、真实格式和像素尺寸。
+    """
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return None
+        error = getattr(data, 'upload_error', None)
+        if error:
+            raise forms.ValidationError(error, code='invalid_image')
+        if data.size is not None and data.size > max_upload_size():
+            raise forms.ValidationError(size_error(), code='invalid_image')
+
+        data.seek(0)
+        fmt = sniff_format(data.read(SNIFF_BYTES))
+        data.seek(0)
+        if fmt is None:
+            raise forms.ValidationError(FORMAT_ERROR, code='invalid_image')
+
+        # Image.open 只解析文件头，不解码像素数据
+        try:
+            with Image.open(data) as image:
+                width, height = image.size
+                opened_format = image.format
+        except Image.DecompressionBombError:
+            raise forms.ValidationError('图片尺寸过大，请上传较小的图片', code='invalid_image')
+        except Exception:
+            raise forms.ValidationError(self.error_messages['invalid_image'], code='invalid_image')
+        finally:
+            data.seek(0)
+
+        if opened_format != fmt:
+            raise forms.ValidationError(FORMAT_ERROR, code='invalid_image')
+        if width * height > max_pixels() or max(width, height) > max_side():
+            raise forms.ValidationError(
+                f'图片尺寸过大（{width}×{height}），请上传较小的图片', code='invalid_image'
+            )
+        return super().to_python(data)
@@ -0,0 +1,87 @@
+"""
+物品卡片片段缓存
+
+列表页每个物品渲染两次（网格卡片和列表行），这里把两段 HTML 按
+(item.pk, updated_at, 分类名称) 缓存起来。一页的所有片段用一次 get_many 取出，
+只渲染未命中的物品，再用一次 set_many 写回。
+片段对所有用户相同，收藏按钮等与当前用户有关的部分在片段外渲染。
+键由每次请求从数据库读出的物品字段组成，不依赖失效操作，进程内缓存时各进程也不会显示旧片段。
+"""
+
+import hashlib
+import logging
+import time
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import thumbnails
+
+logger = logging.getLogger(__name__)
+
+CARD_TEMPLATE = 'includes/item_card.html'
+ROW_TEMPLATE = 'includes/item_row.html'
+CARD_TIMEOUT = 60 * 60 * 24
+# 模板修改后递增，使旧片段失效
+CARD_VERSION = 3
+
+
+def card_key(item):
+    """
+    物品更新或分类改名后键随之变化，旧片段自然过期
+
+    缩略图生成前渲染的片段使用原图地址，键中包含缩略图是否就绪，生成后即改用新片段。
+    """
+    category = hashlib.md5(item.category.name.encode()).hexdigest()[:8]
+    thumb = int(thumbnails.is_ready(item.image, 'card'))
+    return f'items:card:{CARD_VERSION}:{item.pk}:{item.updated_at.timestamp()}:{category}:{thumb}'
+
+
+def _render(item):
+    context = {'item': item}
+    return {
+        'grid': render_to_string(CARD_TEMPLATE, context),
+        'row': render_to_string(ROW_TEMPLATE, context),
+    }
+
+
+class CardStats:
+    """一页卡片渲染的统计信息"""
+
+    def __init__(self, hits, misses, duration):
+        self.hits = hits
+        self.misses = misses
+        self.duration = duration
+
+    def server_timing(self):
+        return f'cards;dur={self.duration * 1000:.2f};desc="hit {self.hits} miss {self.misses}"'
+
+
+def render_cards(items):
+    """
+    返回 ([{'item', 'grid', 'row'}, ...], CardStats)
+
+    片段已是渲染好的 HTML，模板中直接输出。
+    """
+    start = time.perf_counter()
+    keys = [card_key(item) for item in items]
+    cached = cache.get_many(keys)
+
+    cards = []
+    missing = {}
+    for item, key in zip(items, keys):
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = missing[key] = _render(item)
+        cards.append({
+            'item': item,
+            'grid': mark_safe(fragment['grid']),
+            'row': mark_safe(fragment['row']),
+        })
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+
+    stats = CardStats(len(keys) - len(missing), len(missing), time.perf_counter() - start)
+    logger.debug('item cards: %d hits, %d misses, %.2f ms', stats.hits, stats.misses, stats.duration * 1000)
+    return cards, stats
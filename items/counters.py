@@ -0,0 +1,120 @@
+"""
+物品浏览计数
+
+item_detail 每次访问都执行 UPDATE 会让所有详情页请求排队等待 SQLite 的写锁。
+这里先在进程内存中累加，由后台线程每隔 VIEW_COUNT_FLUSH_INTERVAL 秒合并写入一次，
+每批只执行一条 UPDATE（CASE 按物品给出增量）。
+
+写入失败时增量放回缓冲区，下次重试；进程正常退出时（atexit）再写入一次，
+因此计数至少写入一次，只有进程崩溃时会丢失最后几秒的计数。
+缓冲区按数据库名称区分，切换数据库（如测试结束后）时旧数据库的计数不会写入新数据库。
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 5
+FLUSH_BATCH_SIZE = 300
+
+_lock = threading.Lock()
+# {数据库名称: Counter({物品 id: 增量})}
+_pending = {}
+_flusher = None
+_pid = None
+
+
+def flush_interval():
+    return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+
+def _database():
+    return str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+
+
+def _ensure_flusher():
+    """首次计数时启动后台线程；fork 出的子进程丢弃继承的缓冲区并重新启动"""
+    global _flusher, _pid
+    if _pid == os.getpid() and _flusher is not None:
+        return
+    _pid = os.getpid()
+    _pending.clear()
+    interval = flush_interval()
+    if interval:
+        _flusher = threading.Thread(target=_run, args=(interval,), name='view-count-flusher', daemon=True)
+        _flusher.start()
+    else:
+        _flusher = False
+
+
+def _run(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        finally:
+            connections.close_all()
+
+
+def record(item_id):
+    """记录一次浏览，不访问数据库"""
+    database = _database()
+    with _lock:
+        _ensure_flusher()
+        _pending.setdefault(database, Counter())[item_id] += 1
+
+
+def pending(item_id):
+    """尚未写入数据库的浏览次数"""
+    with _lock:
+        counts = _pending.get(_database())
+        return counts[item_id] if counts else 0
+
+
+def _write(counts):
+    from . import trending
+    from .models import Item
+    ids = list(counts)
+    for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+        batch = ids[start:start + FLUSH_BATCH_SIZE]
+        increment = Case(
+            *(When(pk=pk, then=Value(counts[pk])) for pk in batch),
+            default=Value(0), output_field=IntegerField(),
+        )
+        Item.objects.filter(pk__in=batch).update(view_count=F('view_count') + increment)
+    # 同一事务中把这批浏览计入热度
+    trending.record_views(counts)
+
+
+def flush():
+    """把当前数据库缓冲的计数写入数据库，返回写入的物品数"""
+    database = _database()
+    with _lock:
+        counts = _pending.pop(database, None)
+    if not counts:
+        return 0
+    try:
+        with transaction.atomic():
+            _write(counts)
+    except Exception as e:
+        # 放回缓冲区，下次重试
+        with _lock:
+            _pending.setdefault(database, Counter()).update(counts)
+        if isinstance(e, OperationalError):
+            logger.info('浏览计数写入失败，稍后重试：%s', e)
+        else:
+            logger.exception('浏览计数写入失败')
+        return 0
+    return len(counts)
+
+
+atexit.register(flush)
@@ -0,0 +1,113 @@
+"""
+物品列表的分面统计
+
+对当前搜索条件下的物品，一次 GROUP BY (category, condition, trade_method)
+查询得到所有组合的数量，再在 Python 中汇总出各分面的计数。
+每个分面的计数会应用其他分面的已选条件、但不应用自身条件，
+这样用户在选中某个分类后仍能看到其他分类的数量。
+
+结果按规范化后的查询条件缓存，物品变更时通过递增版本号整体失效。
+没有配置共享缓存时版本号是每个进程各自的，有效期按 core.caching.timeout() 缩短。
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from core import caching
+
+# 参与分面的字段，对应 GET 参数名
+FACET_FIELDS = {
+    'category': 'category_id',
+    'condition': 'condition',
+    'trade_method': 'trade_method',
+}
+
+CACHE_TIMEOUT = 300
+GENERATION_KEY = 'items:facets:generation'
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+async def _ageneration():
+    return await cache.aget_or_set(GENERATION_KEY, 1, None)
+
+
+def invalidate():
+    """物品变更后使所有分面缓存失效"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def normalize_params(params):
+    """规范化影响分面结果的查询参数（与分面选择无关）"""
+    return {
+        'q': ' '.join((params.get('q') or '').lower().split()),
+        'min_price': params.get('min_price') or '',
+        'max_price': params.get('max_price') or '',
+    }
+
+
+def _params_digest(params):
+    raw = json.dumps(normalize_params(params), sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _cache_key(params):
+    return f'items:facets:{_generation()}:{_params_digest(params)}'
+
+
+def _group_query(queryset):
+    return queryset.order_by().values_list(*FACET_FIELDS.values()).annotate(total=Count('id'))
+
+
+def _group_counts(queryset):
+    """一次分组查询，返回 [(category_id, condition, trade_method, 数量), ...]"""
+    return [tuple(row) for row in _group_query(queryset)]
+
+
+def _summarize(groups, selected):
+    names = list(FACET_FIELDS)
+    counts = {name: {} for name in names}
+    for row in groups:
+        values, total = row[:-1], row[-1]
+        for i, name in enumerate(names):
+            # 其他分面的已选条件必须满足
+            if all(
+                selected.get(other) in (None, '') or str(values[j]) == str(selected[other])
+                for j, other in enumerate(names) if j != i
+            ):
+                counts[name][values[i]] = counts[name].get(values[i], 0) + total
+    return counts
+
+
+def facet_counts(queryset, params, selected):
+    """
+    计算分面计数
+
+    queryset 为应用了搜索和价格条件、但未应用分面条件的查询集；
+    params 为请求参数（用于缓存键）；selected 为 {分面名: 已选值}。
+    返回 {分面名: {取值: 数量}}。
+    """
+    key = _cache_key(params)
+    groups = cache.get(key)
+    if groups is None:
+        groups = _group_counts(queryset)
+        cache.set(key, groups, caching.timeout(CACHE_TIMEOUT))
+    return _summarize(groups, selected)
+
+
+async def afacet_counts(queryset, params, selected):
+    """facet_counts() 的异步版本"""
+    key = f'items:facets:{await _ageneration()}:{_params_digest(params)}'
+    groups = await cache.aget(key)
+    if groups is None:
+        groups = [tuple(row) async for row in _group_query(queryset)]
+        await cache.aset(key, groups, caching.timeout(CACHE_TIMEOUT))
+    return _summarize(groups, selected)
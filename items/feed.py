@@ -0,0 +1,138 @@
+"""
+首页数据缓存
+
+首页的最新物品、热门物品和分类只在物品或分类变更时才会变化，这里把它们缓存起来，
+并在 Item / Category 的 post_save、post_delete 以及热门榜前几名变化时精确失效。
+
+缓存键带版本号：失效时递增版本号，正在重建的旧版本数据不会覆盖新版本。
+并发未命中时只有拿到锁的请求重建，其余请求等待重建结果。
+没有配置共享缓存时，版本号和重建锁都只在当前进程内有效，其他进程的首页要等缓存过期才更新，
+有效期按 core.caching.timeout() 缩短。
+"""
+
+import asyncio
+import time
+
+from django.core.cache import cache
+
+from core import caching
+
+from .models import Item, Category
+from .trending import top_items, top_links
+
+# 首页显示的最新物品数量
+LATEST_ITEMS_COUNT = 6
+
+FEED_TIMEOUT = 60 * 60
+VERSION_KEY = 'items:home_feed:version'
+# 重建锁的超时时间，防止重建进程异常退出后一直持有锁
+LOCK_TIMEOUT = 10
+# 等待其他请求重建的最长时间和轮询间隔
+WAIT_TIMEOUT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+async def _aversion():
+    return await cache.aget_or_set(VERSION_KEY, 1, None)
+
+
+def invalidate():
+    """物品或分类变更后使首页缓存失效"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _latest_items():
+    return Item.objects.filter(status='active').select_related('category').order_by('-created_at')[:LATEST_ITEMS_COUNT]
+
+
+def build_home_feed():
+    """从数据库查询首页数据"""
+    latest_items = list(_latest_items())
+    categories = list(Category.objects.all())
+    return {
+        'latest_items': latest_items,
+        'trending_items': top_items(),
+        'categories': categories,
+    }
+
+
+def get_home_feed():
+    """获取首页数据，未命中时合并并发重建"""
+    version = _version()
+    feed_key = f'items:home_feed:{version}'
+    lock_key = f'{feed_key}:lock'
+
+    feed = cache.get(feed_key)
+    if feed is not None:
+        return feed
+
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            feed = build_home_feed()
+            cache.set(feed_key, feed, caching.timeout(FEED_TIMEOUT))
+        finally:
+            cache.delete(lock_key)
+        return feed
+
+    # 其他请求正在重建，等待其结果
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        feed = cache.get(feed_key)
+        if feed is not None:
+            return feed
+
+    # 等待超时，直接查询数据库
+    return build_home_feed()
+
+
+async def abuild_home_feed():
+    """
+    build_home_feed() 的异步版本
+
+    Django 4.2 的异步 ORM 通过 sync_to_async(thread_sensitive=True) 在同一个线程中执行查询，
+    三个查询即使用 gather 也只能依次执行，这里直接按顺序等待。
+    """
+    latest_items = [item async for item in _latest_items()]
+    trending_items = [link.item async for link in top_links()]
+    categories = [category async for category in Category.objects.all()]
+    return {
+        'latest_items': latest_items,
+        'trending_items': trending_items,
+        'categories': categories,
+    }
+
+
+async def aget_home_feed():
+    """get_home_feed() 的异步版本，等待其他请求重建时不占用线程"""
+    version = await _aversion()
+    feed_key = f'items:home_feed:{version}'
+    lock_key = f'{feed_key}:lock'
+
+    feed = await cache.aget(feed_key)
+    if feed is not None:
+        return feed
+
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            feed = await abuild_home_feed()
+            await cache.aset(feed_key, feed, caching.timeout(FEED_TIMEOUT))
+        finally:
+            await cache.adelete(lock_key)
+        return feed
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        feed = await cache.aget(feed_key)
+        if feed is not None:
+            return feed
+
+    return await abuild_home_feed()
@@ -1,5 +1,7 @@
 from django import forms
+from core.uploads import SafeImageField
 from .models import Item, Category
+from .pricing import parse_price
 
 
 class ItemForm(forms.ModelForm):
@@ -11,6 +13,7 @@ class ItemForm(forms.ModelForm):
             'title', 'category', 'description', 'price', 'trade_method', 
             'contact', 'condition', 'image'
         ]
+        field_classes = {'image': SafeImageField}
         widgets = {
             'title': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -80,6 +83,15 @@ class ItemForm(forms.ModelForm):
             raise forms.ValidationError('物品描述太短，请至少输入10个字符')
         return description.strip()
     
+    def clean_price(self):
+        """验证价格格式，面议或留空统一保存为“面议”"""
+        price = (self.cleaned_data.get('price') or '').strip()
+        try:
+            price_min, _ = parse_price(price)
+        except ValueError:
+            raise forms.ValidationError('价格格式不正确，请输入数字（如：100）、区间（如：50-100）或“面议”')
+        return price if price_min is not None else '面议'
+    
     def clean_contact(self):
         """验证联系方式"""
         contact = self.cleaned_data.get('contact')
@@ -88,13 +100,9 @@ class ItemForm(forms.ModelForm):
         return contact.strip()
     
     def clean_image(self):
-        """验证图片文件"""
+        """验证图片文件（大小、真实格式和像素尺寸已由 SafeImageField 检查）"""
         image = self.cleaned_data.get('image')
         if image:
-            # 检查文件大小（限制为5MB）
-            if image.size > 5 * 1024 * 1024:
-                raise forms.ValidationError('图片文件太大，请上传小于5MB的图片')
-            
             # 检查文件类型
             valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
             if not any(image.name.lower().endswith(ext) for ext in valid_extensions):
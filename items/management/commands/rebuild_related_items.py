@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from items import related
+
+
+class Command(BaseCommand):
+    help = '全量重建相关物品推荐'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批计算的物品数量')
+
+    def handle(self, *args, **options):
+        def progress(done):
+            self.stdout.write(f'已处理 {done} 个物品')
+
+        total = related.rebuild_all(batch_size=options['batch_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(f'完成！共为 {total} 个物品计算相关推荐'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from items import trending
+
+
+class Command(BaseCommand):
+    help = '根据发布时间和浏览次数全量重建物品热度和热门榜（冷启动或修改权重后使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批计算的物品数量')
+
+    def handle(self, *args, **options):
+        def progress(done):
+            self.stdout.write(f'已处理 {done} 个物品')
+
+        total = trending.rebuild_all(batch_size=options['batch_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(f'完成！共为 {total} 个物品计算热度'))
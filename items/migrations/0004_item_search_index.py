@@ -0,0 +1,82 @@
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+import items.search
+
+# 迁移中使用创建时的分词规则和表名副本，之后修改 items.search 不会改变这个迁移的行为
+FTS_TABLE = 'items_item_fts'
+CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def _split_runs(text):
+    runs = []
+    for chunk in WORD_RE.findall(text or ''):
+        pos = 0
+        for match in CJK_RE.finditer(chunk):
+            if match.start() > pos:
+                runs.append((False, chunk[pos:match.start()].lower()))
+            runs.append((True, match.group()))
+            pos = match.end()
+        if pos < len(chunk):
+            runs.append((False, chunk[pos:].lower()))
+    return runs
+
+
+def tokenize(text):
+    """中文输出全部二元组并追加最后一个字，其他单词转为小写"""
+    tokens = []
+    for is_cjk, run in _split_runs(text):
+        if is_cjk:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def create_search_index(apps, schema_editor):
+    """创建 FTS5 全文索引表并导入已有物品"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Item = apps.get_model('items', 'Item')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, description)'
+    )
+    rows = Item.objects.values_list('id', 'title', 'description').iterator(chunk_size=1000)
+    for pk, title, description in rows:
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [pk, ' '.join(tokenize(title)), ' '.join(tokenize(description))]
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_remove_item_price_range_alter_item_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        # 索引表的模型（managed=False，不建表），用于以索引表驱动的检索查询
+        migrations.CreateModel(
+            name='ItemSearchIndex',
+            fields=[
+                ('item', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='items.item')),
+                ('title', items.search.FullTextField()),
+                ('description', items.search.FullTextField()),
+            ],
+            options={
+                'db_table': 'items_item_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0004_item_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='price_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='最高价格'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='price_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='最低价格'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['price_min'], name='items_item_price_m_62ddb0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['price_max'], name='items_item_price_m_1e5c68_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# 迁移中使用创建时的价格解析规则副本（items.pricing），之后修改解析规则不会改变这个迁移的行为
+NEGOTIABLE_VALUES = ('面议', '议价', '可议')
+_NUMBER = r'[¥￥]?\s*(\d+(?:\.\d{1,2})?)\s*元?'
+_SINGLE_RE = re.compile(rf'^{_NUMBER}$')
+_RANGE_RE = re.compile(rf'^{_NUMBER}\s*[-~～—至到]+\s*{_NUMBER}$')
+MAX_PRICE = Decimal('99999999.99')
+
+
+def price_bounds(price):
+    """解析价格文本为 (price_min, price_max)，面议或无法识别时为 (None, None)"""
+    if not price or price.strip() in NEGOTIABLE_VALUES:
+        return None, None
+    text = price.strip()
+    match = _SINGLE_RE.match(text) or _RANGE_RE.match(text)
+    if not match:
+        return None, None
+    low, high = match.group(1), match.group(match.lastindex)
+    try:
+        low, high = Decimal(low), Decimal(high)
+    except InvalidOperation:
+        return None, None
+    if low > high:
+        low, high = high, low
+    if high > MAX_PRICE:
+        return None, None
+    return low, high
+
+
+def backfill_price_bounds(apps, schema_editor):
+    """按主键分批回填 price_min / price_max"""
+    Item = apps.get_model('items', 'Item')
+    last_pk = 0
+    while True:
+        batch = list(
+            Item.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'price')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for item in batch:
+            item.price_min, item.price_max = price_bounds(item.price)
+        Item.objects.bulk_update(batch, ['price_min', 'price_max'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0005_item_price_min_item_price_max'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_price_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from items.search import FTS_TABLE
+
+
+def create_vocab_table(apps, schema_editor):
+    """创建 FTS5 词表，用于读取各词的文档频率"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}_vocab USING fts5vocab({FTS_TABLE}, row)'
+    )
+
+
+def drop_vocab_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}_vocab')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0006_backfill_item_price_bounds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='相似度')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='items.item', verbose_name='物品')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='items.item', verbose_name='相关物品')),
+            ],
+            options={
+                'verbose_name': '相关物品',
+                'verbose_name_plural': '相关物品',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['item', '-score'], name='items_relat_item_id_2b2d83_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relateditem',
+            constraint=models.UniqueConstraint(fields=('item', 'related'), name='unique_related_item'),
+        ),
+        migrations.RunPython(create_vocab_table, drop_vocab_table),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    ItemSearchIndex 模型已移到 0004_item_search_index，与创建索引表放在一起
+
+    保留这个空迁移，已经应用过它的数据库和依赖它的迁移不受影响。
+    """
+
+    dependencies = [
+        ('items', '0007_relateditem'),
+    ]
+
+    operations = []
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:48
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0008_itemsearchindex'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='items/', verbose_name='物品图片'),
+        ),
+    ]
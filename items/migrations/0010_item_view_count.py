@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0009_alter_item_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='浏览次数'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0010_item_view_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='trending_score',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='热度'),
+        ),
+        migrations.CreateModel(
+            name='TrendingItem',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='items.item', verbose_name='物品')),
+                ('score', models.FloatField(verbose_name='热度')),
+            ],
+            options={
+                'verbose_name': '热门物品',
+                'verbose_name_plural': '热门物品',
+                'indexes': [models.Index(fields=['-score'], name='items_trend_score_9e2750_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('items', '0012_favorite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(blank=True, max_length=100, verbose_name='关键词')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='最低价格')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='最高价格')),
+                ('term_count', models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='词数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='items.category', verbose_name='分类')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '保存的搜索',
+                'verbose_name_plural': '保存的搜索',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False, verbose_name='已读')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='提醒时间')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='items.item', verbose_name='物品')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='items.savedsearch', verbose_name='保存的搜索')),
+            ],
+            options={
+                'verbose_name': '搜索提醒',
+                'verbose_name_plural': '搜索提醒',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='词')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='items.savedsearch', verbose_name='保存的搜索')),
+            ],
+            options={
+                'verbose_name': '搜索词',
+                'verbose_name_plural': '搜索词',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchalert',
+            constraint=models.UniqueConstraint(fields=('saved_search', 'item'), name='unique_search_alert'),
+        ),
+        migrations.AddConstraint(
+            model_name='savedsearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'saved_search'), name='unique_saved_search_term'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0013_saved_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['updated_at'], name='items_item_updated_8dfe31_idx'),
+        ),
+    ]
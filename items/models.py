@@ -1,8 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
 import uuid
 
+from core.storage import media_storage, track as track_stored_files
+from core.thumbnails import schedule as schedule_thumbnails, thumbnail_url
+
+from .pricing import price_bounds
+from .search import FTS_TABLE, FullTextField
+
 
 class Category(models.Model):
     """物品分类模型"""
@@ -63,6 +72,23 @@ class Item(models.Model):
         default='面议',
         help_text='支持精确值（如：100）或区间（如：50-100），单位：元'
     )
+    # 由 price 解析得到的数值区间，面议时为空，用于价格筛选和排序
+    price_min = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='最低价格'
+    )
+    price_max = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='最高价格'
+    )
     trade_method = models.CharField(
         max_length=20, 
         choices=TRADE_METHOD_CHOICES, 
@@ -78,6 +104,7 @@ class Item(models.Model):
     )
     image = models.ImageField(
         upload_to='items/', 
+        storage=media_storage,
         blank=True, 
         null=True, 
         verbose_name='物品图片'
@@ -89,6 +116,10 @@ class Item(models.Model):
         default='active',
         verbose_name='物品状态'
     )
+    # 由 items.counters 批量累加，不经过 save()
+    view_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='浏览次数')
+    # 折算到固定起点的对数热度，由 items.trending 增量维护
+    trending_score = models.FloatField(null=True, blank=True, editable=False, verbose_name='热度')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='发布时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
@@ -100,8 +131,19 @@ class Item(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['category']),
             models.Index(fields=['status']),
+            models.Index(fields=['price_min']),
+            models.Index(fields=['price_max']),
+            models.Index(fields=['updated_at']),
         ]
     
+    def save(self, *args, **kwargs):
+        # 同步价格数值区间
+        self.price_min, self.price_max = price_bounds(self.price)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'price' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'price_min', 'price_max'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.title} - {self.seller.username}"
     
@@ -109,9 +151,316 @@ class Item(models.Model):
         from django.urls import reverse
         return reverse('item_detail', kwargs={'pk': self.pk})
     
-    def get_image_url(self):
-        """获取物品图片URL，如果没有图片则返回默认图片"""
+    def get_view_count(self):
+        """浏览次数，包括本进程中尚未写入数据库的部分"""
+        from .counters import pending
+        return self.view_count + pending(self.pk)
+    
+    def get_image_url(self, size=None, fmt='webp'):
+        """
+        获取物品图片URL，如果没有图片则返回默认图片
+
+        size 为缩略图尺寸（card / detail），缩略图尚未生成时返回原图。
+        """
         if self.image:
-            return self.image.url
+            return thumbnail_url(self.image, size, fmt)
         else:
-            return '/static/images/DefaultProfile_256.png'
\ No newline at end of file
+            return '/static/images/DefaultProfile_256.png'
+
+
+
+class ItemSearchIndex(models.Model):
+    """物品全文索引（SQLite FTS5 虚拟表，由 items.search 维护，不由迁移创建）"""
+    item = models.OneToOneField(
+        Item,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_index',
+    )
+    title = FullTextField()
+    description = FullTextField()
+    
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
+class RelatedItem(models.Model):
+    """预计算的相关物品（每个物品保留相似度最高的若干个）"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='related_links', verbose_name='物品')
+    related = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='+', verbose_name='相关物品')
+    score = models.FloatField(verbose_name='相似度')
+    
+    class Meta:
+        verbose_name = '相关物品'
+        verbose_name_plural = '相关物品'
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'related'], name='unique_related_item'),
+        ]
+        indexes = [
+            models.Index(fields=['item', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.item_id} -> {self.related_id} ({self.score:.3f})"
+
+class TrendingItem(models.Model):
+    """热度最高的在售物品（由 items.trending 维护，只保留前若干名）"""
+    item = models.OneToOneField(
+        Item, on_delete=models.CASCADE, primary_key=True, related_name='trending', verbose_name='物品'
+    )
+    score = models.FloatField(verbose_name='热度')
+    
+    class Meta:
+        verbose_name = '热门物品'
+        verbose_name_plural = '热门物品'
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.item_id} ({self.score:.3f})"
+
+
+class Favorite(models.Model):
+    """用户收藏的物品"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites', verbose_name='用户')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='favorites', verbose_name='物品')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='收藏时间')
+    
+    class Meta:
+        verbose_name = '收藏'
+        verbose_name_plural = '收藏'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'item'], name='unique_favorite'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} -> {self.item_id}"
+
+class SavedSearch(models.Model):
+    """保存的搜索：关键词、分类和价格区间，有符合条件的新物品发布时提醒用户"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches', verbose_name='用户')
+    query = models.CharField(max_length=100, blank=True, verbose_name='关键词')
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='分类'
+    )
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='最低价格')
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='最高价格')
+    # 倒排索引中的词数，物品命中全部词才是候选（由 items.percolator 维护）
+    term_count = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='词数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    
+    class Meta:
+        verbose_name = '保存的搜索'
+        verbose_name_plural = '保存的搜索'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.query or (self.category.name if self.category_id else '')
+
+
+class SavedSearchTerm(models.Model):
+    """保存的搜索的倒排索引：词 -> 保存的搜索"""
+    term = models.CharField(max_length=64, verbose_name='词')
+    saved_search = models.ForeignKey(
+        SavedSearch, on_delete=models.CASCADE, related_name='terms', verbose_name='保存的搜索'
+    )
+    
+    class Meta:
+        verbose_name = '搜索词'
+        verbose_name_plural = '搜索词'
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'saved_search'], name='unique_saved_search_term'),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} -> {self.saved_search_id}"
+
+
+class SearchAlert(models.Model):
+    """保存的搜索命中的新物品"""
+    saved_search = models.ForeignKey(
+        SavedSearch, on_delete=models.CASCADE, related_name='alerts', verbose_name='保存的搜索'
+    )
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='+', verbose_name='物品')
+    is_read = models.BooleanField(default=False, verbose_name='已读')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='提醒时间')
+    
+    class Meta:
+        verbose_name = '搜索提醒'
+        verbose_name_plural = '搜索提醒'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'item'], name='unique_search_alert'),
+        ]
+    
+    def __str__(self):
+        return f"{self.saved_search_id} -> {self.item_id}"
+
+# 图片引用计数
+track_stored_files(Item, 'image')
+
+
+@receiver(post_save, sender=Item)
+def update_item_search_index(sender, instance, **kwargs):
+    """保存物品时同步全文索引"""
+    from .search import index_item
+    index_item(instance)
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_search_index(sender, instance, **kwargs):
+    """删除物品时移除全文索引"""
+    from .search import remove_item
+    remove_item(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_item_facets(sender, instance, **kwargs):
+    """物品变更时使分面计数缓存失效，事务提交后再失效，避免其他请求在提交前按旧数据重新填充缓存"""
+    from .facets import invalidate
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Item)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_home_feed(sender, instance, **kwargs):
+    """物品或分类变更时在事务提交后使首页缓存失效"""
+    from .feed import invalidate
+    transaction.on_commit(invalidate)
+
+
+# 影响相关物品的字段，其他字段（如状态在非在售状态之间切换）变化时不重新计算
+RELATED_FIELDS = ('title', 'description', 'category_id', 'price')
+
+
+def _related_state(instance):
+    """加载时已读取的相关字段及是否在售，被 only()/defer() 排除的字段不记录"""
+    state = {name: instance.__dict__[name] for name in RELATED_FIELDS if name in instance.__dict__}
+    if 'status' in instance.__dict__:
+        state['active'] = instance.__dict__['status'] == 'active'
+    return state
+
+
+@receiver(post_init, sender=Item)
+def remember_related_fields(sender, instance, **kwargs):
+    instance._related_state = _related_state(instance)
+
+
+@receiver(post_save, sender=Item)
+def update_related_items(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """相关字段或是否在售变化时，在事务提交后由后台线程增量更新相关物品"""
+    if raw:
+        return
+    previous = getattr(instance, '_related_state', {})
+    current = instance._related_state = _related_state(instance)
+    if not created:
+        if update_fields is not None and not {*RELATED_FIELDS, 'category', 'status'} & set(update_fields):
+            return
+        # 加载时未读取的字段无法比较，视为已变化
+        if all(name in previous and previous[name] == value for name, value in current.items()):
+            return
+    from .related import schedule_update
+    pk = instance.pk
+    transaction.on_commit(lambda: schedule_update(pk))
+
+
+@receiver(pre_delete, sender=Item)
+def collect_related_items(sender, instance, **kwargs):
+    """删除物品前记录引用了它的物品，级联删除后这些信息就丢失了"""
+    instance._related_affected = list(
+        RelatedItem.objects.filter(related=instance).values_list('item_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Item)
+def remove_related_items(sender, instance, **kwargs):
+    """删除物品后重新计算受影响物品的相关物品"""
+    from .related import schedule_remove
+    pk, affected = instance.pk, getattr(instance, '_related_affected', [])
+    transaction.on_commit(lambda: schedule_remove(pk, affected))
+
+
+@receiver(post_save, sender=Item)
+def generate_item_thumbnails(sender, instance, raw=False, **kwargs):
+    """保存物品后登记缩略图，由 generate_thumbnails --pending 生成"""
+    if raw or not instance.image:
+        return
+    image = instance.image
+    transaction.on_commit(lambda: schedule_thumbnails(image, ['card', 'detail']))
+
+
+@receiver(post_save, sender=Item)
+def update_trending(sender, instance, created, raw=False, **kwargs):
+    """新发布的物品计入一次发布事件；状态变化时更新热门榜（提交后在后台执行）"""
+    if raw:
+        return
+    from . import trending
+    pk = instance.pk
+    if created:
+        transaction.on_commit(lambda: trending.schedule_record(pk, trending.PUBLISH_WEIGHT))
+    else:
+        transaction.on_commit(lambda: trending.schedule_item_changed(pk))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+def invalidate_favorite_ids(sender, instance, **kwargs):
+    """收藏变更提交后使该用户的收藏缓存失效"""
+    from .favorites import invalidate
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id))
+
+
+@receiver(post_save, sender=Favorite)
+def record_favorite_trending(sender, instance, created, raw=False, **kwargs):
+    """新的收藏计入一次收藏事件（提交后在后台执行）"""
+    if raw or not created:
+        return
+    from . import trending
+    item_id = instance.item_id
+    transaction.on_commit(lambda: trending.schedule_record(item_id, trending.FAVORITE_WEIGHT))
+
+
+@receiver(post_save, sender=Item)
+def percolate_saved_searches(sender, instance, created, raw=False, **kwargs):
+    """新发布的物品提交后在后台与保存的搜索匹配"""
+    if raw or not created or instance.status != 'active':
+        return
+    from . import percolator
+    pk = instance.pk
+    transaction.on_commit(lambda: percolator.schedule(pk))
+
+
+@receiver(post_save, sender=Item)
+def update_suggestions(sender, instance, raw=False, **kwargs):
+    """物品保存提交后更新输入提示"""
+    if raw:
+        return
+    from . import suggest
+    pk, title, status = instance.pk, instance.title, instance.status
+    transaction.on_commit(lambda: suggest.item_changed(pk, title, status))
+
+
+@receiver(post_delete, sender=Item)
+def remove_suggestions(sender, instance, **kwargs):
+    """物品删除提交后从输入提示中移除"""
+    from . import suggest
+    pk = instance.pk
+    transaction.on_commit(lambda: suggest.item_deleted(pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def update_category_suggestions(sender, instance, raw=False, **kwargs):
+    """分类变更提交后更新输入提示"""
+    if raw:
+        return
+    from . import suggest
+    pk = instance.pk
+    name = None if kwargs['signal'] is post_delete else instance.name
+    transaction.on_commit(lambda: suggest.category_changed(pk, name))
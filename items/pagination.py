@@ -0,0 +1,229 @@
+"""
+游标（keyset）分页
+
+按 (created_at, id) 等排序键定位下一页，不使用 OFFSET 和 COUNT(*)，
+第 N 页的查询代价与第 1 页相同。游标中保存的是边界行的排序键值，
+因此在新物品发布后翻页仍然稳定。
+
+注解排序键（如搜索相关度 bm25）的值会随索引内容变化：新物品加入后所有物品的得分一起漂移，
+直接与游标中的旧值比较会整段重复或遗漏。因此翻页时先按边界行的 id 查出它当前的值（多一次按主键的查询），
+边界行已不在结果中时才使用游标中的值；只有相对顺序真正改变的行仍可能重复或遗漏。
+"""
+
+import base64
+import datetime
+import json
+import math
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+# 默认排序键：发布时间倒序，id 作为同一时间内的决胜键
+DEFAULT_KEYS = ('-created_at', '-id')
+
+
+def _encode_value(value):
+    # 时间保留完整微秒精度，否则边界行会被重复或跳过
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _encode_cursor(direction, values):
+    payload = json.dumps(
+        {'d': direction, 'v': [_encode_value(v) for v in values]}, separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, model, keys):
+    """解析游标，无效时返回 (None, None)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        direction, raw_values = payload['d'], payload['v']
+    except (ValueError, TypeError, KeyError):
+        return None, None
+    if direction not in ('next', 'prev') or not isinstance(raw_values, list) or len(raw_values) != len(keys):
+        return None, None
+
+    values = []
+    for key, value in zip(keys, raw_values):
+        name = key.lstrip('-')
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # 注解字段（如搜索相关度）只接受有限的数值
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                return None, None
+            values.append(value)
+            continue
+        try:
+            value = field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            return None, None
+        if value is None:
+            return None, None
+        values.append(value)
+    return direction, values
+
+
+def _annotated_keys(model, keys):
+    """排序键中注解字段的下标"""
+    indexes = []
+    for index, key in enumerate(keys):
+        try:
+            model._meta.get_field(key.lstrip('-'))
+        except FieldDoesNotExist:
+            indexes.append(index)
+    return indexes
+
+
+def _boundary_query(queryset, keys, values):
+    """
+    返回 (注解排序键的下标, 查询边界行这些键当前值的查询集)，不需要重新查询时返回 None
+
+    边界行由最后一个排序键（id）确定。
+    """
+    if values is None or keys[-1].lstrip('-') not in ('id', 'pk'):
+        return None
+    indexes = _annotated_keys(queryset.model, keys)
+    if not indexes:
+        return None
+    names = [keys[index].lstrip('-') for index in indexes]
+    return indexes, queryset.filter(pk=values[-1]).order_by().values_list(*names)
+
+
+def _with_current(values, indexes, row):
+    """用边界行当前的值替换游标中的注解键值，边界行已不在结果中（row 为 None）时保持不变"""
+    if row is None:
+        return values
+    values = list(values)
+    for index, value in zip(indexes, row):
+        values[index] = value
+    return values
+
+
+def _keyset_filter(keys, values, forward):
+    """
+    构造 (k1, k2, ...) 在排序上位于边界之后（或之前）的条件：
+    k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+    """
+    condition = Q()
+    equal = {}
+    for key, value in zip(keys, values):
+        name = key.lstrip('-')
+        descending = key.startswith('-')
+        # 倒序字段向后翻页取更小的值
+        lookup = 'lt' if descending == forward else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def _reverse_key(key):
+    return key[1:] if key.startswith('-') else f'-{key}'
+
+
+class KeysetPage:
+    """一页数据及其前后翻页游标"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, request=None, param='cursor'):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.request = request
+        self.param = param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _url_for(self, cursor):
+        params = self.request.GET.copy() if self.request is not None else {}
+        params[self.param] = cursor
+        return f'?{params.urlencode()}'
+
+    def next_url(self):
+        return self._url_for(self.next_cursor) if self.next_cursor else ''
+
+    def previous_url(self):
+        return self._url_for(self.previous_cursor) if self.previous_cursor else ''
+
+
+def _decode(queryset, cursor, keys):
+    if not cursor:
+        return None, None
+    return _decode_cursor(cursor, queryset.model, keys)
+
+
+def _page_queryset(queryset, direction, values, per_page, keys):
+    """返回取一页数据的查询集，多取一行用于判断是否还有下一页"""
+    if direction == 'prev':
+        # 向前翻页：反向排序取边界之前的数据，再翻转回来
+        page_qs = queryset.filter(_keyset_filter(keys, values, forward=False))
+        return page_qs.order_by(*[_reverse_key(k) for k in keys])[:per_page + 1]
+    page_qs = queryset
+    if direction == 'next':
+        page_qs = queryset.filter(_keyset_filter(keys, values, forward=True))
+    return page_qs.order_by(*keys)[:per_page + 1]
+
+
+def _build_page(rows, direction, per_page, keys, request, param):
+    if direction == 'prev':
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_previous, has_next = has_more, True
+    else:
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = direction == 'next'
+
+    def boundary(obj):
+        return [getattr(obj, key.lstrip('-')) for key in keys]
+
+    next_cursor = _encode_cursor('next', boundary(rows[-1])) if rows and has_next else None
+    previous_cursor = _encode_cursor('prev', boundary(rows[0])) if rows and has_previous else None
+
+    return KeysetPage(rows, next_cursor, previous_cursor, request=request, param=param)
+
+
+def paginate(queryset, cursor=None, per_page=20, keys=DEFAULT_KEYS, request=None, param='cursor'):
+    """
+    对查询集做游标分页，返回 KeysetPage
+
+    keys 为排序键，最后一个键必须唯一（通常是 id）；各键的值需能从结果对象上取得。
+    """
+    direction, values = _decode(queryset, cursor, keys)
+    boundary = _boundary_query(queryset, keys, values)
+    if boundary is not None:
+        indexes, query = boundary
+        values = _with_current(values, indexes, query.first())
+    page_qs = _page_queryset(queryset, direction, values, per_page, keys)
+    return _build_page(list(page_qs), direction, per_page, keys, request, param)
+
+
+async def apaginate(queryset, cursor=None, per_page=20, keys=DEFAULT_KEYS, request=None, param='cursor'):
+    """paginate() 的异步版本，使用异步 ORM 读取"""
+    direction, values = _decode(queryset, cursor, keys)
+    boundary = _boundary_query(queryset, keys, values)
+    if boundary is not None:
+        indexes, query = boundary
+        values = _with_current(values, indexes, await query.afirst())
+    page_qs = _page_queryset(queryset, direction, values, per_page, keys)
+    rows = [obj async for obj in page_qs]
+    return _build_page(rows, direction, per_page, keys, request, param)
@@ -0,0 +1,162 @@
+"""
+保存的搜索提醒（反向检索）
+
+普通搜索用查询去找物品，这里反过来，用新发布的物品去找与之匹配的保存的搜索。
+保存的搜索按与全文检索（items.search）相同的规则拆成若干必须命中的词，写入倒排索引 SavedSearchTerm：
+- 两个字以上的中文片段：它的每个二元组
+- 单个汉字、英文单词和数字（前缀匹配）：其本身
+- 指定了分类时：category:<分类 id>
+
+新物品发布后，把它的每个词及其所有前缀作为探测键查询倒排索引，命中了某个保存的搜索全部词的
+才是候选，再逐个核对中文片段是否连续出现以及价格区间。查询量与物品自身的词数成正比，
+与保存的搜索总数无关。
+
+匹配在事务提交后由后台线程执行，不占用发布物品的请求。
+"""
+
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, connections, transaction
+
+from . import search
+from .models import Item, SavedSearch, SavedSearchTerm, SearchAlert
+
+logger = logging.getLogger(__name__)
+
+# 与 SavedSearchTerm.term 的长度一致，更长的词只索引前面部分
+MAX_TERM_LENGTH = 64
+# 每条 IN 查询的探测键数量
+PROBE_BATCH_SIZE = 500
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _category_term(category_id):
+    return f'category:{category_id}'
+
+
+def query_terms(query, category_id=None):
+    """
+    返回 (倒排索引中的词, 需要连续出现的中文片段)
+
+    与 search.build_match_query 一致：多字中文片段为二元组短语，其余按前缀匹配。
+    """
+    terms, phrases = set(), []
+    for is_phrase, run in search.query_parts(query):
+        if is_phrase:
+            terms.update(search.bigrams(run))
+            phrases.append(run)
+        else:
+            terms.add(run[:MAX_TERM_LENGTH])
+    if category_id:
+        terms.add(_category_term(category_id))
+    return terms, phrases
+
+
+def probe_keys(item):
+    """物品的探测键：标题和描述中每个词的所有前缀，以及分类"""
+    keys = {_category_term(item.category_id)}
+    for token in search.tokenize(item.title) + search.tokenize(item.description):
+        for end in range(1, min(len(token), MAX_TERM_LENGTH) + 1):
+            keys.add(token[:end])
+    return keys
+
+
+def index(saved_search):
+    """写入保存的搜索的倒排索引，没有关键词也没有分类时抛出 ValueError"""
+    terms, _ = query_terms(saved_search.query, saved_search.category_id)
+    if not terms:
+        raise ValueError('保存的搜索至少需要关键词或分类')
+    with transaction.atomic():
+        SavedSearchTerm.objects.filter(saved_search=saved_search).delete()
+        SavedSearchTerm.objects.bulk_create(
+            [SavedSearchTerm(term=term, saved_search=saved_search) for term in terms]
+        )
+        saved_search.term_count = len(terms)
+        SavedSearch.objects.filter(pk=saved_search.pk).update(term_count=len(terms))
+
+
+def create(user, query='', category_id=None, min_price=None, max_price=None):
+    """创建保存的搜索并写入倒排索引"""
+    with transaction.atomic():
+        saved_search = SavedSearch.objects.create(
+            user=user, query=(query or '').strip(), category_id=category_id,
+            min_price=min_price, max_price=max_price,
+        )
+        index(saved_search)
+    return saved_search
+
+
+def is_match(saved_search, item):
+    """核对候选：中文片段连续出现、价格区间有交集（与列表页的价格筛选一致）"""
+    _, phrases = query_terms(saved_search.query)
+    text = f'{item.title}\n{item.description}'
+    if any(phrase not in text for phrase in phrases):
+        return False
+    if saved_search.min_price is not None and (item.price_max is None or item.price_max < saved_search.min_price):
+        return False
+    if saved_search.max_price is not None and (item.price_min is None or item.price_min > saved_search.max_price):
+        return False
+    return True
+
+
+def match(item):
+    """与物品匹配的保存的搜索（不包括卖家自己的）"""
+    keys = list(probe_keys(item))
+    hits = Counter()
+    required = {}
+    for start in range(0, len(keys), PROBE_BATCH_SIZE):
+        rows = SavedSearchTerm.objects.filter(term__in=keys[start:start + PROBE_BATCH_SIZE]).values_list(
+            'saved_search_id', 'saved_search__term_count'
+        )
+        for saved_search_id, term_count in rows:
+            hits[saved_search_id] += 1
+            required[saved_search_id] = term_count
+    candidates = [pk for pk, count in hits.items() if count >= required[pk]]
+    if not candidates:
+        return []
+    saved_searches = SavedSearch.objects.filter(pk__in=candidates).exclude(user_id=item.seller_id)
+    return [saved_search for saved_search in saved_searches if is_match(saved_search, item)]
+
+
+def percolate(item_id):
+    """为物品匹配保存的搜索并写入提醒，返回新增的提醒数"""
+    item = Item.objects.filter(pk=item_id, status='active').first()
+    if item is None:
+        return 0
+    alerts = [SearchAlert(saved_search=saved_search, item=item) for saved_search in match(item)]
+    SearchAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    return len(alerts)
+
+
+def _run(item_id):
+    try:
+        percolate(item_id)
+    except Exception:
+        logger.exception('匹配保存的搜索失败：物品 %s', item_id)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='percolator')
+        return _executor
+
+
+def schedule(item_id):
+    """
+    在后台线程中匹配物品
+
+    仍处于事务中时（如测试中执行 on_commit 回调）其他连接看不到这个物品，直接在当前线程匹配。
+    """
+    if connection.in_atomic_block:
+        percolate(item_id)
+    else:
+        _get_executor().submit(_run, item_id)
@@ -0,0 +1,62 @@
+"""
+价格解析
+
+Item.price 是自由文本，支持精确值（100）、区间（50-100）和"面议"。
+这里把它解析为数值区间 (price_min, price_max)，面议或无法识别时为 (None, None)。
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+
+# 表示面议的写法
+NEGOTIABLE_VALUES = ('面议', '议价', '可议')
+
+# 单个数值，允许前缀货币符号和后缀"元"
+_NUMBER = r'[¥￥]?\s*(\d+(?:\.\d{1,2})?)\s*元?'
+_SINGLE_RE = re.compile(rf'^{_NUMBER}$')
+_RANGE_RE = re.compile(rf'^{_NUMBER}\s*[-~～—至到]+\s*{_NUMBER}$')
+
+# 与 price_min/price_max 字段的 max_digits 保持一致
+MAX_PRICE = Decimal('99999999.99')
+
+
+def is_negotiable(price):
+    return not price or price.strip() in NEGOTIABLE_VALUES
+
+
+def parse_price(price):
+    """
+    解析价格文本，返回 (price_min, price_max)
+
+    面议返回 (None, None)；无法识别的格式抛出 ValueError。
+    """
+    if is_negotiable(price):
+        return None, None
+
+    text = price.strip()
+    match = _SINGLE_RE.match(text)
+    if match:
+        low = high = match.group(1)
+    else:
+        match = _RANGE_RE.match(text)
+        if not match:
+            raise ValueError(f'无法识别的价格: {price}')
+        low, high = match.group(1), match.group(2)
+
+    try:
+        low, high = Decimal(low), Decimal(high)
+    except InvalidOperation:
+        raise ValueError(f'无法识别的价格: {price}')
+    if low > high:
+        low, high = high, low
+    if high > MAX_PRICE:
+        raise ValueError(f'价格超出范围: {price}')
+    return low, high
+
+
+def price_bounds(price):
+    """宽松版本：无法识别时按面议处理，用于回填历史数据"""
+    try:
+        return parse_price(price)
+    except ValueError:
+        return None, None
@@ -0,0 +1,335 @@
+"""
+相关物品推荐
+
+相似度由三部分组成：
+- 标题/描述的 TF-IDF 余弦相似度（中文二元组，与全文检索使用同一套分词）
+- 是否同一分类
+- 价格接近程度
+
+每个在售物品预先计算前 K 个最相似的物品，保存在 RelatedItem 表中，
+详情页只需一次按 (item, -score) 索引的查询。物品变更时只重新计算
+该物品及其候选物品的邻居列表，而不是全表重算。
+
+增量更新在事务提交后由后台线程执行，不占用保存物品的请求；
+只有标题、描述、分类、价格或是否在售发生变化时才更新（见 items.models.update_related_items）。
+物品从某个列表中移出后，该列表会重新计算补足 K 个。
+"""
+
+import logging
+import math
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Q
+
+from . import search
+from .models import Item, RelatedItem
+
+logger = logging.getLogger(__name__)
+
+# 每个物品保存的相关物品数量
+TOP_K = 8
+# 每次计算时最多考察的候选物品数量
+CANDIDATE_LIMIT = 200
+# 标题中的词按此倍数计入词频
+TITLE_BOOST = 2
+
+# 各部分相似度的权重
+TEXT_WEIGHT = 0.6
+CATEGORY_WEIGHT = 0.25
+PRICE_WEIGHT = 0.15
+
+VOCAB_TABLE = f'{search.FTS_TABLE}_vocab'
+DOC_COUNT_KEY = 'items:related:doc_count'
+DOC_COUNT_TIMEOUT = 600
+
+CANDIDATE_FIELDS = ('id', 'title', 'description', 'category_id', 'price_min', 'price_max', 'status')
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _terms(item):
+    """物品的词频统计"""
+    counts = Counter()
+    for token in search.tokenize(item.title):
+        counts[token] += TITLE_BOOST
+    for token in search.tokenize(item.description):
+        counts[token] += 1
+    return counts
+
+
+def _document_count():
+    count = cache.get(DOC_COUNT_KEY)
+    if count is None:
+        count = Item.objects.count()
+        cache.set(DOC_COUNT_KEY, count, DOC_COUNT_TIMEOUT)
+    return count
+
+
+def _document_frequencies(terms, docs):
+    """
+    返回 (各词的文档频率, 文档总数)
+
+    SQLite 下从 FTS5 词表中读取全局文档频率，其他数据库使用候选集合估算。
+    """
+    if search.is_available() and terms:
+        frequencies = {}
+        terms = list(terms)
+        with connection.cursor() as cursor:
+            for start in range(0, len(terms), 500):
+                chunk = terms[start:start + 500]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f'SELECT term, doc FROM {VOCAB_TABLE} WHERE term IN ({placeholders})', chunk
+                )
+                frequencies.update(cursor.fetchall())
+        return frequencies, max(_document_count(), 1)
+
+    frequencies = Counter()
+    for doc in docs:
+        frequencies.update(doc.keys())
+    return frequencies, max(len(docs), 1)
+
+
+def _vector(terms, frequencies, total):
+    vector = {
+        term: tf * (math.log((1 + total) / (1 + frequencies.get(term, 0))) + 1)
+        for term, tf in terms.items()
+    }
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {term: v / norm for term, v in vector.items()}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(term, 0.0) for term, v in a.items())
+
+
+def _midpoint(item):
+    if item.price_min is None or item.price_max is None:
+        return None
+    return float(item.price_min + item.price_max) / 2
+
+
+def _price_proximity(a, b):
+    """价格越接近越趋近 1，任一方面议时为 0"""
+    pa, pb = _midpoint(a), _midpoint(b)
+    if pa is None or pb is None:
+        return 0.0
+    if pa == pb:
+        return 1.0
+    return 1.0 - abs(pa - pb) / max(pa, pb)
+
+
+def similarity(a, b, vector_a, vector_b):
+    return (
+        TEXT_WEIGHT * _cosine(vector_a, vector_b)
+        + CATEGORY_WEIGHT * (a.category_id == b.category_id)
+        + PRICE_WEIGHT * _price_proximity(a, b)
+    )
+
+
+def _candidates(item):
+    """候选物品：全文检索命中标题词的物品和同分类的最新物品"""
+    base = Item.objects.filter(status='active').exclude(pk=item.pk).only(*CANDIDATE_FIELDS)
+    candidate_ids = set()
+
+    terms = list(dict.fromkeys(search.tokenize(item.title)))[:32]
+    if search.is_available() and terms:
+        match = ' OR '.join('"%s"' % term for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({search.FTS_TABLE}, {search.TITLE_WEIGHT}, {search.DESCRIPTION_WEIGHT}) '
+                f'LIMIT %s',
+                [match, CANDIDATE_LIMIT]
+            )
+            candidate_ids.update(row[0] for row in cursor.fetchall())
+
+    same_category = base.filter(category_id=item.category_id).order_by('-created_at')
+    candidate_ids.update(same_category.values_list('id', flat=True)[:CANDIDATE_LIMIT // 2])
+    candidate_ids.discard(item.pk)
+    return list(base.filter(pk__in=candidate_ids))
+
+
+def compute_neighbours(item):
+    """计算物品与各候选物品的相似度，返回 [(候选物品, 分数), ...]，按分数降序"""
+    candidates = _candidates(item)
+    if not candidates:
+        return []
+    terms = {c.pk: _terms(c) for c in candidates}
+    own_terms = _terms(item)
+    vocabulary = set(own_terms)
+    for t in terms.values():
+        vocabulary.update(t)
+    frequencies, total = _document_frequencies(vocabulary, list(terms.values()) + [own_terms])
+
+    own_vector = _vector(own_terms, frequencies, total)
+    scored = []
+    for candidate in candidates:
+        vector = _vector(terms[candidate.pk], frequencies, total)
+        scored.append((candidate, similarity(item, candidate, own_vector, vector)))
+    scored.sort(key=lambda pair: (-pair[1], -pair[0].pk))
+    return scored
+
+
+def _replace_neighbours(item_id, neighbours):
+    RelatedItem.objects.filter(item_id=item_id).delete()
+    RelatedItem.objects.bulk_create([
+        RelatedItem(item_id=item_id, related_id=candidate.pk, score=score)
+        for candidate, score in neighbours[:TOP_K]
+    ])
+
+
+def update_item(item):
+    """
+    物品新增或修改后增量更新
+
+    重新计算该物品自己的邻居列表，并尝试把它插入各候选物品的前 K 列表；
+    原来包含该物品、现在不再包含的列表重新计算，补足 K 个。
+    """
+    with transaction.atomic():
+        if item.status != 'active':
+            remove_item(item.pk)
+            return
+
+        scored = compute_neighbours(item)
+        _replace_neighbours(item.pk, scored)
+
+        # 原来引用了该物品的列表
+        referencing = set(RelatedItem.objects.filter(related_id=item.pk).values_list('item_id', flat=True))
+
+        # 该物品在各候选物品列表中的位置
+        existing = {}
+        for link in RelatedItem.objects.filter(item_id__in=[c.pk for c, _ in scored]):
+            existing.setdefault(link.item_id, []).append(link)
+
+        stale = Q(related_id=item.pk)
+        fresh = []
+        for candidate, score in scored:
+            others = sorted(
+                (link for link in existing.get(candidate.pk, []) if link.related_id != item.pk),
+                key=lambda link: (-link.score, -link.related_id)
+            )
+            position = sum(1 for link in others if (link.score, link.related_id) > (score, item.pk))
+            if position < TOP_K:
+                fresh.append(RelatedItem(item_id=candidate.pk, related_id=item.pk, score=score))
+                # 挤出原列表中排在第 K 位及之后的物品
+                stale |= Q(item_id=candidate.pk, related_id__in=[link.related_id for link in others[TOP_K - 1:]])
+
+        RelatedItem.objects.filter(stale).delete()
+        RelatedItem.objects.bulk_create(fresh)
+
+        # 该物品被移出的列表少了一个，重新计算
+        dropped = referencing - {link.item_id for link in fresh}
+        _recompute(dropped)
+
+
+def _recompute(item_ids):
+    for other in Item.objects.filter(pk__in=item_ids, status='active').only(*CANDIDATE_FIELDS):
+        _replace_neighbours(other.pk, compute_neighbours(other))
+
+
+def remove_item(item_id, affected=None):
+    """
+    物品下架或删除后移除其推荐关系，并重新计算受影响物品的邻居列表
+
+    affected 为引用了该物品的物品 id，删除时需在级联删除之前收集。
+    """
+    if affected is None:
+        affected = list(RelatedItem.objects.filter(related_id=item_id).values_list('item_id', flat=True))
+    RelatedItem.objects.filter(Q(item_id=item_id) | Q(related_id=item_id)).delete()
+    _recompute(affected)
+
+
+def _update_by_id(item_id):
+    item = Item.objects.filter(pk=item_id).only(*CANDIDATE_FIELDS).first()
+    # 已删除的物品由 remove_item 处理
+    if item is not None:
+        update_item(item)
+
+
+def _run(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('更新相关物品失败：%s%r', function.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # 单个线程依次执行，同一物品的更新不会并发
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='related')
+        return _executor
+
+
+def _submit(function, *args):
+    # 仍处于事务中时（如测试中执行 on_commit 回调）其他连接看不到这次修改，直接在当前线程执行
+    if connection.in_atomic_block:
+        function(*args)
+    else:
+        _get_executor().submit(_run, function, *args)
+
+
+def schedule_update(item_id):
+    """在后台线程中增量更新物品的相关物品"""
+    _submit(_update_by_id, item_id)
+
+
+def schedule_remove(item_id, affected):
+    """在后台线程中移除已删除物品的推荐关系"""
+    _submit(remove_item, item_id, affected)
+
+
+def _related_links(item_id, limit):
+    return (
+        RelatedItem.objects.filter(item_id=item_id, related__status='active')
+        .select_related('related')
+        .only('related__id', 'related__title', 'related__description', 'related__image')
+        .order_by('-score')[:limit]
+    )
+
+
+def related_items(item, limit=4):
+    """详情页使用：一次索引查询读取预计算的相关物品"""
+    return [link.related for link in _related_links(item.pk, limit)]
+
+
+async def arelated_items(item_id, limit=4):
+    """related_items() 的异步版本，只需要物品 id，不必先取出物品"""
+    return [link.related async for link in _related_links(item_id, limit)]
+
+
+def rebuild_all(batch_size=500, progress=None):
+    """全量重建所有在售物品的相关物品列表"""
+    cache.delete(DOC_COUNT_KEY)
+    RelatedItem.objects.all().delete()
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Item.objects.filter(status='active', pk__gt=last_pk).order_by('pk').only(*CANDIDATE_FIELDS)[:batch_size]
+        )
+        if not batch:
+            break
+        links = []
+        for item in batch:
+            links.extend(
+                RelatedItem(item_id=item.pk, related_id=candidate.pk, score=score)
+                for candidate, score in compute_neighbours(item)[:TOP_K]
+            )
+        RelatedItem.objects.bulk_create(links)
+        total += len(batch)
+        last_pk = batch[-1].pk
+        if progress:
+            progress(total)
+    return total
@@ -0,0 +1,214 @@
+"""
+物品全文检索
+
+基于 SQLite FTS5 倒排索引，对物品标题和描述建立索引：
+- 中文按二元组（bigram）切分，如"二手书" -> 二手 / 手书 / 书
+- 英文和数字按单词切分并转为小写
+- 标题命中的权重高于描述命中
+
+非 SQLite 数据库时退化为原来的 icontains 查询。
+"""
+
+import re
+
+from django.db import connection, models
+from django.db.models import F, Q
+
+# FTS5 虚拟表名
+FTS_TABLE = 'items_item_fts'
+
+# 排序权重：标题、描述
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# 中日韩统一表意文字
+CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+# 中文以外的单词（字母、数字）
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def _split_runs(text):
+    """将文本拆分为 (是否中文, 片段) 序列"""
+    runs = []
+    for chunk in WORD_RE.findall(text or ''):
+        pos = 0
+        for match in CJK_RE.finditer(chunk):
+            if match.start() > pos:
+                runs.append((False, chunk[pos:match.start()].lower()))
+            runs.append((True, match.group()))
+            pos = match.end()
+        if pos < len(chunk):
+            runs.append((False, chunk[pos:].lower()))
+    return runs
+
+
+def bigrams(run):
+    """中文片段的二元组切分"""
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text):
+    """
+    建立索引时使用的分词
+
+    每个中文片段输出全部二元组，并在末尾追加最后一个字，
+    这样单字查询可以通过前缀匹配命中任意位置的字。
+    """
+    tokens = []
+    for is_cjk, run in _split_runs(text):
+        if is_cjk:
+            tokens.extend(bigrams(run))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def query_parts(query):
+    """
+    将用户输入拆分为必须全部命中的部分：[(是否短语, 片段), ...]
+
+    两个字以上的中文片段为二元组短语，单字、英文单词和数字使用前缀匹配。
+    """
+    return [(is_cjk and len(run) > 1, run) for is_cjk, run in _split_runs(query)]
+
+
+def build_match_query(query):
+    """
+    将用户输入转换为 FTS5 MATCH 表达式，无有效词时返回 None
+
+    中文片段转为二元组短语，单字使用前缀匹配；各片段之间为 AND 关系。
+    """
+    terms = [
+        '"%s"' % ' '.join(bigrams(run)) if is_phrase else '"%s"*' % run
+        for is_phrase, run in query_parts(query)
+    ]
+    if not terms:
+        return None
+    return ' '.join(terms)
+
+
+class MatchLookup(models.Lookup):
+    """FTS5 全文匹配：<索引表> MATCH <表达式>"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        table = compiler.quote_name_unless_alias(self.lhs.alias)
+        return f'{table} MATCH {rhs_sql}', rhs_params
+
+
+class FullTextField(models.TextField):
+    """FTS5 虚拟表中的列，支持 match 查找"""
+
+
+FullTextField.register_lookup(MatchLookup)
+
+
+class SearchRank(models.Expression):
+    """
+    bm25 相关度，值越小越相关
+
+    通过关联到索引表的字段定位连接别名，bm25 需要以索引表作为参数。
+    """
+    output_field = models.FloatField()
+
+    def __init__(self, field='search_index__title'):
+        super().__init__()
+        self.source = F(field)
+
+    def get_source_expressions(self):
+        return [self.source]
+
+    def set_source_expressions(self, exprs):
+        (self.source,) = exprs
+
+    def as_sql(self, compiler, connection):
+        table = compiler.quote_name_unless_alias(self.source.alias)
+        return f'bm25({table}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT})', []
+
+
+def is_available():
+    """当前数据库是否支持全文索引"""
+    return connection.vendor == 'sqlite'
+
+
+def index_item(item):
+    """写入或更新单个物品的索引"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [item.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [item.pk, ' '.join(tokenize(item.title)), ' '.join(tokenize(item.description))]
+        )
+
+
+def remove_item(pk):
+    """从索引中删除物品"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def index_rows(rows, batch_size=1000):
+    """
+    批量写入索引（不清空已有索引）
+
+    rows 为 (id, title, description) 的可迭代对象，返回写入的行数。
+    """
+    if not is_available():
+        return 0
+    total = 0
+    with connection.cursor() as cursor:
+        batch = []
+        for pk, title, description in rows:
+            batch.append((pk, ' '.join(tokenize(title)), ' '.join(tokenize(description))))
+            if len(batch) >= batch_size:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)', batch
+                )
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)', batch
+            )
+            total += len(batch)
+    return total
+
+
+def rebuild_index(rows, batch_size=1000):
+    """
+    批量重建索引
+
+    rows 为 (id, title, description) 的可迭代对象，返回写入的行数。
+    """
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    return index_rows(rows, batch_size)
+
+
+def search_items(queryset, query):
+    """
+    在查询集中按关键词检索，结果按相关度排序
+
+    相关度使用 bm25，值越小越相关，标题命中权重更高。
+    """
+    if not is_available():
+        return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query))
+
+    match = build_match_query(query)
+    if match is None:
+        return queryset.none()
+
+    # 以索引表驱动连接，每个命中的物品只计算一次相关度
+    return queryset.filter(
+        search_index__title__match=match
+    ).annotate(
+        search_rank=SearchRank()
+    ).order_by('search_rank', '-created_at')
@@ -0,0 +1,387 @@
+"""
+搜索框输入提示
+
+在售物品的标题和分类名称保存在进程内存的前缀树中，查询时只遍历输入的前缀，不访问数据库。
+中文没有空格分词，标题中每个汉字以及每个英文单词、数字的起始位置都作为一个入口，
+输入"手机"可以提示"小米手机"。
+
+前缀树是 burst trie：叶子节点把经过它的入口保存在紧凑的整数数组中（提示编号和入口位置打包为
+一个整数），超过 BURST_SIZE 个时才按下一个字分裂为子节点。大部分标题的后缀互不相同，
+这样不会为每个后缀的每个字都创建节点。每个节点缓存其子树中权重最高的 TOP_K 个提示，
+输入完整走到某个节点时直接返回缓存；停在叶子节点时逐个核对叶子中的入口（不超过 BURST_SIZE 个）。
+
+相同的标题合并为一个提示，权重为在售物品数；分类排在物品标题之前。
+提示的权重变化时，只清空它的入口经过的节点的缓存，下次查询到这些节点时再从子节点合并。
+
+索引在第一次查询时由后台线程从数据库加载，加载完成前返回空列表；
+之后由 Item / Category 的信号在事务提交后增量更新（加载期间的变更在加载完成后补上）。
+其他进程中的修改每隔 SUGGEST_REFRESH_INTERVAL 秒由后台线程按 updated_at 补齐；
+其他进程中物品被删除（而不是下架）时，标题保留到本进程重启为止。
+"""
+
+import heapq
+import logging
+import re
+import threading
+from array import array
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .search import CJK_RE
+
+logger = logging.getLogger(__name__)
+
+# 叶子节点超过这么多个入口时分裂
+BURST_SIZE = 32
+# 超过这个深度的节点不再分裂
+MAX_DEPTH = 16
+# 每个节点缓存的提示数量
+TOP_K = 20
+DEFAULT_LIMIT = 8
+# 提示文本只取前面部分，入口位置打包在整数的低 START_BITS 位
+MAX_TEXT_LENGTH = 50
+START_BITS = 6
+START_MASK = (1 << START_BITS) - 1
+# 分类排在物品标题之前
+CATEGORY_WEIGHT = 1 << 40
+DEFAULT_REFRESH_INTERVAL = 30
+# 补齐时多回看一段时间，覆盖提交顺序与 updated_at 不一致的写入
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+SPACE_RE = re.compile(r'\s+')
+WORD_RE = re.compile(r'[^\W_]')
+
+
+def clean(text):
+    """合并空白并截断，作为提示文本"""
+    return SPACE_RE.sub(' ', (text or '').strip())[:MAX_TEXT_LENGTH]
+
+
+def normalize(text):
+    """小写，用于比较和查找"""
+    return clean(text).lower()
+
+
+def _entry_points(key):
+    """提示文本中可以开始匹配的位置：开头、每个汉字、每个单词的开头"""
+    points = [0]
+    for i in range(1, len(key)):
+        char, previous = key[i], key[i - 1]
+        if CJK_RE.match(char):
+            points.append(i)
+        elif WORD_RE.match(char) and (not WORD_RE.match(previous) or CJK_RE.match(previous)):
+            points.append(i)
+    return points
+
+
+class _Node:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        # {字: _Node}，叶子节点为 None
+        self.children = None
+        # 叶子节点：经过这里的所有入口；其他节点：在这里结束的入口
+        self.entries = array('I')
+        # 子树中权重最高的提示，None 表示需要重新计算
+        self.top = None
+
+
+class Suggestion:
+    """一条提示：kind 为 'item' 或 'category'，value 为标题或分类 id"""
+    __slots__ = ('kind', 'value', 'text', 'key', 'weight', 'sid')
+
+    def __init__(self, kind, value, text, key, sid):
+        self.kind = kind
+        self.value = value
+        self.text = text
+        self.key = text if key == text else key
+        self.weight = 0
+        self.sid = sid
+
+    def rank(self):
+        """排序键：权重高的在前，同权重时短的、按字符顺序靠前的在前"""
+        return (-self.weight, len(self.text), self.text)
+
+
+class PrefixIndex:
+    """前缀树，不加锁，由调用方保证线程安全"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.suggestions = {}
+        # 提示编号 -> 提示，删除的编号重复使用
+        self._by_id = []
+        self._free = []
+
+    def _suggestion(self, entry):
+        return self._by_id[entry >> START_BITS]
+
+    def _suffix(self, entry):
+        return self._by_id[entry >> START_BITS].key[entry & START_MASK:]
+
+    def _burst(self, node, depth):
+        entries, node.entries, node.children = node.entries, array('I'), {}
+        for entry in entries:
+            suffix = self._suffix(entry)
+            if len(suffix) == depth:
+                node.entries.append(entry)
+            else:
+                node.children.setdefault(suffix[depth], _Node()).entries.append(entry)
+        if depth + 1 < MAX_DEPTH:
+            for child in node.children.values():
+                if len(child.entries) > BURST_SIZE:
+                    self._burst(child, depth + 1)
+
+    def _find(self, suffix, create=False):
+        """suffix 所在的节点及其路径"""
+        node, depth, path = self.root, 0, [self.root]
+        while node.children is not None and depth < len(suffix):
+            child = node.children.get(suffix[depth])
+            if child is None:
+                if not create:
+                    break
+                child = node.children[suffix[depth]] = _Node()
+            node, depth = child, depth + 1
+            path.append(node)
+        return node, depth, path
+
+    def _insert(self, entry, suffix):
+        node, depth, path = self._find(suffix, create=True)
+        for visited in path:
+            visited.top = None
+        node.entries.append(entry)
+        if node.children is None and len(node.entries) > BURST_SIZE and depth < MAX_DEPTH:
+            self._burst(node, depth)
+
+    def _remove(self, entry, suffix):
+        node, _, path = self._find(suffix)
+        for visited in path:
+            visited.top = None
+        node.entries.remove(entry)
+
+    def _touch(self, suffix):
+        for visited in self._find(suffix)[2]:
+            visited.top = None
+
+    def add(self, kind, value, text, weight):
+        """调整提示的权重，权重降到 0 时删除"""
+        identity = (kind, value)
+        suggestion = self.suggestions.get(identity)
+        if suggestion is None:
+            text = clean(text)
+            if weight <= 0 or not text:
+                return
+            sid = self._free.pop() if self._free else len(self._by_id)
+            suggestion = Suggestion(kind, value, text, text.lower(), sid)
+            suggestion.weight = weight
+            if sid == len(self._by_id):
+                self._by_id.append(suggestion)
+            else:
+                self._by_id[sid] = suggestion
+            self.suggestions[identity] = suggestion
+            for start in _entry_points(suggestion.key):
+                self._insert(sid << START_BITS | start, suggestion.key[start:])
+            return
+
+        suggestion.weight += weight
+        key = suggestion.key
+        if suggestion.weight > 0:
+            for start in _entry_points(key):
+                self._touch(key[start:])
+            return
+        for start in _entry_points(key):
+            self._remove(suggestion.sid << START_BITS | start, key[start:])
+        del self.suggestions[identity]
+        self._by_id[suggestion.sid] = None
+        self._free.append(suggestion.sid)
+
+    def _top(self, node):
+        if node.top is None:
+            candidates = {self._suggestion(entry) for entry in node.entries}
+            if node.children:
+                for child in node.children.values():
+                    candidates.update(self._top(child))
+            node.top = heapq.nsmallest(TOP_K, candidates, key=Suggestion.rank)
+        return node.top
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        key = normalize(prefix)
+        if not key:
+            return []
+        node, depth, _ = self._find(key)
+        if depth == len(key):
+            return self._top(node)[:limit]
+        if node.children is not None:
+            return []
+        # 停在叶子节点：逐个核对剩余部分
+        matched = {self._suggestion(entry) for entry in node.entries if self._suffix(entry).startswith(key)}
+        return heapq.nsmallest(limit, matched, key=Suggestion.rank)
+
+
+class Suggester:
+    """前缀树以及已加载的物品和分类，用于物品修改标题或下架时减去旧标题的权重"""
+
+    def __init__(self):
+        self.index = PrefixIndex()
+        # {物品 id: 标题}
+        self.items = {}
+        # {分类 id: 名称}
+        self.categories = {}
+
+    @classmethod
+    def from_database(cls):
+        from .models import Category, Item
+        suggester = cls()
+        for pk, name in Category.objects.values_list('pk', 'name'):
+            suggester.set_category(pk, name)
+        # 相同的标题合并后一次插入
+        titles = Counter()
+        rows = Item.objects.filter(status='active').values_list('pk', 'title').iterator(chunk_size=5000)
+        for pk, title in rows:
+            suggester.items[pk] = title = clean(title)
+            titles[title] += 1
+        for title, count in titles.items():
+            suggester.index.add('item', title.lower(), title, count)
+        return suggester
+
+    def set_item(self, pk, title):
+        """title 为 None 表示物品不在售"""
+        old = self.items.pop(pk, None)
+        if title is not None:
+            title = self.items[pk] = clean(title)
+        if old == title:
+            return
+        if old is not None:
+            self.index.add('item', old.lower(), old, -1)
+        if title is not None:
+            self.index.add('item', title.lower(), title, 1)
+
+    def set_category(self, pk, name):
+        """name 为 None 表示分类已删除"""
+        old = self.categories.pop(pk, None)
+        if old is not None:
+            self.index.add('category', pk, old, -CATEGORY_WEIGHT)
+        if name is not None:
+            self.categories[pk] = name
+            self.index.add('category', pk, name, CATEGORY_WEIGHT)
+
+
+_lock = threading.Lock()
+_current = None
+_synced_at = None
+_loading = False
+_refreshing = False
+# 加载期间发生的变更：[(方法名, id, 标题或名称), ...]
+_backlog = []
+
+
+def refresh_interval():
+    return getattr(settings, 'SUGGEST_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)
+
+
+def load():
+    """从数据库加载索引，加载期间的变更在完成后补上"""
+    global _current, _synced_at, _loading
+    with _lock:
+        _loading = True
+        _backlog.clear()
+    try:
+        started = timezone.now()
+        suggester = Suggester.from_database()
+        with _lock:
+            for method, pk, value in _backlog:
+                getattr(suggester, method)(pk, value)
+            _current, _synced_at = suggester, started
+    finally:
+        with _lock:
+            _loading = False
+            _backlog.clear()
+
+
+def _run(target):
+    try:
+        target()
+    except Exception:
+        logger.exception('输入提示索引更新失败')
+    finally:
+        connections.close_all()
+
+
+def _catch_up():
+    """补齐其他进程中的修改"""
+    global _synced_at, _refreshing
+    from .models import Category, Item
+    try:
+        started = timezone.now()
+        rows = list(
+            Item.objects.filter(updated_at__gte=_synced_at - REFRESH_OVERLAP).values_list('pk', 'title', 'status')
+        )
+        categories = dict(Category.objects.values_list('pk', 'name'))
+        with _lock:
+            for pk, title, status in rows:
+                _current.set_item(pk, title if status == 'active' else None)
+            for pk in set(_current.categories) - set(categories):
+                _current.set_category(pk, None)
+            for pk, name in categories.items():
+                if _current.categories.get(pk) != name:
+                    _current.set_category(pk, name)
+            _synced_at = started
+    finally:
+        _refreshing = False
+
+
+def _start(target, name):
+    threading.Thread(target=_run, args=(target,), name=name, daemon=True).start()
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    """
+    返回与 prefix 匹配的提示（Suggestion 列表），分类在前
+
+    不访问数据库；索引尚未加载时在后台开始加载并返回空列表。
+    """
+    global _loading, _refreshing
+    with _lock:
+        if _current is None:
+            if not _loading:
+                _loading = True
+                _start(load, 'suggest-load')
+            return []
+        interval = refresh_interval()
+        if interval and not _refreshing and (timezone.now() - _synced_at).total_seconds() > interval:
+            _refreshing = True
+            _start(_catch_up, 'suggest-refresh')
+        return _current.index.lookup(prefix, limit)
+
+
+def _apply(method, pk, value):
+    with _lock:
+        if _current is not None:
+            getattr(_current, method)(pk, value)
+        elif _loading:
+            _backlog.append((method, pk, value))
+
+
+def item_changed(pk, title, status):
+    """物品保存后（事务提交后调用）"""
+    _apply('set_item', pk, title if status == 'active' else None)
+
+
+def item_deleted(pk):
+    _apply('set_item', pk, None)
+
+
+def category_changed(pk, name):
+    """分类保存或删除（name 为 None）后"""
+    _apply('set_category', pk, name)
+
+
+def reset():
+    """丢弃索引，下次查询时重新加载"""
+    global _current, _synced_at
+    with _lock:
+        _current = _synced_at = None
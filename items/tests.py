@@ -1,3 +1,997 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import caching
+
+from . import cards, counters, facets, favorites, feed, percolator, pricing, related, search, suggest, trending, views
+from .models import Item, Category, Favorite, RelatedItem, SavedSearch, SearchAlert, TrendingItem
+from .pagination import DEFAULT_KEYS, _encode_cursor, paginate
+
+
+def create_items(rows, seller, categories, batch_size=5000):
+    """批量创建测试物品（不触发信号），并重建全文索引"""
+    conditions = [value for value, _ in Item.CONDITION_CHOICES]
+    trade_methods = [value for value, _ in Item.TRADE_METHOD_CHOICES]
+    items = [
+        Item(
+            title=f'二手书{i}',
+            description=f'九成新教材，第{i}本，无笔记',
+            category=categories[i % len(categories)],
+            price=str(10 + i % 100),
+            price_min=10 + i % 100,
+            price_max=10 + i % 100,
+            condition=conditions[i % len(conditions)],
+            trade_method=trade_methods[i % len(trade_methods)],
+            contact='wx123',
+            image='items/test.png' if i % 2 else None,
+            seller=seller,
+        )
+        for i in range(rows)
+    ]
+    Item.objects.bulk_create(items, batch_size=batch_size)
+    search.rebuild_index(Item.objects.values_list('id', 'title', 'description').iterator())
+
+
+class ItemViewQueryBudgetMixin:
+    """
+    各视图的查询次数预算
+
+    数据量从 10 增长到 100,000 时查询次数必须保持不变，出现 N+1 查询时测试失败。
+    """
+    ROWS = 10
+
+    # 各视图允许的查询次数
+    HOME_QUERIES = 3
+    LIST_QUERIES = 3
+    DETAIL_QUERIES = 2
+    MY_ITEMS_QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.categories = [Category.objects.create(name=name) for name in ('书籍', '电子产品', '生活用品')]
+        create_items(cls.ROWS, cls.seller, cls.categories)
+        cls.item = Item.objects.order_by('-created_at').first()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_home(self):
+        with self.assertNumQueries(self.HOME_QUERIES):
+            self.client.get(reverse('home'))
+
+    def test_item_list(self):
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(reverse('item_list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_item_list_search(self):
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(reverse('item_list'), {'q': '二手书'})
+        self.assertTrue(response.context['items'])
+
+    def test_item_list_category(self):
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(reverse('item_list'), {'category': self.categories[0].pk})
+        self.assertTrue(response.context['items'])
+
+    def test_item_list_next_page(self):
+        if self.ROWS <= views.ITEMS_PER_PAGE:
+            # 数据不足一页时补足，保证有第二页
+            create_items(views.ITEMS_PER_PAGE, self.seller, self.categories)
+        page = self.client.get(reverse('item_list')).context['page']
+        self.assertTrue(page.has_next())
+        cache.clear()
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(reverse('item_list'), {'cursor': page.next_cursor})
+        second = response.context['page']
+        self.assertTrue(second)
+        self.assertTrue(second.has_previous())
+        self.assertFalse({item.pk for item in page} & {item.pk for item in second})
+
+    def test_item_detail(self):
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.client.get(reverse('item_detail', args=[self.item.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_items(self):
+        self.client.force_login(self.seller)
+        with self.assertNumQueries(self.MY_ITEMS_QUERIES):
+            response = self.client.get(reverse('my_items'))
+        self.assertEqual(response.status_code, 200)
+
+
+class ItemViewQueryBudgetSmallTests(ItemViewQueryBudgetMixin, TestCase):
+    ROWS = 10
+
+
+class ItemViewQueryBudgetMediumTests(ItemViewQueryBudgetMixin, TestCase):
+    ROWS = 1000
+
+
+class ItemViewQueryBudgetLargeTests(ItemViewQueryBudgetMixin, TestCase):
+    ROWS = 100000
+
+
+class SearchTests(TestCase):
+    """全文检索：中文二元组匹配，标题命中排在描述命中之前"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        category = Category.objects.create(name='电子产品')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.in_title = cls.create(category, '小米手机充电器', '原装配件，九成新')
+            cls.in_description = cls.create(category, '数据线', '适用于小米手机，充电很快')
+            cls.unrelated = cls.create(category, '机械键盘', 'Cherry 青轴，手感好')
+
+    @classmethod
+    def create(cls, category, title, description):
+        return Item.objects.create(
+            title=title, description=description, category=category, price='30',
+            contact='wx123', seller=cls.seller,
+        )
+
+    def search(self, query):
+        return [item.pk for item in search.search_items(Item.objects.all(), query)]
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('小米手机 iPhone12'), ['小米', '米手', '手机', '机', 'iphone12'])
+        self.assertEqual(search.build_match_query('二手 手机'), '"二手" "手机"')
+        self.assertEqual(search.build_match_query('书 Kindle'), '"书"* "kindle"*')
+        self.assertIsNone(search.build_match_query('，。'))
+
+    def test_bigram_phrase_match(self):
+        self.assertEqual(set(self.search('小米手机')), {self.in_title.pk, self.in_description.pk})
+        # 二元组必须连续出现："米机"不是任何物品的子串
+        self.assertEqual(self.search('米机'), [])
+        # 单字按前缀匹配任意位置的字
+        self.assertEqual(set(self.search('机')), {self.in_title.pk, self.in_description.pk, self.unrelated.pk})
+        self.assertEqual(self.search('cherry'), [self.unrelated.pk])
+
+    def test_title_hits_rank_first(self):
+        self.assertEqual(self.search('小米手机'), [self.in_title.pk, self.in_description.pk])
+        self.assertEqual(self.search('充电'), [self.in_title.pk, self.in_description.pk])
+
+    def test_index_follows_item_changes(self):
+        item = self.unrelated
+        item.title = '游戏手柄'
+        item.save()
+        self.assertEqual(self.search('键盘'), [])
+        self.assertEqual(self.search('手柄'), [item.pk])
+        item.delete()
+        self.assertEqual(self.search('手柄'), [])
+
+
+class PriceTests(TestCase):
+    """价格文本解析为数值区间，列表页按区间筛选和排序"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        category = Category.objects.create(name='书籍')
+        cls.items = {
+            price: Item.objects.create(
+                title=f'教材{price}', description='九成新', category=category, price=price,
+                contact='wx123', seller=cls.seller,
+            )
+            for price in ('20', '¥35.5元', '50-100', '面议', '看着给')
+        }
+
+    def test_parse_price(self):
+        cases = {
+            '100': (Decimal('100'), Decimal('100')),
+            '￥ 12.50 元': (Decimal('12.50'), Decimal('12.50')),
+            '50-100': (Decimal('50'), Decimal('100')),
+            '100 ~ 50': (Decimal('50'), Decimal('100')),
+            '30到40元': (Decimal('30'), Decimal('40')),
+            '面议': (None, None),
+            '': (None, None),
+        }
+        for text, bounds in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(pricing.parse_price(text), bounds)
+        for text in ('看着给', '1.234', '100000000'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                pricing.parse_price(text)
+        self.assertEqual(pricing.price_bounds('看着给'), (None, None))
+
+    def test_bounds_saved(self):
+        item = self.items['50-100']
+        self.assertEqual((item.price_min, item.price_max), (Decimal('50'), Decimal('100')))
+        item.price = '80'
+        item.save(update_fields=['price'])
+        item.refresh_from_db()
+        self.assertEqual((item.price_min, item.price_max), (Decimal('80'), Decimal('80')))
+
+    def listed(self, **params):
+        response = self.client.get(reverse('item_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [item.price for item in response.context['items']]
+
+    def test_range_filter(self):
+        # 价格区间与筛选区间有交集即可，面议和无法识别的价格不参与筛选
+        self.assertEqual(set(self.listed(min_price='30', max_price='60')), {'¥35.5元', '50-100'})
+        self.assertEqual(set(self.listed(min_price='90')), {'50-100'})
+        self.assertEqual(set(self.listed(max_price='20')), {'20'})
+        # 无效参数忽略
+        self.assertEqual(len(self.listed(min_price='abc', max_price='-5')), len(self.items))
+        self.assertEqual(len(self.listed(min_price='NaN')), len(self.items))
+
+    def test_sort(self):
+        self.assertEqual(self.listed(sort='price'), ['20', '¥35.5元', '50-100'])
+        self.assertEqual(self.listed(sort='price_desc'), ['50-100', '¥35.5元', '20'])
+
+
+class PaginationTests(TestCase):
+    """游标分页：排序键相同的行不重复、不遗漏，无效游标回到第一页"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        create_items(25, cls.seller, [Category.objects.create(name='书籍')])
+        # 一半的物品发布时间完全相同，只能靠 id 区分
+        Item.objects.filter(pk__in=Item.objects.order_by('pk').values('pk')[:12]).update(
+            created_at=timezone.now()
+        )
+
+    def test_next_and_previous_over_ties(self):
+        expected = list(Item.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        pages, cursor = [], None
+        while True:
+            page = paginate(Item.objects.all(), cursor, per_page=4)
+            pages.append([item.pk for item in page])
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual([pk for ids in pages for pk in ids], expected)
+
+        # 从最后一页逐页向前翻，与向后翻的结果一致
+        for ids in reversed(pages[:-1]):
+            page = paginate(Item.objects.all(), page.previous_cursor, per_page=4)
+            self.assertEqual([item.pk for item in page], ids)
+        self.assertFalse(page.has_previous())
+
+    def test_search_pages_stable_after_insert(self):
+        # 新物品改变 bm25 的统计量，所有物品的相关度一起漂移
+        keys = ('search_rank',) + DEFAULT_KEYS
+        original = set(Item.objects.values_list('pk', flat=True))
+        page = paginate(search.search_items(Item.objects.all(), '二手书'), None, per_page=10, keys=keys)
+        seen = [item.pk for item in page]
+        category = Category.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(10):
+                Item.objects.create(
+                    title=f'二手书{i}', description='二手书' * (i + 1), category=category,
+                    price='20', contact='wx123', seller=self.seller,
+                )
+        while page.has_next():
+            page = paginate(search.search_items(Item.objects.all(), '二手书'), page.next_cursor,
+                            per_page=10, keys=keys)
+            seen.extend(item.pk for item in page if item.pk in original)
+        self.assertEqual(sorted(seen), sorted(original))
+
+    def test_invalid_cursor(self):
+        first = [item.pk for item in self.client.get(reverse('item_list')).context['items']]
+        cursors = [
+            'not-a-cursor',
+            # {"d":"next","v":[{"a":1},1]}
+            'eyJkIjoibmV4dCIsInYiOlt7ImEiOjF9LDFdfQ',
+            _encode_cursor('next', [None, 1]),
+            _encode_cursor('next', ['2024-01-01T00:00:00+00:00', 'x']),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('item_list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([item.pk for item in response.context['items']], first)
+
+        # 搜索相关度等注解字段只接受数值
+        for rank in ('1', [1], True, None):
+            with self.subTest(rank=rank):
+                cursor = _encode_cursor('next', [rank, '2024-01-01T00:00:00+00:00', 1])
+                response = self.client.get(reverse('item_list'), {'q': '二手书', 'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+
+
+class FacetTests(TestCase):
+    """分面计数：每个分面应用其他分面的已选条件，结果缓存到物品变更为止"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.categories = [Category.objects.create(name=name) for name in ('书籍', '电子产品')]
+        create_items(12, cls.seller, cls.categories)
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, **params):
+        response = self.client.get(reverse('item_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            'category': {category.pk: count for category, count in response.context['category_facets']},
+            'condition': {value: count for value, _, count in response.context['condition_facets']},
+        }
+
+    def expected(self, field, **filters):
+        items = Item.objects.filter(status='active', **filters)
+        return {value: items.filter(**{field: value}).count() for value in items.values_list(field, flat=True)}
+
+    def test_counts(self):
+        books, electronics = self.categories
+        counts = self.facets(category=books.pk)
+        # 选中分类后，分类分面仍显示其他分类的数量，其他分面只统计该分类
+        self.assertEqual(counts['category'], {books.pk: 6, electronics.pk: 6})
+        condition_counts = {k: v for k, v in counts['condition'].items() if v}
+        self.assertEqual(condition_counts, self.expected('condition', category=books))
+
+        condition = Item.objects.filter(category=books).values_list('condition', flat=True).first()
+        counts = self.facets(category=books.pk, condition=condition)
+        self.assertEqual(
+            {k: v for k, v in counts['category'].items() if v}, self.expected('category_id', condition=condition)
+        )
+
+    def test_invalid_category(self):
+        for value in ('²', '١', 'abc'):
+            with self.subTest(value=value):
+                response = self.client.get(reverse('item_list'), {'category': value})
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['selected_category'])
+
+    def test_cached_until_item_changes(self):
+        books = self.categories[0]
+        self.assertEqual(self.facets()['category'][books.pk], 6)
+        with mock.patch('items.facets._group_counts', side_effect=AssertionError) as group_counts:
+            self.assertEqual(self.facets()['category'][books.pk], 6)
+        group_counts.assert_not_called()
+
+        item = Item.objects.filter(category=books).first()
+        item.status = 'sold'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertEqual(self.facets()['category'][books.pk], 5)
+
+
+class HomeFeedTests(TestCase):
+    """首页缓存在物品或分类变更时失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.category = Category.objects.create(name='书籍')
+        create_items(10, cls.seller, [cls.category])
+
+    def setUp(self):
+        cache.clear()
+
+    def latest(self):
+        return [item.pk for item in self.client.get(reverse('home')).context['latest_items']]
+
+    def test_cached(self):
+        self.latest()
+        with self.assertNumQueries(0):
+            feed.get_home_feed()
+
+    def test_invalidated_on_item_save(self):
+        before = self.latest()
+        item = Item.objects.get(pk=before[0])
+        item.status = 'sold'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertEqual(self.latest(), list(
+            Item.objects.filter(status='active').order_by('-created_at').values_list('pk', flat=True)[:6]
+        ))
+        self.assertNotIn(item.pk, self.latest())
+
+        item.title = '新标题'
+        item.status = 'active'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertEqual(self.latest(), before)
+
+    def test_invalidated_after_commit(self):
+        # 提交前其他请求读到的仍是旧数据，此时失效会让它们按旧数据重新填充缓存
+        self.latest()
+        facets_generation = facets._generation()
+        feed_version = feed._version()
+        item = Item.objects.get(pk=self.latest()[0])
+        item.status = 'sold'
+        with self.captureOnCommitCallbacks() as callbacks:
+            item.save()
+            self.assertEqual(feed._version(), feed_version)
+            self.assertEqual(facets._generation(), facets_generation)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(feed._version(), feed_version)
+        self.assertNotEqual(facets._generation(), facets_generation)
+
+    def test_invalidated_on_category_save(self):
+        self.latest()
+        self.category.name = '教材'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        names = [c.name for c in self.client.get(reverse('home')).context['categories']]
+        self.assertEqual(names, ['教材'])
+
+    def test_timeout(self):
+        with self.settings(CACHE_SHARED=False, LOCAL_CACHE_TIMEOUT=30):
+            self.assertEqual(caching.timeout(feed.FEED_TIMEOUT), 30)
+        with self.settings(CACHE_SHARED=True):
+            self.assertEqual(caching.timeout(feed.FEED_TIMEOUT), feed.FEED_TIMEOUT)
+
+
+class RelatedItemTests(TestCase):
+    """相关物品随物品保存增量更新，与全量重建的结果一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.books = Category.objects.create(name='书籍')
+        cls.phones = Category.objects.create(name='手机')
+        # 少于 TOP_K + 1 个物品，每个列表都未满
+        create_items(related.TOP_K - 2, cls.seller, [cls.books])
+        related.rebuild_all()
+
+    def create(self, title, category, price='30'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Item.objects.create(
+                title=title, description=f'{title}，九成新', category=category, price=price,
+                contact='wx123', seller=self.seller,
+            )
+
+    def save(self, item, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save(**kwargs)
+
+    def neighbours(self, item_id):
+        return list(
+            RelatedItem.objects.filter(item_id=item_id).order_by('-score', '-related_id')
+            .values_list('related_id', flat=True)
+        )
+
+    def assert_matches_rebuild(self):
+        ids = Item.objects.filter(status='active').values_list('pk', flat=True)
+        incremental = {pk: set(self.neighbours(pk)) for pk in ids}
+        related.rebuild_all()
+        self.assertEqual(incremental, {pk: set(self.neighbours(pk)) for pk in ids})
+
+    def test_new_item_joins_neighbour_lists(self):
+        others = set(Item.objects.values_list('pk', flat=True))
+        item = self.create('二手书教材', self.books)
+        self.assertEqual(set(self.neighbours(item.pk)), others)
+        self.assertEqual(set(RelatedItem.objects.filter(related=item).values_list('item_id', flat=True)), others)
+        self.assert_matches_rebuild()
+
+    def test_changed_item_leaves_lists_and_they_are_refilled(self):
+        item = Item.objects.order_by('pk').first()
+        referencing = list(RelatedItem.objects.filter(related=item).values_list('item_id', flat=True))
+        self.assertTrue(referencing)
+        item.title, item.description, item.category = '华为手机', '屏幕完好', self.phones
+        self.save(item)
+        self.assertFalse(RelatedItem.objects.filter(related=item).exists())
+        self.assert_matches_rebuild()
+
+    def test_full_lists_refilled(self):
+        Item.objects.all().delete()
+        create_items(related.TOP_K + 4, self.seller, [self.books])
+        related.rebuild_all()
+        item = Item.objects.order_by('pk').first()
+        referencing = list(RelatedItem.objects.filter(related=item).values_list('item_id', flat=True))
+        self.assertTrue(referencing)
+        item.title, item.description, item.category = '华为手机', '屏幕完好', self.phones
+        self.save(item)
+        for pk in referencing:
+            self.assertEqual(len(self.neighbours(pk)), related.TOP_K)
+        self.assert_matches_rebuild()
+
+    def test_sold_item_removed(self):
+        item = Item.objects.order_by('pk').first()
+        item.status = 'sold'
+        self.save(item)
+        self.assertFalse(RelatedItem.objects.filter(Q(item=item) | Q(related=item)).exists())
+        self.assert_matches_rebuild()
+
+    def test_unrelated_changes_skipped(self):
+        item = Item.objects.order_by('pk').first()
+        with mock.patch('items.related.compute_neighbours') as compute:
+            item.contact = 'wx456'
+            self.save(item)
+            self.save(Item.objects.only('id', 'contact').get(pk=item.pk), update_fields=['contact'])
+            item.status = 'sold'
+            self.save(item, update_fields=['status'])
+            compute.reset_mock()
+            item.status = 'inactive'
+            self.save(item)
+            item.price = '30'
+            self.save(item, update_fields=['contact'])
+        compute.assert_not_called()
+
+    def test_runs_off_request_path(self):
+        item = Item.objects.order_by('pk').first()
+        item.title = '二手书新版'
+        with mock.patch('items.related.schedule_update') as schedule_update:
+            self.save(item)
+        schedule_update.assert_called_once_with(item.pk)
+
+        with mock.patch('items.related._get_executor') as executor, \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            related.schedule_update(item.pk)
+        executor.return_value.submit.assert_called_once_with(related._run, related._update_by_id, item.pk)
+
+
+class CardCacheTests(TestCase):
+    """列表页卡片片段按物品缓存，物品更新或分类改名后重新渲染"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.category = Category.objects.create(name='书籍')
+        create_items(5, cls.seller, [cls.category])
+
+    def setUp(self):
+        cache.clear()
+
+    def timing(self):
+        response = self.client.get(reverse('item_list'))
+        return response['Server-Timing'], response
+
+    def test_hits_and_misses(self):
+        timing, _ = self.timing()
+        self.assertIn('hit 0 miss 5', timing)
+        timing, _ = self.timing()
+        self.assertIn('hit 5 miss 0', timing)
+
+        item = Item.objects.order_by('pk').first()
+        item.title = '新版教材'
+        item.save()
+        timing, response = self.timing()
+        self.assertIn('hit 4 miss 1', timing)
+        self.assertContains(response, '新版教材')
+
+        self.category.name = '教材'
+        self.category.save()
+        timing, response = self.timing()
+        self.assertIn('hit 0 miss 5', timing)
+        self.assertContains(response, '教材')
+
+    def test_cards_same_for_all_users(self):
+        self.timing()
+        self.client.force_login(self.seller)
+        timing, _ = self.timing()
+        self.assertIn('hit 5 miss 0', timing)
+
+    def test_render_cards_batches_cache_access(self):
+        items = list(Item.objects.select_related('category'))
+        with mock.patch('items.cards.cache') as card_cache:
+            card_cache.get_many.return_value = {}
+            cards_, stats = cards.render_cards(items)
+        card_cache.get_many.assert_called_once()
+        card_cache.set_many.assert_called_once()
+        self.assertEqual((stats.hits, stats.misses), (0, len(items)))
+        self.assertEqual([card['item'] for card in cards_], items)
+
+
+class AsyncItemViewTests(TestCase):
+    """ASGI 请求使用异步视图，查询次数与同步视图一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.categories = [Category.objects.create(name=name) for name in ('书籍', '电子产品', '生活用品')]
+        create_items(30, cls.seller, cls.categories)
+        cls.item = Item.objects.order_by('-created_at').first()
+
+    def setUp(self):
+        cache.clear()
+
+    def aget(self, *args, **kwargs):
+        """在同步测试中发出 ASGI 请求，便于使用 assertNumQueries"""
+        async def request():
+            return await self.async_client.get(*args, **kwargs)
+        return async_to_sync(request)()
+
+    def test_home(self):
+        with self.assertNumQueries(ItemViewQueryBudgetMixin.HOME_QUERIES):
+            response = self.aget(reverse('home'))
+        self.assertEqual(response.resolver_match.func, views.home_async)
+        self.assertEqual(len(response.context['latest_items']), 6)
+
+    def test_item_list(self):
+        with self.assertNumQueries(ItemViewQueryBudgetMixin.LIST_QUERIES):
+            response = self.aget(reverse('item_list'), {'q': '二手书', 'category': self.categories[0].pk})
+        self.assertEqual(response.resolver_match.func, views.item_list_async)
+        self.assertTrue(response.context['items'])
+        self.assertIn('Server-Timing', response)
+        sync_response = self.client.get(reverse('item_list'), {'q': '二手书', 'category': self.categories[0].pk})
+        self.assertEqual(
+            [item.pk for item in response.context['items']],
+            [item.pk for item in sync_response.context['items']],
+        )
+
+    def test_item_detail(self):
+        with self.assertNumQueries(ItemViewQueryBudgetMixin.DETAIL_QUERIES):
+            response = self.aget(reverse('item_detail', args=[self.item.pk]))
+        self.assertEqual(response.resolver_match.func, views.item_detail_async)
+        self.assertEqual(response.context['item'], self.item)
+
+    def test_item_detail_not_found(self):
+        response = self.aget(reverse('item_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ViewCounterTests(TestCase):
+    """浏览计数在内存中累加，批量写入数据库"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        create_items(3, cls.seller, [Category.objects.create(name='书籍')])
+        cls.items = list(Item.objects.order_by('pk'))
+
+    def setUp(self):
+        counters._pending.clear()
+
+    def test_detail_views_counted_without_writes(self):
+        url = reverse('item_detail', args=[self.items[0].pk])
+        with self.assertNumQueries(ItemViewQueryBudgetMixin.DETAIL_QUERIES):
+            self.client.get(url)
+        response = self.client.get(url)
+        self.assertContains(response, '<span>2</span>')
+        self.assertEqual(Item.objects.get(pk=self.items[0].pk).view_count, 0)
+
+        # 卖家本人浏览不计数
+        self.client.force_login(self.seller)
+        self.client.get(url)
+        self.assertEqual(counters.pending(self.items[0].pk), 2)
+
+    def test_flush_merges_increments_in_one_update(self):
+        for item, views in zip(self.items, (3, 1, 0)):
+            for _ in range(views):
+                counters.record(item.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counters.flush(), 2)
+        self.assertEqual(sum('SET "view_count"' in q['sql'] for q in queries), 1)
+        self.assertEqual(
+            list(Item.objects.order_by('pk').values_list('view_count', flat=True)), [3, 1, 0]
+        )
+        self.assertEqual(counters.pending(self.items[0].pk), 0)
+        self.assertEqual(Item.objects.get(pk=self.items[0].pk).get_view_count(), 3)
+
+    def test_failed_flush_keeps_increments(self):
+        counters.record(self.items[1].pk)
+        with mock.patch.object(counters, '_write', side_effect=OperationalError('database is locked')):
+            self.assertEqual(counters.flush(), 0)
+        self.assertEqual(counters.pending(self.items[1].pk), 1)
+        counters.flush()
+        self.assertEqual(Item.objects.get(pk=self.items[1].pk).view_count, 1)
+
+
+class TrendingTests(TestCase):
+    """热度随时间衰减，增量合并新事件，首页读取保存的热门榜"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.category = Category.objects.create(name='书籍')
+
+    def setUp(self):
+        cache.clear()
+        counters._pending.clear()
+
+    def publish(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Item.objects.create(
+                title=title, category=self.category, description='九成新', price='20',
+                contact='wx123', seller=self.seller,
+            )
+
+    def test_decay(self):
+        now = timezone.now()
+        day_ago = now - timedelta(hours=24)
+        # 半衰期为 24 小时：一天前的 2 次事件与现在的 1 次事件热度相同
+        self.assertAlmostEqual(trending.event_score(2, day_ago), trending.event_score(1, now))
+        combined = trending.combine(trending.event_score(1, now), trending.event_score(2, day_ago))
+        self.assertAlmostEqual(trending.current_score(combined, now), 2.0)
+
+    def test_views_change_ranking(self):
+        older = self.publish('旧教材')
+        newer = self.publish('新教材')
+        self.assertEqual(trending.top_items(), [newer, older])
+
+        for _ in range(20):
+            counters.record(older.pk)
+        counters.flush()
+        self.assertEqual(trending.top_items(), [older, newer])
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['trending_items'], [older, newer])
+
+    def test_inactive_items_leave_ranking(self):
+        item = self.publish('教材')
+        self.assertEqual(TrendingItem.objects.get().item, item)
+        item.status = 'sold'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertFalse(TrendingItem.objects.exists())
+
+    def test_runs_off_request_path(self):
+        item = self.publish('教材')
+        with mock.patch('items.trending._get_executor') as executor, \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            trending.schedule_item_changed(item.pk)
+        executor.return_value.submit.assert_called_once_with(trending._run, trending.item_changed, item.pk)
+
+    def test_rebuild(self):
+        create_items(80, self.seller, [self.category])
+        Item.objects.filter(pk=Item.objects.order_by('pk').first().pk).update(view_count=1000)
+        out = StringIO()
+        call_command('rebuild_trending', stdout=out)
+        self.assertIn('完成！', out.getvalue())
+        self.assertFalse(Item.objects.filter(trending_score__isnull=True).exists())
+        self.assertEqual(TrendingItem.objects.count(), trending.TRENDING_STORE)
+        self.assertEqual(trending.top_items(1)[0], Item.objects.order_by('pk').first())
+
+
+class FavoriteTests(TestCase):
+    """收藏状态每个请求最多查询一次，之后从缓存的紧凑集合读取"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.buyer = User.objects.create_user(username='buyer', password='pass12345678')
+        create_items(30, cls.seller, [Category.objects.create(name='书籍')])
+        cls.items = list(Item.objects.order_by('pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.buyer)
+
+    def favorite(self, item, headers=None, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('item_favorite', args=[item.pk]), data, headers=headers)
+
+    def test_toggle(self):
+        item = self.items[0]
+        response = self.favorite(item, next=reverse('item_list'))
+        self.assertRedirects(response, reverse('item_list'))
+        self.assertTrue(Favorite.objects.filter(user=self.buyer, item=item).exists())
+
+        response = self.favorite(item, headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(response.json(), {'favorited': False})
+        self.assertFalse(Favorite.objects.exists())
+
+        # 指定状态时重复请求结果不变
+        for _ in range(2):
+            self.favorite(item, favorited='1')
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_login_and_post_required(self):
+        url = reverse('item_favorite', args=[self.items[0].pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_list_loads_favorites_once(self):
+        for item in self.items[::3]:
+            self.favorite(item, favorited='1')
+        response = self.client.get(reverse('item_list'))
+        favorite_ids = {item.pk for item in self.items[::3]}
+        self.assertEqual(response.context['favorite_ids'], favorite_ids)
+        # 网格和列表两种视图各有一个按钮
+        on_page = [item for item in response.context['items'] if item.pk in favorite_ids]
+        self.assertContains(response, 'fas fa-heart text-danger', count=2 * len(on_page))
+
+        # 进程内缓存时不缓存收藏，每个请求查询一次（加上 session 和用户）
+        with self.assertNumQueries(ItemViewQueryBudgetMixin.LIST_QUERIES + 3):
+            self.client.get(reverse('item_list'))
+
+        # 共享缓存命中后，已登录用户的列表页查询次数与未登录时相同（加上 session 和用户）
+        with self.settings(CACHE_SHARED=True):
+            self.client.get(reverse('item_list'))
+            with self.assertNumQueries(ItemViewQueryBudgetMixin.LIST_QUERIES + 2):
+                self.client.get(reverse('item_list'))
+
+    @override_settings(CACHE_SHARED=True)
+    def test_cache_invalidated_on_change(self):
+        item = self.items[-1]
+        self.assertEqual(favorites.favorite_ids(self.buyer), set())
+        self.favorite(item, favorited='1')
+        response = self.client.get(reverse('item_detail', args=[item.pk]))
+        self.assertContains(response, '已收藏')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'fas fa-heart text-danger')
+
+        self.favorite(item, favorited='0')
+        self.assertNotContains(self.client.get(reverse('item_detail', args=[item.pk])), '已收藏')
+
+    @override_settings(CACHE_SHARED=True)
+    def test_large_ids(self):
+        # BigAutoField 的 id 可以超过 32 位
+        item = Item.objects.get(pk=self.items[0].pk)
+        item.pk = 2 ** 40
+        item.save(force_insert=True)
+        Favorite.objects.create(user=self.buyer, item=item)
+        self.assertEqual(favorites.favorite_ids(self.buyer), {2 ** 40})
+        # 新的请求从缓存读取
+        del self.buyer._favorite_ids
+        with self.assertNumQueries(0):
+            self.assertEqual(favorites.favorite_ids(self.buyer), {2 ** 40})
+
+    def test_favorite_counts_toward_trending(self):
+        item = self.items[0]
+        before = Item.objects.get(pk=item.pk).trending_score
+        self.favorite(item, favorited='1')
+        self.assertGreater(Item.objects.get(pk=item.pk).trending_score or 0, before or 0)
+        self.assertEqual(trending.top_items(1), [item])
+
+
+class SavedSearchTests(TestCase):
+    """新物品通过倒排索引匹配保存的搜索，查询量与保存的搜索数量无关"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.buyer = User.objects.create_user(username='buyer', password='pass12345678')
+        cls.books = Category.objects.create(name='书籍')
+        cls.electronics = Category.objects.create(name='电子产品')
+
+    def publish(self, title, category=None, price='20', seller=None, description='九成新'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Item.objects.create(
+                title=title, category=category or self.books, description=description, price=price,
+                contact='wx123', seller=seller or self.seller,
+            )
+
+    def alerted(self, saved_search):
+        return list(SearchAlert.objects.filter(saved_search=saved_search).values_list('item__title', flat=True))
+
+    def test_matches_keywords_category_and_price(self):
+        keyword = percolator.create(self.buyer, query='高等数学')
+        category = percolator.create(self.buyer, category_id=self.electronics.pk)
+        priced = percolator.create(self.buyer, query='iphone', min_price=1000, max_price=3000)
+
+        self.publish('高等数学教材 第七版')
+        self.publish('数学高等教材')  # 二元组都在，但不是连续的"高等数学"
+        self.publish('罗技鼠标', category=self.electronics)
+        self.publish('iPhone 13', category=self.electronics, price='2500')
+        self.publish('iPhone 15 Pro', category=self.electronics, price='6000')
+
+        self.assertEqual(self.alerted(keyword), ['高等数学教材 第七版'])
+        self.assertCountEqual(self.alerted(category), ['罗技鼠标', 'iPhone 13', 'iPhone 15 Pro'])
+        self.assertEqual(self.alerted(priced), ['iPhone 13'])
+
+    def test_prefix_and_own_items(self):
+        prefix = percolator.create(self.buyer, query='switch 书')
+        self.publish('Nintendo Switch 游戏书')
+        self.publish('Switch 手柄')
+        # 卖家自己的搜索不提醒
+        own = percolator.create(self.seller, query='书')
+        self.publish('二手书')
+        self.assertEqual(self.alerted(prefix), ['Nintendo Switch 游戏书'])
+        self.assertEqual(self.alerted(own), [])
+
+    def test_cost_independent_of_saved_search_count(self):
+        percolator.create(self.buyer, query='高等数学')
+        item = self.publish('线性代数')
+        with CaptureQueriesContext(connection) as few:
+            percolator.percolate(item.pk)
+        for i in range(200):
+            percolator.create(self.buyer, query=f'无关{i}')
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(percolator.percolate(item.pk), 0)
+        self.assertEqual(len(many), len(few))
+
+    def test_views(self):
+        self.client.force_login(self.buyer)
+        response = self.client.post(reverse('saved_search_create'), {
+            'q': '台灯', 'category': self.books.pk, 'min_price': '', 'max_price': '50',
+        })
+        self.assertRedirects(response, reverse('saved_searches'))
+        saved_search = SavedSearch.objects.get(user=self.buyer)
+        self.assertEqual(saved_search.max_price, 50)
+
+        self.publish('宜家台灯')
+        response = self.client.get(reverse('saved_searches'))
+        self.assertContains(response, '1 条新提醒')
+        self.assertContains(response, '宜家台灯')
+        self.assertFalse(SearchAlert.objects.filter(is_read=False).exists())
+
+        # 没有关键词也没有分类的搜索不保存
+        self.client.post(reverse('saved_search_create'), {'q': '', 'max_price': '50'})
+        self.assertEqual(SavedSearch.objects.count(), 1)
+
+        self.client.post(reverse('saved_search_delete', args=[saved_search.pk]))
+        self.assertFalse(SavedSearch.objects.exists())
+        self.assertFalse(SearchAlert.objects.exists())
+
+
+class SuggestTests(TestCase):
+    """输入提示来自内存前缀索引，加载后不访问数据库，随物品变更增量更新"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.category = Category.objects.create(name='电子产品')
+        for title in ('小米手机', '小米手机', '小米充电宝', 'iPhone 13 手机壳', '二手自行车'):
+            Item.objects.create(
+                title=title, category=cls.category, description='九成新', price='20',
+                contact='wx123', seller=cls.seller,
+            )
+        Item.objects.filter(title='二手自行车').update(status='sold')
+
+    def setUp(self):
+        suggest.reset()
+        suggest.load()
+
+    def texts(self, prefix):
+        return [suggestion.text for suggestion in suggest.suggest(prefix)]
+
+    def test_prefixes(self):
+        # 相同标题合并，在售数量多的在前
+        self.assertEqual(self.texts('小米'), ['小米手机', '小米充电宝'])
+        # 标题中间的汉字和英文单词也可以开始匹配，不区分大小写
+        self.assertEqual(self.texts('手机'), ['小米手机', 'iPhone 13 手机壳'])
+        self.assertEqual(self.texts('IPH'), ['iPhone 13 手机壳'])
+        self.assertEqual(self.texts('13'), ['iPhone 13 手机壳'])
+        self.assertEqual(self.texts('电子'), ['电子产品'])
+        self.assertEqual(self.texts('自行车'), [])
+        self.assertEqual(self.texts(''), [])
+
+    def test_burst_nodes(self):
+        index = suggest.PrefixIndex()
+        titles = [f'二手书 {i}' for i in range(200)] + [f'二手书架{i}' for i in range(50)]
+        for title in titles:
+            index.add('item', title, title, 1)
+        index.add('item', '二手书 7', '二手书 7', 5)
+        self.assertEqual(index.lookup('二手书')[0].text, '二手书 7')
+        self.assertEqual(len(index.lookup('二手书架', limit=suggest.TOP_K)), suggest.TOP_K)
+        self.assertEqual(
+            [s.text for s in index.lookup('书 19', limit=suggest.TOP_K)],
+            ['二手书 19'] + [f'二手书 19{i}' for i in range(10)],
+        )
+        for title in titles:
+            index.add('item', title, title, -10)
+        self.assertEqual(index.lookup('二手'), [])
+        self.assertFalse(index.suggestions)
+
+    def test_endpoint_does_not_query_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('item_suggest'), {'q': '充电', 'limit': 5})
+        self.assertEqual(response.json()['suggestions'], [{
+            'text': '小米充电宝', 'type': 'item', 'url': reverse('item_list') + '?q=%E5%B0%8F%E7%B1%B3%E5%85%85%E7%94%B5%E5%AE%9D',
+        }])
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.texts('充电'), ['小米充电宝'])
+        item = Item.objects.get(title='小米充电宝')
+        with self.captureOnCommitCallbacks(execute=True):
+            item.title = '罗马仕充电宝'
+            item.save()
+        self.assertEqual(self.texts('充电'), ['罗马仕充电宝'])
+        self.assertEqual(self.texts('小米'), ['小米手机'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(title='小米手机').first().delete()
+            Category.objects.create(name='生活用品')
+        self.assertEqual(self.texts('小米'), ['小米手机'])
+        self.assertEqual(self.texts('生活'), ['生活用品'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for item in Item.objects.filter(title='小米手机'):
+                item.status = 'inactive'
+                item.save()
+        self.assertEqual(self.texts('小米'), [])
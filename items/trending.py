@@ -0,0 +1,282 @@
+"""
+热门物品
+
+热度是随时间指数衰减的事件权重之和：发布、浏览、收藏各算一次事件，
+发生在 t 时刻、权重为 w 的事件在 now 时刻贡献 w * 2^(-(now - t) / 半衰期)。
+
+所有物品按相同的速率衰减，排序只在新事件到达时才会变化，因此保存的是折算到
+固定起点 EPOCH 的得分，并取对数防止溢出：
+    trending_score = log(Σ w * e^(λ (t - EPOCH)))，λ = ln2 / 半衰期
+新事件到达时用 logaddexp 合并到已有得分即可，不需要重新计算整张 Item 表。
+
+得分最高的 TRENDING_STORE 个在售物品保存在 TrendingItem 表中，首页只读取前几行。
+发布和收藏事件在后台线程中合并，不占用请求线程；浏览由 items.counters 批量写入。
+冷启动或修改权重后用 rebuild_trending 命令全量重建。
+"""
+
+import heapq
+import logging
+import math
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Case, FloatField, Value, When
+from django.utils import timezone
+
+from .models import Favorite, Item, TrendingItem
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+# 首页显示的热门物品数量，以及 TrendingItem 表保留的数量（多留一些以便物品下架后补位）
+TRENDING_COUNT = 6
+TRENDING_STORE = 50
+
+# 事件权重
+PUBLISH_WEIGHT = 5.0
+VIEW_WEIGHT = 1.0
+FAVORITE_WEIGHT = 10.0
+
+BATCH_SIZE = 300
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def half_life():
+    """半衰期（秒）"""
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600
+
+
+def _rate():
+    return math.log(2) / half_life()
+
+
+def event_score(weight, when=None):
+    """权重为 weight、发生在 when 时刻的事件对应的对数得分"""
+    when = when or timezone.now()
+    return math.log(weight) + _rate() * (when - EPOCH).total_seconds()
+
+
+def spread_score(weight, start, end=None):
+    """
+    权重 weight 在 [start, end] 内均匀发生时的对数得分
+
+    冷启动时浏览次数没有时间戳，按发布以来均匀发生估算。
+    """
+    end = end or timezone.now()
+    rate, span = _rate(), max((end - start).total_seconds(), 1.0)
+    # ∫ e^(λ(t-EPOCH)) dt / span = e^(λ(end-EPOCH)) * (1 - e^(-λ span)) / (λ span)
+    return math.log(weight) + rate * (end - EPOCH).total_seconds() + math.log(-math.expm1(-rate * span) / (rate * span))
+
+
+def combine(a, b):
+    """两个对数得分相加（logaddexp），None 表示没有得分"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def current_score(score, now=None):
+    """对数得分折算为 now 时刻的热度"""
+    if score is None:
+        return 0.0
+    now = now or timezone.now()
+    return math.exp(score - _rate() * (now - EPOCH).total_seconds())
+
+
+def _top_ids(limit=TRENDING_COUNT):
+    return list(TrendingItem.objects.order_by('-score').values_list('item_id', flat=True)[:limit])
+
+
+def _store(scores):
+    """把 {物品 id: 得分} 写入热门榜，超出 TRENDING_STORE 的部分删除"""
+    if not scores:
+        return
+    TrendingItem.objects.bulk_create(
+        [TrendingItem(item_id=pk, score=score) for pk, score in scores.items()],
+        update_conflicts=True, unique_fields=['item'], update_fields=['score'],
+    )
+    extra = list(TrendingItem.objects.order_by('-score').values_list('item_id', flat=True)[TRENDING_STORE:])
+    if extra:
+        TrendingItem.objects.filter(item_id__in=extra).delete()
+
+
+def _write_scores(scores):
+    """一条 UPDATE 写入一批物品的得分"""
+    ids = list(scores)
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        Item.objects.filter(pk__in=batch).update(trending_score=Case(
+            *(When(pk=pk, then=Value(scores[pk])) for pk in batch),
+            output_field=FloatField(),
+        ))
+
+
+def apply(events):
+    """
+    合并新事件，events 为 {物品 id: 对数得分}
+
+    更新 Item.trending_score 和热门榜；首页显示的前几名变化时使首页缓存失效。
+    """
+    from . import feed
+    if not events:
+        return
+    ids = list(events)
+    with transaction.atomic():
+        before = _top_ids()
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            rows = Item.objects.filter(pk__in=batch).values_list('pk', 'trending_score', 'status')
+            scores, active = {}, {}
+            for pk, score, status in rows:
+                scores[pk] = combine(score, events[pk])
+                if status == 'active':
+                    active[pk] = scores[pk]
+            _write_scores(scores)
+            _store(active)
+        changed = _top_ids() != before
+    if changed:
+        feed.invalidate()
+
+
+def record(item_id, weight, when=None):
+    """记录单个事件"""
+    apply({item_id: event_score(weight, when)})
+
+
+def record_views(counts, when=None):
+    """记录一批浏览，counts 为 {物品 id: 次数}"""
+    when = when or timezone.now()
+    apply({pk: event_score(count * VIEW_WEIGHT, when) for pk, count in counts.items() if count > 0})
+
+
+def item_changed(item_id):
+    """物品保存后：下架或售出的移出热门榜，在售的按已有得分放回"""
+    from . import feed
+    row = Item.objects.filter(pk=item_id).values_list('status', 'trending_score').first()
+    if row is None:
+        return
+    status, score = row
+    if status != 'active':
+        if TrendingItem.objects.filter(item_id=item_id).delete()[0]:
+            feed.invalidate()
+    elif score is not None:
+        floor = TrendingItem.objects.order_by('-score').values_list('score', flat=True)[TRENDING_STORE - 1:].first()
+        if floor is None or score > floor:
+            before = _top_ids()
+            _store({item_id: score})
+            if _top_ids() != before:
+                feed.invalidate()
+
+
+def _run(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('更新热门榜失败：%s%r', function.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # 单个线程依次执行，热门榜的读改写不会并发
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='trending')
+        return _executor
+
+
+def _submit(function, *args):
+    # 仍处于事务中时（如测试中执行 on_commit 回调）其他连接看不到这次修改，直接在当前线程执行
+    if connection.in_atomic_block:
+        function(*args)
+    else:
+        _get_executor().submit(_run, function, *args)
+
+
+def schedule_record(item_id, weight):
+    """在后台线程中记录单个事件，事件时间取调用时刻"""
+    _submit(record, item_id, weight, timezone.now())
+
+
+def schedule_item_changed(item_id):
+    """在后台线程中按物品的新状态更新热门榜"""
+    _submit(item_changed, item_id)
+
+
+def top_links(limit=TRENDING_COUNT):
+    """热门榜的前 limit 行（TrendingItem 查询集，已关联物品和分类）"""
+    return (
+        TrendingItem.objects.filter(item__status='active').select_related('item', 'item__category')
+        .order_by('-score')[:limit]
+    )
+
+
+def top_items(limit=TRENDING_COUNT):
+    """热门物品，按热度从高到低"""
+    return [link.item for link in top_links(limit)]
+
+
+def cold_score(created_at, view_count, favorited_at=()):
+    """
+    冷启动时根据已有数据估算得分
+
+    发布和收藏事件按各自的时间计算，浏览没有时间戳，按发布以来均匀发生估算。
+    """
+    score = event_score(PUBLISH_WEIGHT, created_at)
+    if view_count:
+        score = combine(score, spread_score(view_count * VIEW_WEIGHT, created_at))
+    for when in favorited_at:
+        score = combine(score, event_score(FAVORITE_WEIGHT, when))
+    return score
+
+
+def rebuild_all(batch_size=1000, progress=None):
+    """全量重建所有物品的得分和热门榜，返回处理的物品数"""
+    from . import feed
+    rows = Item.objects.order_by('pk').values_list('id', 'created_at', 'view_count', 'status')
+    # 小顶堆只保留得分最高的 TRENDING_STORE 个在售物品
+    top = []
+    done = 0
+    last = 0
+    while True:
+        # 按主键分页，读取和更新同一张表时不使用跨批次的游标
+        batch = list(rows.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            break
+        favorited_at = defaultdict(list)
+        for item_id, when in Favorite.objects.filter(
+            item_id__gte=batch[0][0], item_id__lte=batch[-1][0]
+        ).values_list('item_id', 'created_at'):
+            favorited_at[item_id].append(when)
+        scores = {}
+        for pk, created_at, view_count, status in batch:
+            scores[pk] = cold_score(created_at, view_count, favorited_at[pk])
+            if status != 'active':
+                continue
+            if len(top) < TRENDING_STORE:
+                heapq.heappush(top, (scores[pk], pk))
+            elif scores[pk] > top[0][0]:
+                heapq.heapreplace(top, (scores[pk], pk))
+        with transaction.atomic():
+            _write_scores(scores)
+        done += len(batch)
+        last = batch[-1][0]
+        if progress:
+            progress(done)
+
+    with transaction.atomic():
+        TrendingItem.objects.all().delete()
+        TrendingItem.objects.bulk_create([TrendingItem(item_id=pk, score=score) for score, pk in top])
+    feed.invalidate()
+    return done
@@ -10,8 +10,15 @@ urlpatterns = [
     path('<int:pk>/', views.item_detail, name='item_detail'),
     path('<int:pk>/edit/', views.item_edit, name='item_edit'),
     path('<int:pk>/toggle/', views.item_toggle_status, name='item_toggle_status'),
+    path('<int:pk>/favorite/', views.item_favorite, name='item_favorite'),
     
     # 列表和搜索
     path('list/', views.item_list, name='item_list'),
     path('my/', views.my_items, name='my_items'),
+    path('suggest/', views.item_suggest, name='item_suggest'),
+    
+    # 保存的搜索
+    path('searches/', views.saved_searches, name='saved_searches'),
+    path('searches/create/', views.saved_search_create, name='saved_search_create'),
+    path('searches/<int:pk>/delete/', views.saved_search_delete, name='saved_search_delete'),
 ]
\ No newline at end of file
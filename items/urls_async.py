@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views, urls
+
+# ASGI 下使用：浏览类页面换成异步视图，其余与 items.urls 相同
+urlpatterns = [
+    path('', views.home_async, name='home'),
+    path('<int:pk>/', views.item_detail_async, name='item_detail'),
+    path('list/', views.item_list_async, name='item_list'),
+] + urls.urlpatterns
@@ -1,28 +1,77 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import Item, Category
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from django.views.decorators.http import require_POST
+from decimal import Decimal, InvalidOperation
+from .models import Item, Category, SavedSearch, SearchAlert
 from .forms import ItemForm
+from .search import search_items
+from .facets import facet_counts, afacet_counts, FACET_FIELDS
+from .feed import get_home_feed, aget_home_feed
+from .related import related_items, arelated_items
+from .cards import render_cards
+from .pagination import paginate, apaginate, DEFAULT_KEYS
+from . import counters as view_counters
+from . import favorites, percolator, suggest
+from core.routers import replica_reads
+from core.uploads import image_uploads
+from core.shortcuts import aget_user, alist, arender
 
+# 列表页每页显示的物品数量
+ITEMS_PER_PAGE = 24
 
+# 列表卡片用到的字段，避免加载其他列并一次取出分类名称
+CARD_FIELDS = (
+    'id', 'title', 'description', 'price', 'price_min', 'price_max', 'condition',
+    'trade_method', 'image', 'status', 'created_at', 'updated_at', 'category__name',
+)
+
+# 排序方式对应的分页键，价格排序只包含有明确价格的物品
+SORT_KEYS = {
+    'price': ('price_min', 'id'),
+    'price_desc': ('-price_max', '-id'),
+}
+
+
+def _parse_price_param(value):
+    """解析价格筛选参数，无效时返回 None"""
+    try:
+        price = Decimal(value)
+    except (TypeError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def _parse_id_param(value):
+    """解析 id 参数，只接受 ASCII 数字（str.isdigit 对"²"等字符也返回 True），无效时返回 None"""
+    if value and value.isascii() and value.isdigit():
+        return value
+    return None
+
+
+@replica_reads
 def home(request):
-    """首页视图，显示最新发布的物品"""
-    # 获取最新的6个在售物品
-    latest_items = Item.objects.filter(status='active').order_by('-created_at')[:6]
-    
-    # 获取所有分类
-    categories = Category.objects.all()
+    """首页视图，显示热门物品和最新发布的物品"""
+    # 热门和最新的6个在售物品以及所有分类（带缓存）
+    feed = get_home_feed()
     
     context = {
-        'latest_items': latest_items,
-        'categories': categories,
+        'latest_items': feed['latest_items'],
+        'trending_items': feed['trending_items'],
+        'categories': feed['categories'],
+        'favorite_ids': favorites.favorite_ids(request.user),
     }
     
     return render(request, 'core/mainpage.html', context)
 
 
 @login_required
+@image_uploads
 def item_create(request):
     """发布物品视图"""
     if request.method == 'POST':
@@ -51,64 +100,158 @@ def item_create(request):
     return render(request, 'items/item_form.html', context)
 
 
+@replica_reads
 def item_detail(request, pk):
     """物品详情视图"""
     # 获取物品，如果不存在则返回404
-    item = get_object_or_404(Item, pk=pk)
+    item = get_object_or_404(
+        Item.objects.select_related('category', 'seller', 'seller__profile'), pk=pk
+    )
     
     # 检查当前用户是否为物品发布者
-    is_owner = request.user.is_authenticated and item.seller == request.user
+    is_owner = request.user.is_authenticated and item.seller_id == request.user.pk
+    if not is_owner:
+        view_counters.record(item.pk)
     
     context = {
         'item': item,
         'is_owner': is_owner,
+        'related_items': related_items(item),
+        'favorite_ids': favorites.favorite_ids(request.user),
     }
     
     return render(request, 'items/item_detail.html', context)
 
 
-def item_list(request):
-    """物品列表视图（可选功能）"""
-    items = Item.objects.filter(status='active').order_by('-created_at')
-    
-    # 搜索功能
-    query = request.GET.get('q')
-    if query:
-        items = items.filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query)
-        )
+def _list_params(request):
+    """解析列表页的查询参数"""
+    category_id = _parse_id_param(request.GET.get('category'))
+    sort = request.GET.get('sort', '')
+    return {
+        'query': request.GET.get('q'),
+        'min_price': _parse_price_param(request.GET.get('min_price')),
+        'max_price': _parse_price_param(request.GET.get('max_price')),
+        'category_id': category_id,
+        # 分面筛选：分类、物品状态、交易方式
+        'selected': {
+            'category': category_id,
+            'condition': request.GET.get('condition') or None,
+            'trade_method': request.GET.get('trade_method') or None,
+        },
+        'sort': sort if sort in SORT_KEYS else '',
+    }
+
+
+def _list_querysets(params):
+    """
+    返回 (分面筛选之前的查询集, 最终查询集, 分页键)
+
+    分面计数基于分面筛选之前的结果。
+    """
+    items = Item.objects.filter(status='active').select_related('category').only(*CARD_FIELDS)
     
-    # 分类筛选
-    category_id = request.GET.get('category')
-    if category_id:
-        items = items.filter(category_id=category_id)
+    # 搜索功能（全文索引，按相关度排序）
+    keys = DEFAULT_KEYS
+    if params['query']:
+        items = search_items(items, params['query'])
+        keys = ('search_rank',) + DEFAULT_KEYS
     
-    categories = Category.objects.all()
+    # 价格区间筛选：物品价格区间与筛选区间有交集即可
+    if params['min_price'] is not None:
+        items = items.filter(price_max__gte=params['min_price'])
+    if params['max_price'] is not None:
+        items = items.filter(price_min__lte=params['max_price'])
     
-    context = {
-        'items': items,
+    unfaceted = items
+    for name, field in FACET_FIELDS.items():
+        if params['selected'][name]:
+            items = items.filter(**{field: params['selected'][name]})
+    
+    # 价格排序
+    if params['sort']:
+        keys = SORT_KEYS[params['sort']]
+        items = items.filter(price_min__isnull=False)
+    
+    return unfaceted, items, keys
+
+
+def _list_context(request, params, page, cards, categories, counts, favorite_ids):
+    category_facets = [(c, counts['category'].get(c.id, 0)) for c in categories]
+    condition_facets = [
+        (value, label, counts['condition'].get(value, 0)) for value, label in Item.CONDITION_CHOICES
+    ]
+    trade_method_facets = [
+        (value, label, counts['trade_method'].get(value, 0)) for value, label in Item.TRADE_METHOD_CHOICES
+    ]
+    selected = params['selected']
+    return {
+        'items': page,
+        'page': page,
+        'cards': cards,
+        'favorite_ids': favorite_ids,
         'categories': categories,
-        'query': query or '',
-        'selected_category': int(category_id) if category_id else None,
+        'category_facets': category_facets,
+        'condition_facets': condition_facets,
+        'trade_method_facets': trade_method_facets,
+        'selected_condition': selected['condition'] or '',
+        'selected_trade_method': selected['trade_method'] or '',
+        'query': params['query'] or '',
+        'selected_category': int(params['category_id']) if params['category_id'] else None,
+        'min_price': request.GET.get('min_price', '') if params['min_price'] is not None else '',
+        'max_price': request.GET.get('max_price', '') if params['max_price'] is not None else '',
+        'sort': params['sort'],
     }
+
+
+@replica_reads
+def item_list(request):
+    """物品列表视图（可选功能）"""
+    params = _list_params(request)
+    unfaceted, items, keys = _list_querysets(params)
+    
+    counts = facet_counts(unfaceted, request.GET, params['selected'])
+    categories = Category.objects.all()
     
-    return render(request, 'items/item_list.html', context)
+    # 游标分页
+    page = paginate(items, request.GET.get('cursor'), ITEMS_PER_PAGE, keys=keys, request=request)
+    
+    # 卡片片段缓存
+    cards, card_stats = render_cards(page.object_list)
+    
+    context = _list_context(
+        request, params, page, cards, categories, counts, favorites.favorite_ids(request.user)
+    )
+    response = render(request, 'items/item_list.html', context)
+    response['Server-Timing'] = card_stats.server_timing()
+    return response
 
 
 @login_required
 def my_items(request):
     """我的物品视图"""
-    items = Item.objects.filter(seller=request.user).order_by('-created_at')
+    items = Item.objects.filter(seller=request.user)
+    page = paginate(
+        items.select_related('category').only(*CARD_FIELDS),
+        request.GET.get('cursor'), ITEMS_PER_PAGE, request=request
+    )
+    
+    # 各状态的物品数量（一次分组查询）
+    status_counts = dict(items.order_by().values_list('status').annotate(total=Count('id')))
     
     context = {
-        'items': items,
+        'items': page,
+        'page': page,
+        'total_items_count': sum(status_counts.values()),
+        'active_items_count': status_counts.get('active', 0),
+        'sold_items_count': status_counts.get('sold', 0),
+        'inactive_items_count': status_counts.get('inactive', 0),
     }
     
     return render(request, 'items/my_items.html', context)
 
 
 @login_required
+@image_uploads
 def item_edit(request, pk):
     """编辑物品视图（可选功能）"""
     item = get_object_or_404(Item, pk=pk, seller=request.user)
@@ -148,4 +291,179 @@ def item_toggle_status(request, pk):
     item.save()
     messages.success(request, message)
     
-    return redirect('my_items')
\ No newline at end of file
+    return redirect('my_items')
+
+
+@login_required
+@require_POST
+def item_favorite(request, pk):
+    """
+    收藏或取消收藏物品
+
+    POST 参数 favorited 为 1 / 0 时设置为对应状态，省略时切换。
+    AJAX 请求返回 JSON {"favorited": bool}，否则返回 next 指定的页面。
+    """
+    item = get_object_or_404(Item, pk=pk)
+    
+    favorited = request.POST.get('favorited')
+    if favorited == '1':
+        favorites.add(request.user, item)
+    elif favorited == '0':
+        favorites.remove(request.user, item)
+    else:
+        favorited = '1' if favorites.toggle(request.user, item) else '0'
+    favorited = favorited == '1'
+    
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'favorited': favorited})
+    
+    messages.success(request, '已收藏' if favorited else '已取消收藏')
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        return redirect(next_url)
+    return redirect(item.get_absolute_url())
+
+
+def item_suggest(request):
+    """
+    搜索框输入提示（JSON）
+
+    GET 参数 q 为已输入的内容，limit 为返回数量（不超过每个节点缓存的数量）。结果来自内存中的前缀索引，不访问数据库，
+    因此不读取 request.user，也不使用 @replica_reads。
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', suggest.DEFAULT_LIMIT)), 1), suggest.TOP_K)
+    except ValueError:
+        limit = suggest.DEFAULT_LIMIT
+    query = request.GET.get('q', '')[:100]
+    list_url = reverse('item_list')
+    suggestions = []
+    for suggestion in suggest.suggest(query, limit):
+        if suggestion.kind == 'category':
+            url = f'{list_url}?{urlencode({"category": suggestion.value})}'
+        else:
+            url = f'{list_url}?{urlencode({"q": suggestion.text})}'
+        suggestions.append({'text': suggestion.text, 'type': suggestion.kind, 'url': url})
+    return JsonResponse({'query': query, 'suggestions': suggestions})
+
+
+# 保存的搜索页显示的最近提醒数量
+ALERTS_PER_PAGE = 50
+
+
+@login_required
+@require_POST
+def saved_search_create(request):
+    """保存当前列表页的搜索条件（关键词、分类、价格区间）"""
+    category_id = _parse_id_param(request.POST.get('category'))
+    if category_id and not Category.objects.filter(pk=category_id).exists():
+        category_id = None
+    try:
+        percolator.create(
+            request.user,
+            query=request.POST.get('q', '')[:SavedSearch._meta.get_field('query').max_length],
+            category_id=category_id,
+            min_price=_parse_price_param(request.POST.get('min_price')),
+            max_price=_parse_price_param(request.POST.get('max_price')),
+        )
+    except ValueError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, '搜索已保存，有符合条件的新物品发布时会提醒你')
+    return redirect('saved_searches')
+
+
+@login_required
+def saved_searches(request):
+    """保存的搜索和最近的提醒，打开后提醒标记为已读"""
+    searches = list(
+        SavedSearch.objects.filter(user=request.user).select_related('category')
+        .annotate(unread_count=Count('alerts', filter=Q(alerts__is_read=False)))
+    )
+    alerts = list(
+        SearchAlert.objects.filter(saved_search__user=request.user)
+        .select_related('item', 'item__category', 'saved_search__category')[:ALERTS_PER_PAGE]
+    )
+    unread = [alert.pk for alert in alerts if not alert.is_read]
+    if unread:
+        SearchAlert.objects.filter(pk__in=unread).update(is_read=True)
+    
+    context = {
+        'saved_searches': searches,
+        'alerts': alerts,
+    }
+    
+    return render(request, 'items/saved_searches.html', context)
+
+
+@login_required
+@require_POST
+def saved_search_delete(request, pk):
+    """删除保存的搜索（倒排索引和提醒随之删除）"""
+    saved_search = get_object_or_404(SavedSearch, pk=pk, user=request.user)
+    saved_search.delete()
+    messages.success(request, '已删除保存的搜索')
+    return redirect('saved_searches')
+
+# ---------------------------------------------------------------------------
+# 异步视图：ASGI 部署时由 config.urls_async 使用（见 core.middleware）
+# ---------------------------------------------------------------------------
+
+@replica_reads
+async def home_async(request):
+    """home 的异步版本"""
+    feed = await aget_home_feed()
+    user = await aget_user(request)
+    context = {
+        'latest_items': feed['latest_items'],
+        'trending_items': feed['trending_items'],
+        'categories': feed['categories'],
+        'favorite_ids': await favorites.afavorite_ids(user),
+    }
+    return await arender(request, 'core/mainpage.html', context)
+
+
+@replica_reads
+async def item_detail_async(request, pk):
+    """
+    item_detail 的异步版本
+
+    查询在 sync_to_async 共享的线程中依次执行（Django 4.2 的异步 ORM 如此），
+    异步视图的好处是等待数据库和缓存时不占用工作线程，而不是查询并行。
+    """
+    try:
+        item = await Item.objects.select_related('category', 'seller', 'seller__profile').aget(pk=pk)
+    except Item.DoesNotExist:
+        raise Http404('物品不存在')
+    related = await arelated_items(pk)
+    user = await aget_user(request)
+    is_owner = user.is_authenticated and item.seller_id == user.pk
+    if not is_owner:
+        view_counters.record(item.pk)
+    context = {
+        'item': item,
+        'is_owner': is_owner,
+        'related_items': related,
+        'favorite_ids': await favorites.afavorite_ids(user),
+    }
+    return await arender(request, 'items/item_detail.html', context)
+
+
+@replica_reads
+async def item_list_async(request):
+    """item_list 的异步版本，查询依次执行（见 item_detail_async）"""
+    params = _list_params(request)
+    unfaceted, items, keys = _list_querysets(params)
+    
+    counts = await afacet_counts(unfaceted, request.GET, params['selected'])
+    categories = await alist(Category.objects.all())
+    page = await apaginate(items, request.GET.get('cursor'), ITEMS_PER_PAGE, keys=keys, request=request)
+    favorite_ids = await favorites.afavorite_ids(await aget_user(request))
+    cards, card_stats = await sync_to_async(render_cards)(page.object_list)
+    
+    context = _list_context(request, params, page, cards, categories, counts, favorite_ids)
+    response = await arender(request, 'items/item_list.html', context)
+    response['Server-Timing'] = card_stats.server_timing()
+    return response
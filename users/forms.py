@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from core.uploads import SafeImageField
 from .models import Profile, Item, Review
 
 class CustomUserCreationForm(UserCreationForm):
@@ -142,6 +143,10 @@ class ProfileUpdateForm(forms.ModelForm):
     class Meta:
         model = Profile
         fields = ['nickname', 'avatar', 'qq', 'wechat', 'bio', 'header_bg_type', 'header_bg_color', 'header_bg_image']
+        field_classes = {
+            'avatar': SafeImageField,
+            'header_bg_image': SafeImageField,
+        }
         labels = {
             'nickname': '昵称',
             'avatar': '头像',
@@ -183,6 +188,7 @@ class ItemForm(forms.ModelForm):
     class Meta:
         model = Item
         fields = ['title', 'description', 'price', 'image', 'status']
+        field_classes = {'image': SafeImageField}
         labels = {
             'title': '物品标题',
             'description': '物品描述',
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from users.ratings import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = '根据评价数据重建用户评分汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的汇总数量')
+
+    def handle(self, *args, **options):
+        written = rebuild_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'完成！共重建 {written} 个用户的评分汇总'))
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    """根据已有评价生成评分汇总"""
+    Review = apps.get_model('users', 'Review')
+    RatingSummary = apps.get_model('users', 'RatingSummary')
+    rows = (
+        Review.objects.order_by()
+        .values('reviewed_user_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'star_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+        )
+    )
+    RatingSummary.objects.bulk_create(
+        [
+            RatingSummary(
+                user_id=row.pop('reviewed_user_id'),
+                average=row['total'] / row['count'],
+                **row,
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_alter_profile_header_bg_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='评价数')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='评分总和')),
+                ('average', models.FloatField(default=0, verbose_name='平均评分')),
+                ('star_1', models.PositiveIntegerField(default=0, verbose_name='一星')),
+                ('star_2', models.PositiveIntegerField(default=0, verbose_name='二星')),
+                ('star_3', models.PositiveIntegerField(default=0, verbose_name='三星')),
+                ('star_4', models.PositiveIntegerField(default=0, verbose_name='四星')),
+                ('star_5', models.PositiveIntegerField(default=0, verbose_name='五星')),
+            ],
+            options={
+                'verbose_name': '评分汇总',
+                'verbose_name_plural': '评分汇总',
+            },
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:48
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_ratingsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='avatars/', verbose_name='头像'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='header_bg_image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='header_bg/', verbose_name='背景图片'),
+        ),
+    ]
@@ -1,13 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.utils import timezone
 
+from core.storage import media_storage, track as track_stored_files
+from core.thumbnails import schedule as schedule_thumbnails, thumbnail_url
+
 class Profile(models.Model):
     """用户扩展信息模型"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='用户')
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True, verbose_name='头像')
+    avatar = models.ImageField(upload_to='avatars/', storage=media_storage, null=True, blank=True, verbose_name='头像')
     nickname = models.CharField(max_length=50, blank=True, verbose_name='昵称')
     qq = models.CharField(max_length=20, blank=True, verbose_name='QQ')
     wechat = models.CharField(max_length=50, blank=True, verbose_name='微信')
@@ -27,6 +31,7 @@ class Profile(models.Model):
     )
     header_bg_image = models.ImageField(
         upload_to='header_bg/',
+        storage=media_storage,
         null=True,
         blank=True,
         verbose_name='背景图片'
@@ -46,19 +51,44 @@ class Profile(models.Model):
         """获取显示名称，优先使用昵称"""
         return self.nickname if self.nickname else self.user.username
     
-    def get_avatar_url(self):
-        """获取头像URL，如果没有上传头像则返回默认头像"""
+    def get_image_url(self, size='avatar', fmt='webp'):
+        """
+        获取头像或背景图片的缩略图URL
+
+        size 为 avatar 时返回头像（没有上传头像则返回默认头像），为 header 时返回背景图片；
+        缩略图尚未生成时返回原图。
+        """
+        if size == 'header':
+            return thumbnail_url(self.header_bg_image, size, fmt)
         if self.avatar:
-            return self.avatar.url
+            return thumbnail_url(self.avatar, size, fmt)
         else:
             return '/static/images/DefaultProfile_256.png'
 
+    def get_avatar_url(self):
+        """获取头像URL，如果没有上传头像则返回默认头像"""
+        return self.get_image_url('avatar')
+
+# 头像和背景图片引用计数
+track_stored_files(Profile, 'avatar', 'header_bg_image')
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """创建用户时自动创建对应的Profile"""
     if created:
         Profile.objects.create(user=instance)
 
+@receiver(post_save, sender=Profile)
+def generate_profile_thumbnails(sender, instance, raw=False, **kwargs):
+    """保存资料后登记头像和背景图片的缩略图，由 generate_thumbnails --pending 生成"""
+    if raw:
+        return
+    avatar, header = instance.avatar, instance.header_bg_image
+    def schedule():
+        schedule_thumbnails(avatar, ['avatar'])
+        schedule_thumbnails(header, ['header'])
+    transaction.on_commit(schedule)
+
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     """保存用户时自动保存对应的Profile"""
@@ -116,4 +146,46 @@ class Review(models.Model):
     
     def get_rating_display(self):
         """获取评分显示"""
-        return dict(self.RATING_CHOICES).get(self.rating, '未知')
\ No newline at end of file
+        return dict(self.RATING_CHOICES).get(self.rating, '未知')
+
+class RatingSummary(models.Model):
+    """用户收到评价的汇总（随评价的新增和删除同步更新）"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary',
+        verbose_name='用户'
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='评价数')
+    total = models.PositiveIntegerField(default=0, verbose_name='评分总和')
+    average = models.FloatField(default=0, verbose_name='平均评分')
+    star_1 = models.PositiveIntegerField(default=0, verbose_name='一星')
+    star_2 = models.PositiveIntegerField(default=0, verbose_name='二星')
+    star_3 = models.PositiveIntegerField(default=0, verbose_name='三星')
+    star_4 = models.PositiveIntegerField(default=0, verbose_name='四星')
+    star_5 = models.PositiveIntegerField(default=0, verbose_name='五星')
+    
+    class Meta:
+        verbose_name = '评分汇总'
+        verbose_name_plural = '评分汇总'
+    
+    def __str__(self):
+        return f'{self.user_id}: {self.average:.1f}分 ({self.count}条评价)'
+    
+    def get_histogram(self):
+        """按星级从高到低返回 [(星级, 数量), ...]"""
+        return [(star, getattr(self, f'star_{star}')) for star in range(5, 0, -1)]
+
+@receiver(post_save, sender=Review)
+def add_review_to_summary(sender, instance, created, raw=False, **kwargs):
+    """新增评价时更新被评价人的评分汇总"""
+    if created and not raw:
+        from .ratings import apply_review
+        apply_review(instance.reviewed_user_id, instance.rating, 1)
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_summary(sender, instance, **kwargs):
+    """删除评价时更新被评价人的评分汇总"""
+    from .ratings import apply_review
+    apply_review(instance.reviewed_user_id, instance.rating, -1)
@@ -0,0 +1,88 @@
+"""
+用户评分汇总
+
+RatingSummary 每个用户一行，保存评价数、评分总和、平均分和星级分布。
+评价新增或删除时在同一事务内用单条 UPDATE 增量更新，个人页面只需读取这一行。
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .models import RatingSummary, Review
+
+STARS = range(1, 6)
+
+
+def apply_review(user_id, rating, delta):
+    """
+    把一条评价计入（delta=1）或移出（delta=-1）用户的评分汇总
+
+    平均分在同一条 UPDATE 中由更新前的 total/count 推算，不需要先读取再写回。
+    由 Review 的 post_save / post_delete 信号调用，调用方需把评价的写入放在 transaction.atomic() 中，
+    汇总更新失败时评价随之回滚。
+    """
+    if rating not in STARS:
+        return
+    with transaction.atomic():
+        # 删除评价时不创建汇总行：级联删除用户时汇总行可能已被删除
+        if delta > 0:
+            RatingSummary.objects.get_or_create(user_id=user_id)
+        new_count = F('count') + delta
+        new_total = F('total') + rating * delta
+        RatingSummary.objects.filter(user_id=user_id).update(
+            count=new_count,
+            total=new_total,
+            average=Case(
+                When(count=-delta, then=Value(0.0)),
+                default=Cast(new_total, FloatField()) / Cast(new_count, FloatField()),
+                output_field=FloatField(),
+            ),
+            **{f'star_{rating}': F(f'star_{rating}') + delta},
+        )
+
+
+def get_summary(user):
+    """读取用户的评分汇总，没有评价时返回空汇总（不写入数据库）"""
+    try:
+        return user.rating_summary
+    except RatingSummary.DoesNotExist:
+        return RatingSummary(user=user)
+
+
+def rebuild_summaries(batch_size=1000):
+    """
+    从 Review 表全量重建评分汇总，返回写入的行数
+
+    一次分组查询得到每个用户的计数、总和和星级分布，分批写入。
+    """
+    rows = (
+        Review.objects.order_by()
+        .values('reviewed_user_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'star_{star}': Count('id', filter=Q(rating=star)) for star in STARS},
+        )
+    )
+
+    written = 0
+    with transaction.atomic():
+        RatingSummary.objects.all().delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(RatingSummary(
+                user_id=row['reviewed_user_id'],
+                count=row['count'],
+                total=row['total'],
+                average=row['total'] / row['count'],
+                **{f'star_{star}': row[f'star_{star}'] for star in STARS},
+            ))
+            if len(batch) >= batch_size:
+                RatingSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            RatingSummary.objects.bulk_create(batch)
+            written += len(batch)
+    return written
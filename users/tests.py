@@ -1,3 +1,141 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError
 from django.test import TestCase
+from django.urls import reverse
+
+from items.models import Category
+from items.tests import create_items
+from . import views
+from .models import RatingSummary, Review, Item as LegacyItem
+from .ratings import rebuild_summaries
+
+
+def create_reviews(rows, reviewer, reviewed_user, item=None, batch_size=5000):
+    """批量创建测试评价"""
+    Review.objects.bulk_create(
+        [
+            Review(content=f'交易顺利{i}', rating=i % 5 + 1, reviewer=reviewer,
+                   reviewed_user=reviewed_user, item=item)
+            for i in range(rows)
+        ],
+        batch_size=batch_size
+    )
+
+
+class RatingSummaryTests(TestCase):
+    """评分汇总的增量更新和重建"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pass12345678')
+        self.buyer = User.objects.create_user(username='buyer', password='pass12345678')
+
+    def review(self, rating):
+        return Review.objects.create(content='不错', rating=rating, reviewer=self.buyer, reviewed_user=self.seller)
+
+    def test_create_and_delete_update_summary(self):
+        self.review(5)
+        low = self.review(2)
+        summary = RatingSummary.objects.get(user=self.seller)
+        self.assertEqual((summary.count, summary.total, summary.star_5, summary.star_2), (2, 7, 1, 1))
+        self.assertAlmostEqual(summary.average, 3.5)
+
+        low.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.count, summary.total, summary.star_2), (1, 5, 0))
+        self.assertAlmostEqual(summary.average, 5.0)
+
+        Review.objects.filter(reviewed_user=self.seller).delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.count, summary.average), (0, 0))
+
+    def test_rebuild_matches_incremental(self):
+        for rating in (1, 3, 4, 4):
+            self.review(rating)
+        expected = RatingSummary.objects.get(user=self.seller)
+        RatingSummary.objects.all().delete()
+        self.assertEqual(rebuild_summaries(), 1)
+        rebuilt = RatingSummary.objects.get(user=self.seller)
+        self.assertEqual(rebuilt.get_histogram(), expected.get_histogram())
+        self.assertAlmostEqual(rebuilt.average, expected.average)
+
+    def test_create_review_view_is_atomic(self):
+        self.client.force_login(self.buyer)
+        url = reverse('users:create_review', args=[self.seller.pk])
+        with mock.patch('users.ratings.RatingSummary.objects.get_or_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url, {'content': '不错', 'rating': 4})
+        self.assertFalse(Review.objects.exists())
+
+        self.client.post(url, {'content': '不错', 'rating': 4})
+        self.assertEqual(RatingSummary.objects.get(user=self.seller).count, Review.objects.count())
+
+    def test_deleting_reviewed_user(self):
+        self.review(4)
+        self.seller.delete()
+        self.assertFalse(RatingSummary.objects.exists())
+
+
+class UserViewQueryBudgetMixin:
+    """
+    个人中心和公开资料页的查询次数预算
+
+    物品和评价数量从 10 增长到 100,000 时查询次数必须保持不变。
+    """
+    ROWS = 10
+
+    DASHBOARD_QUERIES = 7
+    PROFILE_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='pass12345678')
+        cls.buyer = User.objects.create_user(username='buyer', password='pass12345678')
+        profile = cls.seller.profile
+        profile.avatar = 'avatars/test.png'
+        profile.save()
+        categories = [Category.objects.create(name=name) for name in ('书籍', '电子产品')]
+        create_items(cls.ROWS, cls.seller, categories)
+        item = LegacyItem.objects.create(title='保温杯', description='不锈钢保温杯', seller=cls.seller)
+        create_reviews(cls.ROWS, cls.buyer, cls.seller, item)
+        create_reviews(cls.ROWS, cls.seller, cls.buyer, item)
+        rebuild_summaries()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dashboard(self):
+        self.client.force_login(self.seller)
+        with self.assertNumQueries(self.DASHBOARD_QUERIES):
+            response = self.client.get(reverse('users:dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_profile(self):
+        with self.assertNumQueries(self.PROFILE_QUERIES):
+            response = self.client.get(reverse('users:user_profile', args=[self.seller.username]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_profile_async(self):
+        async def request():
+            return await self.async_client.get(reverse('users:user_profile', args=[self.seller.username]))
+
+        with self.assertNumQueries(self.PROFILE_QUERIES):
+            response = async_to_sync(request)()
+        self.assertEqual(response.resolver_match.func, views.user_profile_async)
+        self.assertEqual(response.context['public_item_count'], min(self.ROWS, views.ITEMS_PER_PAGE))
+        self.assertEqual(response.context['public_item_count_more'], self.ROWS > views.ITEMS_PER_PAGE)
+
+
+class UserViewQueryBudgetSmallTests(UserViewQueryBudgetMixin, TestCase):
+    ROWS = 10
+
+
+class UserViewQueryBudgetMediumTests(UserViewQueryBudgetMixin, TestCase):
+    ROWS = 1000
+
 
-# Create your tests here.
+class UserViewQueryBudgetLargeTests(UserViewQueryBudgetMixin, TestCase):
+    ROWS = 100000
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views, urls
+
+app_name = 'users'
+
+# ASGI 下使用：用户主页换成异步视图，其余与 users.urls 相同
+urlpatterns = [
+    path('profile/<str:username>/', views.user_profile_async, name='user_profile'),
+] + urls.urlpatterns
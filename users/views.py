@@ -3,10 +3,20 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Avg
+from django.db import transaction
+from django.http import Http404
 from items.models import Item  # 使用items应用中的Item模型
+from items.pagination import paginate, apaginate
+from core.routers import replica_reads
+from core.shortcuts import arender
+from core.uploads import image_uploads
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, ProfileUpdateForm, ReviewForm
 from .models import Profile, Review
+from .ratings import get_summary
+
+# 个人页面每页显示的物品和评价数量
+ITEMS_PER_PAGE = 12
+REVIEWS_PER_PAGE = 10
 
 def register(request):
     """用户注册视图"""
@@ -59,22 +69,34 @@ def user_logout(request):
     return redirect('home')
 
 @login_required
+@image_uploads
 def dashboard(request):
     """用户仪表板视图"""
     user = request.user
     profile = user.profile
     
     # 获取用户发布的物品
-    user_items = Item.objects.filter(seller=user).order_by('-created_at')
+    user_items = Item.objects.filter(seller=user)
     
     # 获取用户收到的评价
-    user_reviews = Review.objects.filter(reviewed_user=user).order_by('-created_at')
+    user_reviews = Review.objects.filter(reviewed_user=user)
     
-    # 计算平均评分
-    avg_rating = user_reviews.aggregate(Avg('rating'))['rating__avg']
+    # 评分汇总（一行数据）
+    rating_summary = get_summary(user)
     
     # 获取用户给出的评价
-    given_reviews = Review.objects.filter(reviewer=user).order_by('-created_at')
+    given_reviews = Review.objects.filter(reviewer=user)
+    
+    # 列表中用到的关联对象一次取出
+    user_items = user_items.only(
+        'id', 'title', 'description', 'price', 'image', 'status', 'created_at'
+    )
+    user_reviews = user_reviews.select_related('reviewer', 'item').only(
+        'id', 'content', 'rating', 'created_at', 'reviewer__username', 'item__title'
+    )
+    given_reviews = given_reviews.select_related('reviewed_user', 'item').only(
+        'id', 'content', 'rating', 'created_at', 'reviewed_user__username', 'item__title'
+    )
     
     if request.method == 'POST':
         form = ProfileUpdateForm(request.POST, request.FILES, instance=profile)
@@ -87,19 +109,29 @@ def dashboard(request):
     else:
         form = ProfileUpdateForm(instance=profile)
     
+    # 三个列表各自使用独立的游标参数分页
+    items_page = paginate(user_items, request.GET.get('items_cursor'), ITEMS_PER_PAGE,
+                          request=request, param='items_cursor')
+    reviews_page = paginate(user_reviews, request.GET.get('reviews_cursor'), REVIEWS_PER_PAGE,
+                            request=request, param='reviews_cursor')
+    given_page = paginate(given_reviews, request.GET.get('given_cursor'), REVIEWS_PER_PAGE,
+                          request=request, param='given_cursor')
+    
     context = {
         'profile': profile,
         'form': form,
-        'user_items': user_items,
-        'user_reviews': user_reviews,
-        'given_reviews': given_reviews,
-        'avg_rating': avg_rating or 0,
-        'review_count': user_reviews.count(),
+        'user_items': items_page,
+        'user_reviews': reviews_page,
+        'given_reviews': given_page,
+        'rating_summary': rating_summary,
+        'avg_rating': rating_summary.average,
+        'review_count': rating_summary.count,
     }
     
     return render(request, 'users/dashboard.html', context)
 
 @login_required
+@image_uploads
 def create_item(request):
     """创建物品视图"""
     if request.method == 'POST':
@@ -133,7 +165,9 @@ def create_review(request, user_id):
             review = form.save(commit=False)
             review.reviewer = request.user
             review.reviewed_user = reviewed_user
-            review.save()
+            # 评价和评分汇总（post_save 信号中更新）在同一事务中写入
+            with transaction.atomic():
+                review.save()
             messages.success(request, '评价发布成功！')
             return redirect('users:dashboard')
         else:
@@ -148,27 +182,66 @@ def create_review(request, user_id):
     
     return render(request, 'users/create_review.html', context)
 
-def user_profile(request, username):
-    """用户公开资料页面"""
-    user = get_object_or_404(User, username=username)
-    profile = user.profile
-    
+def _profile_querysets(user):
+    """返回 (公开物品当前页查询集, 收到的评价当前页查询集)"""
     # 获取用户公开的物品（在售状态）
-    public_items = Item.objects.filter(seller=user, status='active').order_by('-created_at')
-    
+    public_items = Item.objects.filter(seller=user, status='active')
     # 获取用户收到的评价
-    user_reviews = Review.objects.filter(reviewed_user=user).order_by('-created_at')
-    
-    # 计算平均评分
-    avg_rating = user_reviews.aggregate(Avg('rating'))['rating__avg']
-    
-    context = {
+    user_reviews = Review.objects.filter(reviewed_user=user)
+    return (
+        public_items.only('id', 'title', 'description', 'price', 'condition', 'image', 'created_at'),
+        user_reviews.select_related('reviewer').only(
+            'id', 'content', 'rating', 'created_at', 'reviewer__username'
+        ),
+    )
+
+
+def _profile_context(user, items_page, reviews_page):
+    # 评分汇总随用户一起查询
+    rating_summary = get_summary(user)
+    # 不执行 COUNT(*)：只有一页时显示准确数量，否则显示"至少一页"
+    more_items = items_page.has_next() or items_page.has_previous()
+    return {
         'profile_user': user,
-        'profile': profile,
-        'public_items': public_items,
-        'user_reviews': user_reviews,
-        'avg_rating': avg_rating or 0,
-        'review_count': user_reviews.count(),
+        'profile': user.profile,
+        'public_items': items_page,
+        'public_item_count': ITEMS_PER_PAGE if more_items else len(items_page),
+        'public_item_count_more': more_items,
+        'user_reviews': reviews_page,
+        'rating_summary': rating_summary,
+        'avg_rating': rating_summary.average,
+        'review_count': rating_summary.count,
     }
+
+
+@replica_reads
+def user_profile(request, username):
+    """用户公开资料页面"""
+    user = get_object_or_404(User.objects.select_related('profile', 'rating_summary'), username=username)
+    items, reviews = _profile_querysets(user)
+    
+    items_page = paginate(items, request.GET.get('items_cursor'), ITEMS_PER_PAGE,
+                          request=request, param='items_cursor')
+    reviews_page = paginate(reviews, request.GET.get('reviews_cursor'), REVIEWS_PER_PAGE,
+                            request=request, param='reviews_cursor')
     
-    return render(request, 'users/user_profile.html', context)
\ No newline at end of file
+    context = _profile_context(user, items_page, reviews_page)
+    return render(request, 'users/user_profile.html', context)
+
+
+@replica_reads
+async def user_profile_async(request, username):
+    """user_profile 的异步版本，物品和评价两个分页查询依次执行（见 items.views.item_detail_async）"""
+    try:
+        user = await User.objects.select_related('profile', 'rating_summary').aget(username=username)
+    except User.DoesNotExist:
+        raise Http404('用户不存在')
+    items, reviews = _profile_querysets(user)
+    
+    items_page = await apaginate(items, request.GET.get('items_cursor'), ITEMS_PER_PAGE,
+                                 request=request, param='items_cursor')
+    reviews_page = await apaginate(reviews, request.GET.get('reviews_cursor'), REVIEWS_PER_PAGE,
+                                   request=request, param='reviews_cursor')
+    
+    context = _profile_context(user, items_page, reviews_page)
+    return await arender(request, 'users/user_profile.html', context)
\ No newline at end of file